@@ -0,0 +1,323 @@
+"""Benchmarks de los cálculos de precios con catálogos y proyectos sintéticos - MI PC S.A.
+
+Genera catálogos (10 a 10.000 modelos) y proyectos (1 a 5.000 líneas o sedes) con una
+semilla fija, mide cada etapa sin Streamlit (mejor de `--repeticiones` muestras,
+throughput y pico de memoria con tracemalloc) y compara contra baseline.json.
+Además verifica que los resultados financieros sigan iguales a los fijados
+("pins") en el baseline; cualquier diferencia es un error, no una regresión.
+
+    python benchmarks/bench.py                 # compara contra el baseline
+    python benchmarks/bench.py --rapido        # sólo tamaños chicos
+    python benchmarks/bench.py --guardar       # actualiza el baseline (los pins sólo si coinciden)
+
+Sale con código 1 si alguna etapa es más lenta que baseline * (1 + tolerancia)
+o si algún pin no coincide.
+"""
+import argparse
+import json
+import os
+import platform
+import sqlite3
+import sys
+import time
+import tracemalloc
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import cartera  # noqa: E402
+import motor  # noqa: E402
+import optimizador  # noqa: E402
+import stock  # noqa: E402
+from catalogo import invalidar_catalogo, obtener_catalogo  # noqa: E402
+from db import init_db  # noqa: E402
+from finanzas import amortizacion_lote, calcular_amortizacion  # noqa: E402
+
+RUTA_BASELINE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "baseline.json")
+SEMILLA = 20240601
+MODELOS = [10, 100, 1000, 10000]
+LINEAS = [1, 50, 500, 5000]
+MODELOS_PROYECTO = 1000
+CONTRATOS = [10, 100, 1000, 10000]
+FINANCIAMIENTOS = [("Propios", 0.0, 36, 0), ("Bancario", 12.0, 36, 0), ("Mayorista", 15.0, 24, 3)]
+
+
+# --- DATOS SINTÉTICOS ---
+def catalogo_sintetico(n_modelos, semilla=SEMILLA):
+    """Base en memoria con los 3 equipos de la pre-carga más n_modelos sintéticos."""
+    rng = np.random.default_rng(semilla)
+    conn = init_db(":memory:")
+    marcas = ["Brother", "HP", "Kyocera", "Lexmark", "Ricoh", "Xerox"]
+    color = rng.random(n_modelos) < 0.3
+    conn.executemany("INSERT INTO equipos (marca, modelo, tipo, costo_adq, residual, vida_util, mantenimiento) VALUES (?,?,?,?,?,?,?)",
+                     [(marcas[i % len(marcas)], f"SYN-{i:05d}", "Color" if color[i] else "B/N",
+                       round(float(rng.uniform(300, 3000)), 2), 50.0, 36, round(float(rng.uniform(5, 40)), 2))
+                      for i in range(n_modelos)])
+    ids = [i for (i,) in conn.execute("SELECT id FROM equipos WHERE modelo LIKE 'SYN-%' ORDER BY id")]
+    consumibles = []
+    for eq_id, es_color in zip(ids, color):
+        consumibles.append((eq_id, "Toner CMYK" if es_color else "Toner", round(float(rng.uniform(40, 500)), 2), int(rng.integers(3, 30)) * 1000))
+        consumibles.append((eq_id, "Drum", round(float(rng.uniform(50, 200)), 2), int(rng.integers(30, 120)) * 1000))
+        if rng.random() < 0.6: consumibles.append((eq_id, "Fuser", 185.0, 200000))
+    conn.executemany("INSERT INTO consumibles (equipo_id, tipo, costo, rendimiento) VALUES (?,?,?,?)", consumibles)
+    conn.commit()
+    invalidar_catalogo(conn)
+    return conn
+
+
+def proyecto_sintetico(conn, n_lineas, semilla=SEMILLA, incluir_papel=True, costo_papel=2.80):
+    rng = np.random.default_rng(semilla + n_lineas)
+    cat = obtener_catalogo(conn)
+    ids = list(cat.equipos)
+    return [motor.linea_proyecto(conn, f"Sede {i % 97}", ids[int(rng.integers(len(ids)))], int(rng.integers(1, 6)),
+                                 int(rng.integers(5, 200)) * 100, incluir_papel, costo_papel, cat) for i in range(n_lineas)]
+
+
+def contratos_sinteticos(n, semilla=SEMILLA):
+    """Contratos de la cartera (mismas columnas que cartera.contratos) repartidos en 5 años, con sus líneas."""
+    rng = np.random.default_rng(semilla + n)
+    tipos = np.array(["Propios", "Bancario", "Mayorista"])[rng.integers(0, 3, n)]
+    inversion = rng.uniform(1000, 50000, n).round(2)
+    opex_fijo, opex_var = inversion * rng.uniform(0.005, 0.02, n), inversion * rng.uniform(0.01, 0.05, n)
+    fact_meta = (opex_fijo + opex_var + inversion / 36) / 0.7
+    vol = rng.integers(5, 500, n) * 1000.0
+    contratos = pd.DataFrame({
+        "Contrato": np.arange(1, n + 1), "Cliente": [f"Cliente {i}" for i in rng.integers(0, max(n // 10, 1), n)],
+        "Fecha": (np.datetime64("2022-01-01") + rng.integers(0, 5 * 365, n)).astype(str),
+        "Meses": rng.choice([12, 24, 36, 48, 60], n), "Plan": np.array(cartera.PLANES)[rng.integers(0, 3, n)],
+        "Tipo Fin": tipos, "Tasa": np.where(tipos == "Propios", 0.0, rng.uniform(8, 20, n)),
+        "Plazo": rng.choice([12, 24, 36, 48], n), "Gracia": np.where(rng.random(n) < 0.2, 3, 0),
+        "Inversión": inversion, "Tarifa Plana": fact_meta, "Renta": (opex_fijo + inversion / 36) / 0.7,
+        "Click": opex_var / 0.7 / vol, "Precio Único": fact_meta / vol,
+        "Excedente": fact_meta / vol * motor.RECARGO_EXCEDENTE, "Vol. Total": vol,
+        "OPEX Fijo": opex_fijo, "OPEX Var": opex_var,
+    })
+    lineas = pd.DataFrame({"Contrato": contratos["Contrato"], "Modelo": [f"SYN-{i:05d}" for i in rng.integers(0, 200, n)],
+                           "Cantidad": rng.integers(1, 20, n), "Inversión": inversion})
+    return contratos, lineas
+
+
+# --- ETAPAS ---
+# Cada etapa recibe el tamaño, prepara lo que necesita y devuelve una función sin
+# argumentos (lo que se mide) y cuántas unidades procesa cada llamada.
+def etapa_amortizacion(n):
+    plazos = np.random.default_rng(SEMILLA).integers(12, 61, n)
+    def correr():
+        for plazo in plazos: calcular_amortizacion(10000.0, 12.0, int(plazo), "Francesa", 0)
+    return correr, n
+
+
+def etapa_amortizacion_lote(n):
+    rng = np.random.default_rng(SEMILLA)
+    plazos, tasas = rng.integers(12, 61, n), rng.uniform(5, 30, n)
+    def correr():
+        amortizacion_lote(np.full(n, 10000.0), tasas, plazos, "Francesa", 0)
+    return correr, n
+
+
+def etapa_catalogo(n):
+    conn = catalogo_sintetico(n)
+    def correr():
+        invalidar_catalogo(conn)
+        cat = obtener_catalogo(conn)
+        for eq_id in cat.equipos: motor.get_detalles_equipo(conn, eq_id, 3000, True, 2.80, cat)
+    return correr, n
+
+
+def etapa_armador(n):
+    conn = catalogo_sintetico(MODELOS_PROYECTO)
+    proyecto = proyecto_sintetico(conn, n)
+    def correr():
+        # Lo que hace la app en cada edición: recalcular todas las líneas
+        cat = obtener_catalogo(conn)
+        for linea in proyecto: motor.recalcular_linea(conn, linea, True, 2.80, cat)
+    return correr, n
+
+
+def etapa_edicion(n):
+    conn = catalogo_sintetico(MODELOS_PROYECTO)
+    proyecto = proyecto_sintetico(conn, n)
+    totales = motor.totales_proyecto(proyecto)
+    def correr():
+        # Editar una cantidad en el Armador: sólo se recalcula esa línea
+        motor.editar_linea(conn, proyecto, totales, n // 2, {"Cantidad": proyecto[n // 2]['Cantidad'] % 5 + 1}, True, 2.80)
+    return correr, 1
+
+
+def etapa_proyeccion(n):
+    conn = catalogo_sintetico(MODELOS_PROYECTO)
+    proyecto = proyecto_sintetico(conn, n)
+    inversion = sum(p['Inversión'] for p in proyecto)
+    def correr():
+        for tipo, tasa, plazo, gracia in FINANCIAMIENTOS:
+            fin = motor.financiar(inversion, tipo, tasa, plazo, gracia)
+            motor.proyeccion(motor.oferta_comercial(proyecto, fin, 0.30), fin, 36)
+    return correr, n
+
+
+def etapa_optimizador(n):
+    conn = catalogo_sintetico(5000)
+    rng = np.random.default_rng(SEMILLA + n)
+    sedes = [{"Sede": f"Sede {i}", "Volumen": int(rng.integers(1, 100)) * 1000, "Tipo": "Color" if rng.random() < 0.3 else "B/N"}
+             for i in range(n)]
+    optimizador.curvas_costo(conn)
+    def correr():
+        optimizador.optimizar(conn, sedes)
+    return correr, n
+
+
+def etapa_stock(n):
+    conn = catalogo_sintetico(MODELOS_PROYECTO)
+    proyecto = proyecto_sintetico(conn, n)
+    def correr():
+        consumos = stock.consumos_proyecto(conn, proyecto)
+        stock.puntos_pedido(consumos, 6)
+        stock.plan_mensual(consumos, 6)
+    return correr, n
+
+
+def etapa_cartera(n):
+    contratos, lineas = contratos_sinteticos(n)
+    def correr():
+        c = cartera.Cartera(contratos, lineas)
+        c.vpn(); c.concentracion("Cliente", "2025-01-01")
+    return correr, n
+
+
+def etapa_cartera_edicion(n):
+    c = cartera.Cartera(*contratos_sinteticos(n))
+    contrato = int(c.contratos['Contrato'].iloc[n // 2])
+    meses = [24, 36]
+    def correr():
+        # Cambiar el plazo de un contrato: sólo se rehacen sus aportes
+        meses.reverse(); c.actualizar(contrato, Meses=meses[0])
+    return correr, 1
+
+
+ETAPAS = {
+    "amortizacion": (etapa_amortizacion, [1, 10, 100, 1000], "tablas"),
+    "amortizacion_lote": (etapa_amortizacion_lote, [100, 1000, 10000, 100000], "tablas"),
+    "catalogo": (etapa_catalogo, MODELOS, "modelos"),
+    "armador": (etapa_armador, LINEAS, "líneas"),
+    "edicion": (etapa_edicion, LINEAS, "ediciones"),
+    "proyeccion": (etapa_proyeccion, LINEAS, "líneas"),
+    "stock": (etapa_stock, LINEAS, "líneas"),
+    "optimizador": (etapa_optimizador, [10, 100, 1000], "sedes"),
+    "cartera": (etapa_cartera, CONTRATOS, "contratos"),
+    "cartera_edicion": (etapa_cartera_edicion, CONTRATOS, "ediciones"),
+}
+
+
+def medir(preparar, n, repeticiones, minimo=0.02):
+    """Mejor tiempo por llamada; cada muestra repite la llamada hasta durar al menos `minimo` segundos."""
+    correr, unidades = preparar(n)
+    t = time.perf_counter(); correr(); llamadas = max(1, int(minimo / max(time.perf_counter() - t, 1e-9)))
+    tiempos = []
+    for _ in range(repeticiones):
+        t = time.perf_counter()
+        for _ in range(llamadas): correr()
+        tiempos.append((time.perf_counter() - t) / llamadas)
+    tracemalloc.start()
+    correr()
+    pico = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return {"segundos": min(tiempos), "throughput": unidades / min(tiempos), "pico_mb": pico / 2**20}
+
+
+# --- PINS (RESULTADOS FIJADOS) ---
+def calcular_pins():
+    """Resultados financieros de referencia: la pre-carga, un proyecto sintético y las tablas de amortización."""
+    pins = {}
+    conn = init_db(":memory:")
+    for tipo, tasa, plazo, gracia in FINANCIAMIENTOS:
+        res = motor.cotizar(conn, {"margen_meta": 0.30, "financiamiento": {"tipo": tipo, "tasa": tasa, "plazo": plazo, "gracia": gracia},
+                                   "lineas": [{"modelo": "MFC-L6915DW", "cantidad": 3, "vol_unit": 3000},
+                                              {"modelo": "MFC-L9630CDN", "cantidad": 1, "vol_unit": 1500}]})
+        for k in ("fact_meta", "p_unico", "renta", "click", "excedente", "interes_total", "vpn", "tir", "payback", "payback_desc"):
+            pins[f"precarga.{tipo}.{k}"] = res[k]
+
+    conn = catalogo_sintetico(100)
+    proyecto = proyecto_sintetico(conn, 50)
+    inversion = sum(p['Inversión'] for p in proyecto)
+    for tipo, tasa, plazo, gracia in FINANCIAMIENTOS:
+        fin = motor.financiar(inversion, tipo, tasa, plazo, gracia)
+        oferta = motor.oferta_comercial(proyecto, fin, 0.30)
+        _, flujo = motor.proyeccion(oferta, fin, 36)
+        for k in ("fact_meta", "renta", "click"): pins[f"sintetico.{tipo}.{k}"] = oferta[k]
+        pins[f"sintetico.{tipo}.vpn"] = flujo['VPN']
+        pins[f"sintetico.{tipo}.tir"] = None if np.isnan(flujo['TIR']) else flujo['TIR']
+        pins[f"sintetico.{tipo}.payback"] = flujo['Payback']
+    consumos = stock.consumos_proyecto(conn, proyecto)
+    pins["sintetico.stock.necesidad_6m"] = float(stock.puntos_pedido(consumos, 6)['Necesidad Horizonte'].sum())
+
+    for tipo in ("Francesa", "Alemana"):
+        for gracia in (0, 3):
+            tabla = calcular_amortizacion(25000.0, 14.0, 36, tipo, gracia)
+            pins[f"amortizacion.{tipo}.g{gracia}.cuota_total"] = float(tabla['Cuota Total'].sum())
+            pins[f"amortizacion.{tipo}.g{gracia}.interes"] = float(tabla['Interés'].sum())
+    return {k: (float(v) if isinstance(v, (int, float, np.floating)) and not isinstance(v, bool) else v) for k, v in pins.items()}
+
+
+def comparar_pins(actuales, fijados, tol=1e-9):
+    """Lista de (pin, fijado, actual) que no coinciden."""
+    distintos = []
+    for k in sorted(set(actuales) | set(fijados)):
+        a, f = actuales.get(k), fijados.get(k)
+        if a is None or f is None:
+            if a != f: distintos.append((k, f, a))
+        elif abs(a - f) > tol * max(1.0, abs(f)): distintos.append((k, f, a))
+    return distintos
+
+
+def main(argv=None):
+    p = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    p.add_argument("--baseline", default=RUTA_BASELINE)
+    p.add_argument("--etapas", nargs="+", choices=list(ETAPAS), default=list(ETAPAS))
+    p.add_argument("--repeticiones", type=int, default=5)
+    p.add_argument("--tolerancia", type=float, default=0.5, help="lentitud admitida sobre el baseline (0.5 = 50%%)")
+    p.add_argument("--rapido", action="store_true", help="sólo los dos tamaños más chicos de cada etapa")
+    p.add_argument("--guardar", action="store_true", help="escribe los resultados como nuevo baseline")
+    args = p.parse_args(argv)
+
+    baseline = {}
+    if os.path.exists(args.baseline):
+        with open(args.baseline, encoding="utf-8") as f: baseline = json.load(f)
+    previos = {(r['etapa'], r['n']): r for r in baseline.get("resultados", [])}
+
+    pins = calcular_pins()
+    distintos = comparar_pins(pins, baseline["pins"]) if "pins" in baseline else []
+    for k, fijado, actual in distintos: print(f"PIN DISTINTO {k}: fijado {fijado!r}, actual {actual!r}")
+    print(f"Pins: {len(pins) - len(distintos)}/{len(pins)} coinciden" if "pins" in baseline else f"Pins: {len(pins)} calculados (sin baseline)")
+
+    resultados, regresiones = [], 0
+    print(f"\n{'Etapa':<14}{'N':>8}{'Segundos':>12}{'Unidades/s':>14}{'Pico MB':>10}{'vs Base':>10}")
+    for etapa in args.etapas:
+        preparar, tamanos, unidad = ETAPAS[etapa]
+        for n in tamanos[:2] if args.rapido else tamanos:
+            r = {"etapa": etapa, "n": n, "unidad": unidad, **medir(preparar, n, args.repeticiones)}
+            resultados.append(r)
+            previo = previos.get((etapa, n))
+            relacion = r['segundos'] / previo['segundos'] if previo else None
+            marca = ""
+            if relacion is not None and relacion > 1 + args.tolerancia: marca = "  REGRESIÓN"; regresiones += 1
+            print(f"{etapa:<14}{n:>8}{r['segundos']:>12.5f}{r['throughput']:>14,.0f}{r['pico_mb']:>10.2f}"
+                  f"{f'{relacion:.2f}x' if relacion else '-':>10}{marca}")
+
+    if args.guardar:
+        if distintos: print("\nNo se guarda: hay pins distintos."); return 1
+        nuevos = {(r['etapa'], r['n']): r for r in resultados}
+        baseline = {
+            "maquina": {"python": platform.python_version(), "numpy": np.__version__, "sqlite": sqlite3.sqlite_version,
+                        "plataforma": platform.platform(), "cpus": os.cpu_count()},
+            "pins": pins,
+            "resultados": [nuevos.get(k, v) for k, v in previos.items()] + [r for k, r in nuevos.items() if k not in previos],
+        }
+        with open(args.baseline, "w", encoding="utf-8") as f: json.dump(baseline, f, indent=1, ensure_ascii=False)
+        print(f"\nBaseline guardado en {args.baseline}")
+    return 1 if distintos or regresiones else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
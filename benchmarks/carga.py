@@ -0,0 +1,171 @@
+"""Prueba de carga de la base: vendedores cotizando mientras se edita el inventario - MI PC S.A.
+
+Sobre una copia en un archivo temporal del catálogo sintético de bench.py,
+`--usuarios` hilos hacen lo que hace un vendedor en la app: recalcular su
+proyecto contra el catálogo, financiar, guardar la cotización (y firmar la
+mitad, que pasan a ser contratos) y consultar el historial y el stock de
+contratos (en una instantánea de sólo lectura). Otro hilo edita en bloque el
+costo de todo el inventario una y otra vez. Al final informa operaciones por
+segundo, latencias p50/p95 y errores por base bloqueada.
+
+    python benchmarks/carga.py                      # conexiones de db.conectar (WAL)
+    python benchmarks/carga.py --usuarios 40 --segundos 20
+    python benchmarks/carga.py --legado             # como antes: journal clásico, sin reintentos
+
+Sale con código 1 si hubo errores.
+"""
+import argparse
+import os
+import sqlite3
+import sys
+import tempfile
+import threading
+import time
+from contextlib import nullcontext
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import cotizaciones  # noqa: E402
+import inventario  # noqa: E402
+import motor  # noqa: E402
+import stock  # noqa: E402
+from bench import catalogo_sintetico, proyecto_sintetico  # noqa: E402
+from catalogo import obtener_catalogo  # noqa: E402
+from db import conectar, instantanea  # noqa: E402
+
+OPERACIONES = ["Cotizar", "Guardar", "Historial", "Stock", "Edición Inventario"]
+
+
+def preparar(ruta, n_modelos, legado=False):
+    """Copia el catálogo sintético a `ruta`; con legado=True deja el journal clásico (rollback) en vez de WAL."""
+    memoria = catalogo_sintetico(n_modelos)
+    destino = sqlite3.connect(ruta)
+    memoria.backup(destino)
+    destino.execute(f"PRAGMA journal_mode = {'DELETE' if legado else 'WAL'}")
+    destino.close(); memoria.close()
+
+
+class Carga:
+    def __init__(self, ruta, legado, lineas, pausa):
+        self.ruta, self.legado, self.lineas, self.pausa = ruta, legado, lineas, pausa
+        self.latencias = {op: [] for op in OPERACIONES}
+        self.errores = {op: 0 for op in OPERACIONES}
+        self.detalle_errores = {}
+        self.parar = threading.Event()
+        self._lock = threading.Lock()
+
+    def conexiones(self):
+        """(escritura, lectura) del hilo. En modo legado una sola conexión como la que abría init_db."""
+        if self.legado:
+            conn = sqlite3.connect(self.ruta)
+            return conn, conn
+        return conectar(self.ruta), conectar(self.ruta, solo_lectura=True)
+
+    def medir(self, op, func, *args):
+        t0 = time.perf_counter()
+        try:
+            res = func(*args)
+        except sqlite3.OperationalError as e:
+            with self._lock:
+                self.errores[op] += 1; self.detalle_errores[str(e)] = self.detalle_errores.get(str(e), 0) + 1
+            return None
+        with self._lock: self.latencias[op].append(time.perf_counter() - t0)
+        return res
+
+    def vendedor(self, n):
+        conn, lectura = self.conexiones()
+        rng = np.random.default_rng(n)
+        proyecto = proyecto_sintetico(conn, self.lineas, semilla=n)
+        guardar = cotizaciones.guardar_cotizacion.__wrapped__ if self.legado else cotizaciones.guardar_cotizacion
+        firmar = cotizaciones.firmar_cotizacion.__wrapped__ if self.legado else cotizaciones.firmar_cotizacion
+        snapshot = nullcontext if self.legado else instantanea  # antes se leía sin transacción
+
+        def cotizar():
+            cat = obtener_catalogo(conn)
+            for linea in proyecto: motor.recalcular_linea(conn, linea, True, 2.80, cat)
+            fin = motor.financiar(sum(p['Inversión'] for p in proyecto), "Bancario", 12.0, 36, 0, tabla=False)
+            oferta = motor.oferta_comercial(proyecto, fin, 0.30)
+            return fin, oferta, motor.flujo_proyeccion(oferta, fin, 36)
+
+        def guardar_y_firmar(*args):
+            cot_id = guardar(*args)
+            if rng.random() < 0.5: firmar(conn, cot_id)
+
+        def historial():
+            with snapshot(lectura):
+                pagina, _ = cotizaciones.listar_cotizaciones(lectura, f"Cliente {n}")
+                if not pagina.empty: cotizaciones.cargar_cotizacion(lectura, int(pagina['id'].iloc[0]))
+
+        while not self.parar.is_set():
+            res = self.medir("Cotizar", cotizar)
+            if res:
+                parametros = {"margen_meta": 0.30, "incluir_papel": True, "costo_papel": 2.80, "tipo_fin": "Bancario",
+                              "tasa": 12.0, "plazo": 36, "gracia": 0, "meses": 36}
+                self.medir("Guardar", guardar_y_firmar, conn, f"Cliente {n}", proyecto, parametros, *res)
+            self.medir("Historial", historial)
+            if rng.random() < 0.3: self.medir("Stock", stock.consumos_contratos, lectura)
+            time.sleep(self.pausa * rng.random())
+
+    def editor(self, tam):
+        """Sube y baja el costo de todos los equipos en bloques de `tam`, cada bloque en una transacción."""
+        conn, _ = self.conexiones()
+        guardar = inventario.guardar_equipos.__wrapped__ if self.legado else inventario.guardar_equipos
+        signo = 1
+        while not self.parar.is_set():
+            equipos = pd.read_sql("SELECT id, marca, modelo, costo_adq, residual, mantenimiento FROM equipos", conn)
+            editado = equipos.assign(costo_adq=(equipos['costo_adq'] * (1 + 0.01 * signo)).round(2))
+            for a in range(0, len(equipos), tam):
+                if self.parar.is_set(): break
+                self.medir("Edición Inventario", guardar, conn, equipos.iloc[a:a + tam], editado.iloc[a:a + tam])
+            signo = -signo
+
+    def resumen(self, segundos):
+        filas = []
+        for op in OPERACIONES:
+            lat = np.array(self.latencias[op]) * 1000
+            filas.append({"Operación": op, "OK": lat.size, "Por Segundo": lat.size / segundos,
+                          "p50 (ms)": np.percentile(lat, 50) if lat.size else np.nan,
+                          "p95 (ms)": np.percentile(lat, 95) if lat.size else np.nan, "Errores": self.errores[op]})
+        return pd.DataFrame(filas).set_index("Operación")
+
+
+def correr(usuarios, segundos, n_modelos=1000, lineas=20, tam_edicion=500, pausa=0.05, legado=False):
+    """Corre la carga sobre una base temporal y devuelve (tabla resumen, errores por mensaje)."""
+    with tempfile.TemporaryDirectory() as tmp:
+        ruta = os.path.join(tmp, "carga.db")
+        preparar(ruta, n_modelos, legado)
+        carga = Carga(ruta, legado, lineas, pausa)
+        hilos = [threading.Thread(target=carga.vendedor, args=(i,), daemon=True) for i in range(usuarios)]
+        hilos.append(threading.Thread(target=carga.editor, args=(tam_edicion,), daemon=True))
+        for h in hilos: h.start()
+        t0 = time.perf_counter()
+        time.sleep(segundos)
+        carga.parar.set()
+        for h in hilos: h.join()
+        return carga.resumen(time.perf_counter() - t0), carga.detalle_errores
+
+
+def main(argv=None):
+    p = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    p.add_argument("--usuarios", type=int, default=24, help="vendedores cotizando a la vez")
+    p.add_argument("--segundos", type=float, default=10.0)
+    p.add_argument("--modelos", type=int, default=1000, help="equipos del catálogo sintético")
+    p.add_argument("--lineas", type=int, default=20, help="líneas del proyecto de cada vendedor")
+    p.add_argument("--bloque", type=int, default=500, help="equipos por transacción de la edición en bloque")
+    p.add_argument("--pausa", type=float, default=0.05, help="pausa máxima (s) entre operaciones de un vendedor")
+    p.add_argument("--legado", action="store_true", help="conexión simple con journal clásico y sin reintentos")
+    args = p.parse_args(argv)
+
+    print(f"{args.usuarios} vendedores + 1 editor de inventario, {args.segundos:g} s, "
+          f"{'legado (journal clásico)' if args.legado else 'db.conectar (WAL)'}")
+    tabla, errores = correr(args.usuarios, args.segundos, args.modelos, args.lineas, args.bloque, args.pausa, args.legado)
+    print(tabla.to_string(float_format=lambda v: f"{v:,.1f}"))
+    for msg, n in errores.items(): print(f"  {n} x {msg}")
+    return 1 if errores else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
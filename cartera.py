@@ -0,0 +1,221 @@
+"""Cartera de contratos: flujo, deuda y concentración agregados - MI PC S.A.
+
+Los contratos son las cotizaciones guardadas y firmadas, vigentes con el mismo
+criterio que en stock.py (cotizaciones.filtro_vigentes).
+Cada uno arranca en el mes de su fecha, factura durante `meses` según su plan
+(en Tarifa Plana, más el excedente si el volumen real supera al cotizado,
+como en riesgo.py) y, si se financió, paga la tabla Francesa de
+motor.financiar (con sus cuotas completas, aunque el plazo del préstamo supere
+al contrato; flujo_proyeccion las corta).
+
+Todos los contratos se alinean en un calendario mensual común (columna 0 = el
+mes del primer contrato): cada contrato aporta una matriz (contrato, mes del
+contrato) que se suma al calendario con np.bincount, así que armar la cartera
+es lineal en contratos x meses. Al cambiar un contrato sólo se restan sus
+aportes viejos y se suman los nuevos (Cartera.actualizar).
+"""
+from datetime import date
+
+import numpy as np
+import pandas as pd
+
+from cotizaciones import PLANES, filtro_cliente, filtro_vigentes
+from finanzas import amortizacion_lote, vpn_lote
+from motor import TASA_DESCUENTO
+
+SERIES = ["Ingreso", "OPEX", "Insumos", "Inversión Propia", "Cuota", "Interés", "Capital", "Saldo Deuda", "Neto",
+          "Contratos Activos"]
+POR = ["Cliente", "Modelo"]
+
+# Columnas editables de un contrato (las que usa el cálculo)
+COLS_CONTRATO = ["Fecha", "Meses", "Plan", "Tipo Fin", "Tasa", "Plazo", "Gracia", "Inversión", "Tarifa Plana", "Renta",
+                 "Click", "Precio Único", "Excedente", "Vol. Total", "OPEX Fijo", "OPEX Var"]
+
+
+# --- CONTRATOS ---
+def _filtro(fecha, cliente, vigentes):
+    where, params = filtro_vigentes(fecha) if vigentes else ("q.firmada = 1", [])
+    if cliente: cond, p = filtro_cliente(cliente, "q.cliente"); where += " AND " + cond; params += p
+    return " WHERE " + where, params
+
+
+def contratos(conn, fecha=None, cliente=None, vigentes=True):
+    """Contratos (cotizaciones firmadas) con lo que necesita la cartera y sus líneas por modelo. Devuelve (contratos, lineas).
+
+    Con vigentes=True sólo los que están dentro de su plazo a `fecha` (hoy por
+    defecto). Cada uno con el Plan con que se firmó.
+    """
+    where, params = _filtro(fecha, cliente, vigentes)
+    df = pd.read_sql(
+        "SELECT q.id AS Contrato, q.cliente AS Cliente, q.fecha AS Fecha, q.meses AS Meses, q.plan AS Plan, "
+        "q.tipo_fin AS \"Tipo Fin\", q.tasa AS Tasa, q.plazo AS Plazo, q.gracia AS Gracia, q.inversion AS \"Inversión\", "
+        "q.fact_meta AS \"Tarifa Plana\", "
+        "q.renta AS Renta, q.click AS Click, q.p_unico AS \"Precio Único\", q.excedente AS Excedente, q.vol_total AS \"Vol. Total\", "
+        "SUM(l.opex_fijo) AS \"OPEX Fijo\", SUM(l.opex_var) AS \"OPEX Var\" "
+        f"FROM cotizaciones q JOIN cotizacion_lineas l ON l.cotizacion_id = q.id{where} GROUP BY q.id ORDER BY q.id",
+        conn, params=params)
+    lineas = pd.read_sql(
+        "SELECT l.cotizacion_id AS Contrato, l.modelo AS Modelo, SUM(l.cantidad) AS Cantidad, SUM(l.inversion) AS \"Inversión\" "
+        f"FROM cotizaciones q JOIN cotizacion_lineas l ON l.cotizacion_id = q.id{where} GROUP BY 1, 2 ORDER BY 1, 2",
+        conn, params=params)
+    return df, lineas
+
+
+def _mes_absoluto(fechas):
+    f = pd.to_datetime(pd.Series(fechas).astype(str).str[:10])
+    return (f.dt.year * 12 + f.dt.month - 1).to_numpy(dtype=np.int64)
+
+
+def _aportes(c, inicio, uso):
+    """Aportes de los contratos `c` (DataFrame) al calendario.
+
+    Devuelve (columnas, validas, series): columnas[i, k] es la columna del
+    calendario del mes k del contrato i, validas marca los meses dentro de su
+    duración y series tiene una matriz (n, H) por cada serie de SERIES.
+    """
+    n = len(c)
+    meses = c['Meses'].to_numpy(dtype=np.int64)
+    financiado = (c['Tipo Fin'] != "Propios").to_numpy()
+    plazo = np.where(financiado, c['Plazo'].to_numpy(dtype=np.int64), 0)
+    duracion = np.maximum(meses, plazo)
+    k = np.arange(duracion.max() if n else 0)
+    en_contrato = k < meses[:, None]
+
+    cotizado = c['Vol. Total'].to_numpy(dtype=float)
+    vol = cotizado * uso
+    plan = c['Plan'].to_numpy()
+    ingreso_mes = np.select([plan == "Híbrido", plan == "Variable"],
+                            [c['Renta'].to_numpy(dtype=float) + c['Click'].to_numpy(dtype=float) * vol,
+                             c['Precio Único'].to_numpy(dtype=float) * vol],
+                            c['Tarifa Plana'].to_numpy(dtype=float)
+                            + c['Excedente'].to_numpy(dtype=float) * np.maximum(vol - cotizado, 0))
+    insumos_mes = c['OPEX Var'].to_numpy(dtype=float) * uso
+    inversion = c['Inversión'].to_numpy(dtype=float)
+
+    s = {"Ingreso": ingreso_mes[:, None] * en_contrato, "Insumos": insumos_mes[:, None] * en_contrato}
+    s["OPEX"] = (c['OPEX Fijo'].to_numpy(dtype=float) + insumos_mes)[:, None] * en_contrato
+    s["Inversión Propia"] = np.zeros((n, k.size))
+    if k.size: s["Inversión Propia"][:, 0] = np.where(financiado, 0.0, inversion)
+    for serie in ("Cuota", "Interés", "Capital", "Saldo Deuda"): s[serie] = np.zeros((n, k.size))
+    if financiado.any():
+        lote = amortizacion_lote(inversion[financiado], c['Tasa'].to_numpy(dtype=float)[financiado], plazo[financiado],
+                                 "Francesa", c['Gracia'].to_numpy(dtype=np.int64)[financiado])
+        m = lote["Mes"].size
+        for serie, col in (("Cuota", "Cuota Total"), ("Interés", "Interés"), ("Capital", "Capital"), ("Saldo Deuda", "Saldo")):
+            s[serie][financiado, :m] = lote[col]
+    s["Neto"] = s["Ingreso"] - s["OPEX"] - s["Cuota"] - s["Inversión Propia"]
+    s["Contratos Activos"] = en_contrato.astype(float)
+    return inicio[:, None] + k, k < duracion[:, None], s
+
+
+class Cartera:
+    """Contratos alineados en un calendario mensual común, con las series agregadas.
+
+    `uso` es el volumen real como fracción del cotizado (mueve el ingreso de
+    los planes Híbrido y Variable, el excedente de Tarifa Plana si pasa de 1 y
+    el costo de insumos de todos).
+    """
+    def __init__(self, contratos, lineas=None, uso=1.0, tasa_desc=TASA_DESCUENTO):
+        self.contratos = contratos.reset_index(drop=True).copy()
+        if "Plan" not in self.contratos: self.contratos["Plan"] = PLANES[0]
+        self.lineas = lineas if lineas is not None else pd.DataFrame(columns=["Contrato", "Modelo", "Cantidad", "Inversión"])
+        self.uso, self.tasa_desc = uso, tasa_desc
+        self._armar()
+
+    def _armar(self):
+        c = self.contratos
+        absoluto = _mes_absoluto(c['Fecha']) if len(c) else np.zeros(0, dtype=np.int64)
+        self.origen = int(absoluto.min()) if len(c) else 0
+        self._inicio = absoluto - self.origen
+        self._fila = {int(i): p for p, i in enumerate(c['Contrato'])}
+        columnas, validas, s = _aportes(c, self._inicio, self.uso)
+        largo = int(columnas[validas].max()) + 1 if validas.any() else 0
+        self.series = {n: np.bincount(columnas[validas], weights=s[n][validas], minlength=largo) for n in SERIES}
+        self.contratos["VPN"] = vpn_lote(s["Neto"], self.tasa_desc) if len(c) else np.zeros(0)
+
+    @property
+    def calendario(self):
+        """Meses del calendario como períodos ('AAAA-MM')."""
+        return pd.period_range(pd.Period(year=self.origen // 12, month=self.origen % 12 + 1, freq="M"),
+                               periods=len(self.series["Neto"]), freq="M")
+
+    def columna(self, fecha=None):
+        """Columna del calendario del mes de `fecha` (hoy por defecto); puede caer fuera del calendario."""
+        return int(_mes_absoluto([fecha or date.today()])[0]) - self.origen
+
+    def actualizar(self, contrato, **cambios):
+        """Cambia columnas de COLS_CONTRATO de un contrato y rehace sólo sus aportes.
+
+        Si el contrato pasa a empezar antes del calendario se arma todo de nuevo.
+        """
+        p = self._fila[int(contrato)]
+        fuera = set(cambios) - set(COLS_CONTRATO)
+        if fuera: raise ValueError(f"Columnas no editables: {', '.join(sorted(fuera))}")
+        if "Plan" in cambios and cambios["Plan"] not in PLANES: raise ValueError(f"Plan desconocido: {cambios['Plan']}")
+        self._sumar(p, -1)
+        for col, v in cambios.items(): self.contratos.at[p, col] = v
+        if "Fecha" in cambios:
+            self._inicio[p] = _mes_absoluto([cambios["Fecha"]])[0] - self.origen
+            if self._inicio[p] < 0: return self._armar()
+        self._sumar(p, 1)
+
+    def _sumar(self, p, signo):
+        fila = self.contratos.iloc[[p]]
+        columnas, validas, s = _aportes(fila, self._inicio[[p]], self.uso)
+        columnas = columnas[validas]
+        falta = int(columnas.max()) + 1 - len(self.series["Neto"]) if columnas.size else 0
+        if falta > 0: self.series = {n: np.pad(v, (0, falta)) for n, v in self.series.items()}
+        for n in SERIES: np.add.at(self.series[n], columnas, signo * s[n][validas])
+        if signo > 0: self.contratos.at[p, "VPN"] = float(vpn_lote(s["Neto"], self.tasa_desc)[0])
+
+    # --- RESULTADOS ---
+    def flujo(self):
+        """Una fila por mes del calendario con todas las series y el neto acumulado."""
+        df = pd.DataFrame({"Mes": self.calendario.astype(str), **self.series})
+        df["Acumulado"] = df["Neto"].cumsum()
+        return df
+
+    def vpn(self, desde=None):
+        """VPN del neto agregado desde el mes de `desde` (el primero del calendario por defecto), que se descuenta un período."""
+        j = max(self.columna(desde), 0) if desde is not None else 0
+        return float(vpn_lote(self.series["Neto"][j:], self.tasa_desc)) if j < len(self.series["Neto"]) else 0.0
+
+    def concentracion(self, por="Cliente", corte=None):
+        """Exposición por cliente o modelo desde el mes de `corte` (hoy por defecto).
+
+        Por contrato: Ingreso Mes (el del corte), Ingreso Pendiente (del corte en
+        adelante), Saldo Deuda al cierre del corte y VPN Remanente (descontado
+        desde el corte). Por modelo cada contrato se reparte según la inversión
+        de sus líneas. Participación es la del Ingreso Pendiente; el índice de
+        Herfindahl es la suma de sus cuadrados.
+        """
+        if por not in POR: raise ValueError(f"No se puede agrupar por {por}")
+        c = self.contratos
+        columnas, validas, s = _aportes(c, self._inicio, self.uso)
+        j = self.columna(corte)
+        desde = validas & (columnas >= j)
+        en_corte = validas & (columnas == j)
+        factores = (1 + self.tasa_desc) ** -(columnas - j + 1.0)
+        m = pd.DataFrame({
+            "Contrato": c['Contrato'], "Cliente": c['Cliente'],
+            "Ingreso Mes": (s["Ingreso"] * en_corte).sum(axis=1), "Ingreso Pendiente": (s["Ingreso"] * desde).sum(axis=1),
+            "Saldo Deuda": (s["Saldo Deuda"] * en_corte).sum(axis=1),
+            "VPN Remanente": (s["Neto"] * factores * desde).sum(axis=1),
+        })
+        metricas = ["Ingreso Mes", "Ingreso Pendiente", "Saldo Deuda", "VPN Remanente"]
+        if por == "Modelo":
+            peso = self.lineas.merge(c[['Contrato']], on="Contrato")
+            total = peso.groupby("Contrato")["Inversión"].transform("sum")
+            lineas = peso.groupby("Contrato")["Inversión"].transform("size")
+            peso["Peso"] = (peso["Inversión"] / total.where(total > 0)).fillna(1 / lineas)
+            m = peso[["Contrato", "Modelo", "Peso"]].merge(m, on="Contrato")
+            m[metricas] = m[metricas].mul(m["Peso"], axis=0)
+        g = m.groupby(por).agg(Contratos=("Contrato", "nunique"), **{k: (k, "sum") for k in metricas})
+        total = g["Ingreso Pendiente"].sum()
+        g["Participación"] = g["Ingreso Pendiente"] / total if total else 0.0
+        return g.sort_values("Ingreso Pendiente", ascending=False).reset_index()
+
+
+def cargar(conn, fecha=None, cliente=None, vigentes=True, uso=1.0, tasa_desc=TASA_DESCUENTO):
+    """Cartera de los contratos de la base (ver contratos)."""
+    return Cartera(*contratos(conn, fecha, cliente, vigentes), uso=uso, tasa_desc=tasa_desc)
@@ -0,0 +1,100 @@
+"""Catálogo de costos en memoria - MI PC S.A.
+
+Precalcula, por equipos.id, el costo por página de consumibles y la
+amortización del hardware. El catálogo es único por proceso (por archivo de
+base de datos) y se recarga cuando cambia el contador version_catalogo, que
+los triggers de la base suben en cada escritura sobre equipos o consumibles
+(también las de otros procesos). invalidar_catalogo() lo descarta de inmediato.
+"""
+import itertools
+import threading
+
+MESES_AMORTIZACION = 36
+HOJAS_POR_RESMA = 500
+
+_catalogos = {}
+_lock = threading.Lock()
+_versiones = itertools.count(1)
+
+
+class Catalogo:
+    def __init__(self, conn):
+        # Distinta en cada carga: sirve de clave para cachés que dependen de los precios
+        self.version = next(_versiones)
+        # Contador de la base al cargar: se lee antes que las tablas, así una escritura en el medio fuerza otra carga
+        self.datos = _version_datos(conn)
+        self.equipos = {}
+        self.cpp_consumibles = {}
+        self.ids_por_modelo = {}
+        # Cachés derivadas del catálogo (p. ej. las curvas de costo del optimizador); se descartan con él
+        self.derivados = {}
+        for eq_id, marca, modelo, tipo, velocidad, costo_adq, manto in conn.execute(
+                "SELECT id, marca, modelo, tipo, velocidad, costo_adq, mantenimiento FROM equipos"):
+            costo_adq = _num(costo_adq)
+            self.equipos[eq_id] = {
+                "marca": marca, "modelo": modelo, "tipo": tipo, "velocidad": velocidad, "costo_adq": costo_adq,
+                "manto": _num(manto), "amort_mensual": costo_adq / MESES_AMORTIZACION,
+            }
+            self.cpp_consumibles[eq_id] = 0.0
+            self.ids_por_modelo.setdefault(modelo, eq_id)
+        # Misma suma (y en el mismo orden) que el cálculo por equipo original
+        for eq_id, costo, rend in conn.execute("SELECT equipo_id, costo, rendimiento FROM consumibles ORDER BY id"):
+            if rend is not None and rend > 0:
+                self.cpp_consumibles[eq_id] = self.cpp_consumibles.get(eq_id, 0.0) + _num(costo) / rend
+
+    def detalles(self, equipo_id, volumen_unit, incluir_papel, costo_papel):
+        equipo_id = int(equipo_id)
+        eq = self.equipos[equipo_id]
+        cpp_papel = costo_papel / HOJAS_POR_RESMA if incluir_papel else 0
+        cpp_total = self.cpp_consumibles.get(equipo_id, 0.0) + cpp_papel
+        costo_hw_pag = eq['amort_mensual'] / volumen_unit if volumen_unit > 0 else 0
+        return {
+            "modelo": eq['modelo'], "costo_adq": eq['costo_adq'], "manto": eq['manto'],
+            "cpp": cpp_total, "opex_var": cpp_total * volumen_unit,
+            "amort_mensual": eq['amort_mensual'], "hw_cpp": costo_hw_pag
+        }
+
+
+def _num(x):
+    return float('nan') if x is None else float(x)
+
+
+def _clave(conn):
+    ruta = conn.execute("PRAGMA database_list").fetchone()[2]
+    return ruta or f":memory:{id(conn)}"
+
+
+def _version_datos(conn):
+    return conn.execute("SELECT n FROM version_catalogo").fetchone()[0]
+
+
+def _clave_y_version(conn):
+    """(_clave(conn), _version_datos(conn)) en una sola consulta: se pide en cada obtener_catalogo."""
+    ruta, datos = conn.execute("SELECT file, (SELECT n FROM version_catalogo) FROM pragma_database_list "
+                               "WHERE name = 'main'").fetchone()
+    return ruta or f":memory:{id(conn)}", datos
+
+
+def obtener_catalogo(conn):
+    """Devuelve el catálogo vigente para la base de conn, cargándolo si fue invalidado o cambió la base.
+
+    Dentro de una transacción (p. ej. una instantánea) conn puede ver datos
+    viejos o sin confirmar: el catálogo se carga pero no se guarda para el resto
+    del proceso.
+    """
+    clave, datos = _clave_y_version(conn)
+    cat = _catalogos.get(clave)
+    if cat is not None and cat.datos == datos: return cat
+    if conn.in_transaction: return Catalogo(conn)
+    with _lock:
+        cat = _catalogos.get(clave)
+        if cat is None or cat.datos != datos:
+            cat = _catalogos[clave] = Catalogo(conn)
+    return cat
+
+
+def invalidar_catalogo(conn=None):
+    """Descarta el catálogo de la base de conn (o todos si conn es None)."""
+    with _lock:
+        if conn is None: _catalogos.clear()
+        else: _catalogos.pop(_clave(conn), None)
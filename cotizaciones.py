@@ -0,0 +1,212 @@
+"""Historial de cotizaciones guardadas - MI PC S.A.
+
+Cada cotización se guarda como un snapshot inmutable (triggers en db.py): las
+líneas del Armador, los parámetros (margen, papel, financiamiento) y los
+resultados ya calculados (oferta, flujo y tabla de amortización). Lo único
+que cambia después es si el cliente la firmó y con qué plan (firmar_cotizacion):
+las firmadas son los contratos de la cartera y del stock. Abrir una
+cotización lee esos resultados tal cual, sin recalcular; comparar_con_catalogo
+la vuelve a cotizar con los precios actuales para ver qué cambió.
+
+El listado pagina por cursor (fecha, id) sobre los índices de cliente y fecha
+y sobre cotizacion_modelos, así que cada página cuesta lo mismo sin importar
+cuántas cotizaciones haya guardadas.
+"""
+import json
+import math
+from datetime import date, datetime
+
+import numpy as np
+import pandas as pd
+
+import motor
+from catalogo import obtener_catalogo
+from db import con_reintentos
+from finanzas import COLUMNAS_TABLA
+
+POR_PAGINA = 50
+PLANES = ["Tarifa Plana", "Híbrido", "Variable"]  # planes comerciales con que se firma un contrato
+MAX_MESES_CONTRATO = 60  # tope de los meses de proyección: acota hacia atrás la búsqueda de contratos vigentes
+
+# Columnas de la línea del Armador -> columnas de cotizacion_lineas (en el orden del Armador)
+COLS_LINEA = {
+    "Sede": "sede", "Modelo": "modelo", "Cantidad": "cantidad", "Vol. Unit": "vol_unit", "Vol. Total": "vol_total",
+    "Inversión": "inversion", "OPEX Fijo": "opex_fijo", "OPEX Var": "opex_var", "Eq_ID": "equipo_id",
+    "Costo HW Mes": "costo_hw_mes", "Costo HW Unit": "costo_hw_unit", "Costo Toner Unit": "costo_toner_unit",
+}
+PARAMETROS = ["margen_meta", "incluir_papel", "costo_papel", "tipo_fin", "tasa", "plazo", "gracia", "meses"]
+COLS_LISTADO = ", ".join(f"c.{c}" for c in ["id", "fecha", "cliente", "lineas", "vol_total", "inversion", "tipo_fin",
+                                            "fact_meta", "vpn", "tir", "payback", "firmada", "plan"])
+
+
+def _valor(v):
+    """Escalar nativo de Python (sin numpy) y None en lugar de NaN."""
+    v = v.item() if hasattr(v, 'item') else v
+    return None if isinstance(v, float) and math.isnan(v) else v
+
+
+@con_reintentos
+def guardar_cotizacion(conn, cliente, proyecto, parametros, fin, oferta, flujo, notas="", fecha=None):
+    """Guarda la cotización y devuelve su id.
+
+    `proyecto` son las líneas del Armador, `parametros` un dict con las claves de
+    PARAMETROS, `fin` el resultado de motor.financiar, `oferta` el de
+    motor.oferta_comercial y `flujo` el de motor.flujo_proyeccion.
+    """
+    cliente = (cliente or "").strip()
+    if not cliente: raise ValueError("Falta el cliente")
+    if not proyecto: raise ValueError("El proyecto no tiene líneas")
+    fecha = fecha or datetime.now().isoformat(sep=" ", timespec="seconds")
+    par = {k: _valor(parametros[k]) for k in PARAMETROS}
+    par['incluir_papel'] = int(bool(par['incluir_papel']))
+
+    tabla = fin.get('Tabla')
+    resultados = {
+        "fin": {"Tipo": fin['Tipo'], "Inv": _valor(fin['Inv']), "Int": _valor(fin['Int']), "Plazo": _valor(fin['Plazo']),
+                "Cuotas": [_valor(c) for c in fin['Cuotas']]},
+        "tabla": None if tabla is None or tabla.empty else {c: [_valor(v) for v in tabla[c]] for c in COLUMNAS_TABLA},
+        "oferta": {k: _valor(v) for k, v in oferta.items()},
+        "flujo": {"Neto": [_valor(v) for v in flujo['Neto']], "Acumulado": [_valor(v) for v in flujo['Acumulado']],
+                  "VPN": _valor(flujo['VPN']), "TIR": _valor(flujo['TIR']),
+                  "Payback": _valor(flujo['Payback']), "Payback Desc.": _valor(flujo['Payback Desc.'])},
+    }
+    of, fl = resultados['oferta'], resultados['flujo']
+    with conn:
+        cur = conn.execute(
+            "INSERT INTO cotizaciones (cliente, fecha, notas, margen_meta, incluir_papel, costo_papel, tipo_fin, tasa, plazo, "
+            "gracia, meses, lineas, vol_total, inversion, fact_meta, p_unico, renta, click, excedente, vpn, tir, payback, "
+            "resultados) VALUES (?,?,?,?,?,?,?,?,?,?,?,?,?,?,?,?,?,?,?,?,?,?,?)",
+            (cliente, fecha, notas, *(par[k] for k in PARAMETROS), len(proyecto), of['vol_total'],
+             resultados['fin']['Inv'], of['fact_meta'], of['p_unico'], of['renta'], of['click'], of['excedente'],
+             fl['VPN'], fl['TIR'], fl['Payback'], json.dumps(resultados, separators=(",", ":"))))
+        cot_id = cur.lastrowid
+        conn.executemany(
+            f"INSERT INTO cotizacion_lineas (cotizacion_id, orden, {', '.join(COLS_LINEA.values())}) "
+            f"VALUES (?,?,{','.join('?' * len(COLS_LINEA))})",
+            [(cot_id, i, *(_valor(l[c]) for c in COLS_LINEA)) for i, l in enumerate(proyecto)])
+        conn.executemany("INSERT INTO cotizacion_modelos (modelo, fecha, cotizacion_id) VALUES (?,?,?)",
+                         [(m, fecha, cot_id) for m in {l['Modelo'] for l in proyecto}])
+    return cot_id
+
+
+@con_reintentos
+def firmar_cotizacion(conn, cot_id, firmada=True, plan=PLANES[0]):
+    """Marca la cotización como firmada con el plan comercial elegido (o anula la firma)."""
+    if plan not in PLANES: raise ValueError(f"Plan desconocido: {plan}")
+    with conn:
+        if conn.execute("UPDATE cotizaciones SET firmada = ?, plan = ? WHERE id = ?",
+                        (int(bool(firmada)), plan, int(cot_id))).rowcount == 0:
+            raise ValueError(f"No existe la cotización #{cot_id}")
+
+
+def filtro_cliente(cliente, col="c.cliente"):
+    """Condición SQL y parámetros para filtrar `col` por prefijo de cliente (sin distinguir mayúsculas)."""
+    return f"{col} LIKE ? ESCAPE '\\'", [cliente.strip().replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_") + "%"]
+
+
+def filtro_vigentes(fecha=None, alias="q"):
+    """Condición SQL y parámetros de los contratos (firmadas) vigentes a `fecha` (hoy por defecto).
+
+    Vigente: firmada, con fecha hasta ese día y dentro de sus `meses`. La cota
+    de MAX_MESES_CONTRATO hacia atrás deja usar el índice de fecha.
+    """
+    fecha = str(fecha or date.today())
+    return (f"{alias}.firmada = 1 AND {alias}.fecha >= date(?, ?) AND {alias}.fecha <= ? || ' 23:59:59' "
+            f"AND date({alias}.fecha, '+' || {alias}.meses || ' months') > date(?)",
+            [fecha, f"-{MAX_MESES_CONTRATO} months", fecha, fecha])
+
+
+def listar_cotizaciones(conn, cliente=None, modelo=None, desde=None, hasta=None, despues_de=None, limite=POR_PAGINA):
+    """Página de cotizaciones, de la más reciente a la más antigua.
+
+    `cliente` filtra por prefijo (sin distinguir mayúsculas), `modelo` por equipo
+    cotizado y `desde`/`hasta` por día (date o 'AAAA-MM-DD', inclusive). Para la
+    página siguiente se pasa el cursor devuelto en `despues_de`. Devuelve
+    (DataFrame, cursor o None si no hay más).
+    """
+    # Sólo con modelo se recorre cotizacion_modelos, que ya está en orden de fecha para ese modelo;
+    # con cliente manda su índice y el modelo se verifica por clave primaria
+    por_modelo = modelo and not cliente
+    fecha, ident = ("m.fecha", "m.cotizacion_id") if por_modelo else ("c.fecha", "c.id")
+    where, params = [], []
+    if por_modelo: where.append("m.modelo = ?"); params.append(modelo)
+    elif modelo:
+        where.append("EXISTS (SELECT 1 FROM cotizacion_modelos m WHERE m.modelo = ? AND m.fecha = c.fecha AND m.cotizacion_id = c.id)")
+        params.append(modelo)
+    if cliente: cond, p = filtro_cliente(cliente); where.append(cond); params += p
+    if desde: where.append(f"{fecha} >= ?"); params.append(str(desde))
+    if hasta: where.append(f"{fecha} <= ?"); params.append(f"{hasta} 23:59:59")
+    if despues_de: where.append(f"({fecha}, {ident}) < (?, ?)"); params.extend(despues_de)
+    sql = f"SELECT {COLS_LISTADO} FROM " + (
+        "cotizacion_modelos m JOIN cotizaciones c ON c.id = m.cotizacion_id" if por_modelo else "cotizaciones c")
+    if where: sql += " WHERE " + " AND ".join(where)
+    df = pd.read_sql(f"{sql} ORDER BY {fecha} DESC, {ident} DESC LIMIT ?", conn, params=params + [limite + 1])
+    if len(df) <= limite: return df, None
+    df = df.iloc[:limite]
+    return df, (df['fecha'].iloc[-1], int(df['id'].iloc[-1]))
+
+
+def cargar_cotizacion(conn, cot_id):
+    """Snapshot completo de la cotización (None si no existe), con los resultados guardados.
+
+    Devuelve un dict con id, cliente, fecha, notas, firmada, plan, 'parametros', 'proyecto'
+    (líneas del Armador) y 'fin', 'oferta' y 'flujo' en el mismo formato que motor.
+    """
+    cur = conn.execute("SELECT * FROM cotizaciones WHERE id=?", (int(cot_id),))
+    fila = cur.fetchone()
+    if fila is None: return None
+    cab = dict(zip([d[0] for d in cur.description], fila))
+    res = json.loads(cab['resultados'])
+
+    cur = conn.execute(f"SELECT {', '.join(COLS_LINEA.values())} FROM cotizacion_lineas WHERE cotizacion_id=? ORDER BY orden",
+                       (int(cot_id),))
+    proyecto = [dict(zip(COLS_LINEA, l)) for l in cur]
+
+    fin = res['fin']
+    fin['Tabla'] = pd.DataFrame(res['tabla'], columns=COLUMNAS_TABLA) if res['tabla'] else pd.DataFrame()
+    flujo = res['flujo']
+    flujo['Neto'] = np.array(flujo['Neto'], dtype=float); flujo['Acumulado'] = np.array(flujo['Acumulado'], dtype=float)
+    if flujo['TIR'] is None: flujo['TIR'] = float('nan')
+
+    parametros = {k: cab[k] for k in PARAMETROS}
+    parametros['incluir_papel'] = bool(parametros['incluir_papel'])
+    return {"id": cab['id'], "cliente": cab['cliente'], "fecha": cab['fecha'], "notas": cab['notas'], "firmada": bool(cab['firmada']),
+            "plan": cab['plan'],
+            "parametros": parametros, "proyecto": proyecto, "fin": fin, "oferta": res['oferta'], "flujo": flujo}
+
+
+def comparar_con_catalogo(conn, cot):
+    """Re-cotiza el snapshot con los precios actuales del catálogo.
+
+    Devuelve (líneas, resumen): por línea la inversión y el OPEX guardados vs
+    actuales, y el resumen de precios de la oferta guardada vs la actual (vacío
+    si algún equipo ya no está en el catálogo).
+    """
+    cat = obtener_catalogo(conn)
+    par = cot['parametros']
+    costo_papel = par['costo_papel'] if par['incluir_papel'] else 0
+    filas, actual = [], []
+    for l in cot['proyecto']:
+        fila = {"Sede": l['Sede'], "Modelo": l['Modelo']}
+        nueva = None
+        if l['Eq_ID'] in cat.equipos:
+            nueva = motor.linea_proyecto(conn, l['Sede'], l['Eq_ID'], l['Cantidad'], l['Vol. Unit'], par['incluir_papel'], costo_papel, cat)
+            actual.append(nueva)
+        fila["Estado"] = "Sin cambios" if nueva and all(
+            math.isclose(nueva[c], l[c], rel_tol=1e-9) for c in ("Inversión", "OPEX Fijo", "OPEX Var")) else (
+            "Cambió" if nueva else "Eliminado del catálogo")
+        for c in ("Inversión", "OPEX Fijo", "OPEX Var"):
+            fila[c] = l[c]; fila[f"{c} Actual"] = nueva[c] if nueva else float('nan')
+        filas.append(fila)
+    lineas = pd.DataFrame(filas)
+
+    if len(actual) < len(cot['proyecto']): return lineas, pd.DataFrame()
+    fin = motor.financiar(sum(p['Inversión'] for p in actual), par['tipo_fin'], par['tasa'], par['plazo'], par['gracia'], tabla=False)
+    oferta = motor.oferta_comercial(actual, fin, par['margen_meta'])
+    etiquetas = {"costo_total_real": "Costo Mensual", "fact_meta": "Tarifa Plana", "p_unico": "Precio Único",
+                 "renta": "Renta Híbrido", "click": "Click Híbrido", "excedente": "Excedente"}
+    resumen = pd.DataFrame([{"Concepto": "Inversión", "Guardado": cot['fin']['Inv'], "Actual": fin['Inv']}] +
+                           [{"Concepto": e, "Guardado": cot['oferta'][k], "Actual": oferta[k]} for k, e in etiquetas.items()])
+    resumen["Δ"] = resumen["Actual"] - resumen["Guardado"]
+    resumen["Δ %"] = resumen["Δ"] / resumen["Guardado"].where(resumen["Guardado"] != 0)
+    return lineas, resumen
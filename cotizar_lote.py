@@ -0,0 +1,109 @@
+"""Cotización masiva por línea de comandos (JSONL in, cotizaciones out) - MI PC S.A.
+
+Cada línea de la entrada es un proyecto:
+
+    {"id": "LIC-001", "margen_meta": 0.30, "incluir_papel": true, "costo_papel": 2.80,
+     "financiamiento": {"tipo": "Bancario", "tasa": 12.0, "plazo": 36, "gracia": 0},
+     "meses": 36,
+     "lineas": [{"sede": "Quito", "modelo": "MFC-L6915DW", "cantidad": 3, "vol_unit": 3000}]}
+
+Cada línea de la salida es la cotización (o {"id": ..., "error": ...}) en el
+mismo orden que la entrada. El archivo se procesa en streaming: sólo hay
+`procesos * bloque * 4` proyectos en memoria a la vez.
+
+    python cotizar_lote.py licitaciones.jsonl cotizaciones.jsonl --procesos 8
+"""
+import argparse
+import json
+import os
+import sys
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from itertools import islice
+
+from db import RUTA_DB, _abrir, init_db
+from motor import cotizar
+
+_conn = None
+
+
+def _iniciar_worker(ruta_db):
+    global _conn
+    _conn = _abrir(ruta_db, solo_lectura=True)
+
+
+def _cotizar_linea(linea):
+    """Devuelve (json de salida, hubo_error)."""
+    try:
+        definicion = json.loads(linea)
+    except ValueError as e:
+        return json.dumps({"id": None, "error": f"JSON inválido: {e}"}, ensure_ascii=False), True
+    try:
+        return json.dumps(cotizar(_conn, definicion), ensure_ascii=False), False
+    except Exception as e:
+        id_ = definicion.get('id') if isinstance(definicion, dict) else None
+        return json.dumps({"id": id_, "error": f"{type(e).__name__}: {e}"}, ensure_ascii=False), True
+
+
+def _cotizar_bloque(lineas):
+    return [_cotizar_linea(l) for l in lineas]
+
+
+def _bloques(entrada, tam):
+    lineas = (l for l in entrada if l.strip())
+    while True:
+        bloque = list(islice(lineas, tam))
+        if not bloque: return
+        yield bloque
+
+
+def cotizar_archivo(entrada, salida, ruta_db=RUTA_DB, procesos=None, bloque=64):
+    """Cotiza el stream `entrada` y escribe en `salida`. Devuelve (total, errores)."""
+    procesos = procesos or os.cpu_count() or 1
+    total = errores = 0
+
+    def escribir(resultados):
+        nonlocal total, errores
+        for r, error in resultados:
+            salida.write(r + "\n")
+            total += 1; errores += error
+
+    if procesos == 1:
+        _iniciar_worker(ruta_db)
+        for b in _bloques(entrada, bloque): escribir(_cotizar_bloque(b))
+        return total, errores
+
+    # Ventana acotada de bloques en vuelo: memoria constante y salida en orden
+    with ProcessPoolExecutor(procesos, initializer=_iniciar_worker, initargs=(ruta_db,)) as pool:
+        pendientes = deque()
+        for b in _bloques(entrada, bloque):
+            pendientes.append(pool.submit(_cotizar_bloque, b))
+            if len(pendientes) >= procesos * 4: escribir(pendientes.popleft().result())
+        while pendientes: escribir(pendientes.popleft().result())
+    return total, errores
+
+
+def main(argv=None):
+    p = argparse.ArgumentParser(description="Cotiza proyectos en lote desde un archivo JSONL.")
+    p.add_argument("entrada", help="archivo JSONL de proyectos ('-' para stdin)")
+    p.add_argument("salida", help="archivo JSONL de cotizaciones ('-' para stdout)")
+    p.add_argument("--db", default=RUTA_DB, help=f"base SQLite del catálogo (default: {RUTA_DB})")
+    p.add_argument("--procesos", type=int, default=None, help="procesos en paralelo (default: núcleos disponibles)")
+    p.add_argument("--bloque", type=int, default=64, help="proyectos por tarea enviada a cada proceso")
+    args = p.parse_args(argv)
+
+    if not os.path.exists(args.db): p.error(f"no existe la base {args.db}")
+    init_db(args.db).close()  # migraciones pendientes: los procesos abren la base de sólo lectura
+    fin = sys.stdin if args.entrada == "-" else open(args.entrada, encoding="utf-8")
+    fout = sys.stdout if args.salida == "-" else open(args.salida, "w", encoding="utf-8")
+    try:
+        total, errores = cotizar_archivo(fin, fout, args.db, args.procesos, args.bloque)
+    finally:
+        if fin is not sys.stdin: fin.close()
+        if fout is not sys.stdout: fout.close()
+    print(f"{total} proyectos cotizados, {errores} con error", file=sys.stderr)
+    return 1 if errores else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,220 @@
+"""Base de datos SQLite (esquema, pre-carga y conexiones) - MI PC S.A.
+
+sqlite3 no deja usar una conexión fuera del hilo que la creó, así que
+conectar() da una conexión por hilo (se cierra sola cuando el hilo termina).
+Streamlit corre cada ejecución de una sesión en un hilo nuevo: ahí se pasa
+`sesion` y las conexiones se guardan en ella y sirven a todas sus ejecuciones,
+que nunca corren a la vez (se cierran cuando la sesión se descarta).
+
+La base está en modo WAL: los lectores no bloquean al que escribe ni al revés,
+y las conexiones de sólo lectura ven la última versión confirmada (o una
+instantánea fija dentro de instantanea()). Las escrituras abren la transacción con BEGIN IMMEDIATE y
+esperan hasta ESPERA_BLOQUEO a que se libere el lock; si aun así la base
+sigue bloqueada, con_reintentos repite la operación completa.
+"""
+import functools
+import os
+import random
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+from urllib.parse import quote
+
+RUTA_DB = 'mipc_mps_v9_1.db'
+ESPERA_BLOQUEO = 10.0  # segundos (busy_timeout) que una conexión espera un lock antes de fallar
+REINTENTOS = 5
+PAUSA_REINTENTO = 0.05  # segundos antes del primer reintento; se duplica en cada uno
+
+# Migraciones en orden; PRAGMA user_version guarda cuántas se aplicaron
+MIGRACIONES = [
+    # 1: índices para las búsquedas por equipo y por marca/modelo
+    ["CREATE INDEX IF NOT EXISTS idx_consumibles_equipo ON consumibles(equipo_id)",
+     "CREATE INDEX IF NOT EXISTS idx_equipos_marca_modelo ON equipos(marca, modelo)"],
+    # 2: historial de cotizaciones (snapshots inmutables, ver cotizaciones.py)
+    ['''CREATE TABLE IF NOT EXISTS cotizaciones
+        (id INTEGER PRIMARY KEY, cliente TEXT NOT NULL COLLATE NOCASE, fecha TEXT NOT NULL, notas TEXT,
+         margen_meta REAL, incluir_papel INTEGER, costo_papel REAL,
+         tipo_fin TEXT, tasa REAL, plazo INTEGER, gracia INTEGER, meses INTEGER,
+         lineas INTEGER, vol_total REAL, inversion REAL, fact_meta REAL, p_unico REAL, renta REAL, click REAL,
+         excedente REAL, vpn REAL, tir REAL, payback INTEGER, resultados TEXT)''',
+     '''CREATE TABLE IF NOT EXISTS cotizacion_lineas
+        (cotizacion_id INTEGER NOT NULL, orden INTEGER NOT NULL, sede TEXT, equipo_id INTEGER, modelo TEXT,
+         cantidad INTEGER, vol_unit REAL, vol_total REAL, inversion REAL, opex_fijo REAL, opex_var REAL,
+         costo_hw_mes REAL, costo_hw_unit REAL, costo_toner_unit REAL,
+         PRIMARY KEY (cotizacion_id, orden), FOREIGN KEY(cotizacion_id) REFERENCES cotizaciones(id))''',
+     "CREATE INDEX IF NOT EXISTS idx_cotizaciones_fecha ON cotizaciones(fecha)",
+     "CREATE INDEX IF NOT EXISTS idx_cotizaciones_cliente ON cotizaciones(cliente, fecha)",
+     # modelos de cada cotización (sin repetir) ordenados por fecha, para paginar por modelo sin ordenar
+     '''CREATE TABLE IF NOT EXISTS cotizacion_modelos
+        (modelo TEXT NOT NULL, fecha TEXT NOT NULL, cotizacion_id INTEGER NOT NULL,
+         PRIMARY KEY (modelo, fecha, cotizacion_id)) WITHOUT ROWID''',
+     '''CREATE TRIGGER IF NOT EXISTS cotizaciones_inmutables BEFORE UPDATE ON cotizaciones
+        BEGIN SELECT RAISE(ABORT, 'Las cotizaciones guardadas no se modifican'); END''',
+     '''CREATE TRIGGER IF NOT EXISTS cotizacion_lineas_inmutables BEFORE UPDATE ON cotizacion_lineas
+        BEGIN SELECT RAISE(ABORT, 'Las cotizaciones guardadas no se modifican'); END'''],
+    # 3: contador de cambios del catálogo (ver catalogo.obtener_catalogo); los triggers lo suben en cada
+    # escritura sobre equipos o consumibles, venga de la app, de otro proceso o de otra herramienta
+    ["CREATE TABLE IF NOT EXISTS version_catalogo (n INTEGER NOT NULL)",
+     "INSERT INTO version_catalogo SELECT 0 WHERE NOT EXISTS (SELECT 1 FROM version_catalogo)",
+     *[f"CREATE TRIGGER IF NOT EXISTS {tabla}_{op.lower()}_version AFTER {op} ON {tabla} "
+       "BEGIN UPDATE version_catalogo SET n = n + 1; END"
+       for tabla in ("equipos", "consumibles") for op in ("INSERT", "UPDATE", "DELETE")]],
+    # 4: estado del contrato: sólo las cotizaciones firmadas entran a la cartera y al stock. `firmada` es lo
+    # único que se puede cambiar de una cotización guardada
+    ["ALTER TABLE cotizaciones ADD COLUMN firmada INTEGER NOT NULL DEFAULT 0",
+     "DROP TRIGGER IF EXISTS cotizaciones_inmutables",
+     '''CREATE TRIGGER cotizaciones_inmutables BEFORE UPDATE OF id, cliente, fecha, notas, margen_meta, incluir_papel,
+        costo_papel, tipo_fin, tasa, plazo, gracia, meses, lineas, vol_total, inversion, fact_meta, p_unico, renta, click,
+        excedente, vpn, tir, payback, resultados ON cotizaciones
+        BEGIN SELECT RAISE(ABORT, 'Las cotizaciones guardadas no se modifican'); END''',
+     "CREATE INDEX IF NOT EXISTS idx_cotizaciones_firmadas ON cotizaciones(fecha) WHERE firmada = 1"],
+    # 5: plan comercial con que se firmó el contrato (cotizaciones.PLANES); como `firmada`, se puede cambiar
+    ["ALTER TABLE cotizaciones ADD COLUMN plan TEXT NOT NULL DEFAULT 'Tarifa Plana'"],
+]
+
+
+_inicializadas = set()  # rutas con esquema, pre-carga y migraciones ya aplicados en este proceso
+_lock = threading.Lock()
+_local = threading.local()
+
+
+def _en_memoria(ruta):
+    return ruta in ("", ":memory:")
+
+
+def _abrir(ruta, solo_lectura=False, factory=sqlite3.Connection, entre_hilos=False):
+    if solo_lectura and not _en_memoria(ruta):
+        return sqlite3.connect(f"file:{quote(os.path.abspath(ruta))}?mode=ro", uri=True, timeout=ESPERA_BLOQUEO,
+                               factory=factory, check_same_thread=not entre_hilos)
+    # BEGIN IMMEDIATE: quien va a escribir toma el lock al empezar y espera ahí, en vez de fallar al querer
+    # pasar de lectura a escritura en medio de la transacción
+    conn = sqlite3.connect(ruta, timeout=ESPERA_BLOQUEO, factory=factory, isolation_level="IMMEDIATE",
+                           check_same_thread=not entre_hilos)
+    conn.execute("PRAGMA synchronous = NORMAL")  # seguro con WAL: sólo se arriesga la última transacción ante un corte de luz
+    return conn
+
+
+def init_db(ruta=RUTA_DB, factory=sqlite3.Connection, entre_hilos=False):
+    """Abre una conexión de escritura nueva; esquema, pre-carga y migraciones corren sólo la primera vez por proceso y archivo."""
+    conn = _abrir(ruta, factory=factory, entre_hilos=entre_hilos)
+    clave = None if _en_memoria(ruta) else os.path.abspath(ruta)
+    if clave in _inicializadas: return conn
+    with _lock:
+        if clave not in _inicializadas:
+            _crear(conn)
+            if clave: _inicializadas.add(clave)
+    return conn
+
+
+def conectar(ruta=RUTA_DB, solo_lectura=False, factory=sqlite3.Connection, sesion=None):
+    """Conexión del hilo actual (o de `sesion`) para (ruta, solo_lectura, factory), creada la primera vez que se pide.
+
+    `sesion` es un dict que vive lo que la sesión (p. ej. st.session_state);
+    quien lo pasa garantiza que sus conexiones no se usan desde dos hilos a la
+    vez. Las de sólo lectura no pueden escribir ni tomar locks de escritura; en
+    una base en memoria no existen y se devuelve la de escritura.
+    """
+    if sesion is None: conexiones = _local.__dict__.setdefault("conexiones", {})
+    else: conexiones = sesion.setdefault("_conexiones_db", {})
+    clave = (ruta, solo_lectura and not _en_memoria(ruta), factory)
+    conn = conexiones.get(clave)
+    if conn is None:
+        if clave[1]:
+            if os.path.abspath(ruta) not in _inicializadas: conectar(ruta, False, factory, sesion)
+            conn = _abrir(ruta, True, factory, entre_hilos=sesion is not None)
+        else:
+            conn = init_db(ruta, factory, entre_hilos=sesion is not None)
+        conexiones[clave] = conn
+    return conn
+
+
+@contextmanager
+def instantanea(conn):
+    """Todas las lecturas del bloque ven la base en el mismo momento (una transacción de lectura, que en WAL no bloquea a nadie)."""
+    if conn.in_transaction:
+        yield conn
+        return
+    conn.execute("BEGIN")
+    try:
+        yield conn
+    finally:
+        conn.rollback()
+
+
+def _bloqueada(e):
+    return isinstance(e, sqlite3.OperationalError) and ("locked" in str(e) or "busy" in str(e))
+
+
+def con_reintentos(func):
+    """Repite la escritura completa si falla por base bloqueada, con espera exponencial y aleatoria.
+
+    La función debe hacer toda su escritura en una transacción (`with conn:`),
+    que se revierte sola si falla.
+    """
+    @functools.wraps(func)
+    def envoltura(*args, **kwargs):
+        for intento in range(REINTENTOS):
+            try:
+                return func(*args, **kwargs)
+            except sqlite3.OperationalError as e:
+                if not _bloqueada(e) or intento == REINTENTOS - 1: raise
+                time.sleep(PAUSA_REINTENTO * 2 ** intento * (0.5 + random.random()))
+    return envoltura
+
+
+def _crear(conn):
+    conn.execute("PRAGMA journal_mode = WAL")  # queda guardado en el archivo
+    # Esquema y pre-carga en una transacción: otro proceso que inicializa a la vez espera y ya ve los equipos
+    conn.execute("BEGIN IMMEDIATE")
+    c = conn.cursor()
+    c.execute('''CREATE TABLE IF NOT EXISTS equipos
+                 (id INTEGER PRIMARY KEY, marca TEXT, modelo TEXT, tipo TEXT, 
+                  velocidad INTEGER, costo_adq REAL, residual REAL, vida_util INTEGER, mantenimiento REAL)''')
+    c.execute('''CREATE TABLE IF NOT EXISTS consumibles
+                 (id INTEGER PRIMARY KEY, equipo_id INTEGER, tipo TEXT, costo REAL, rendimiento INTEGER,
+                  FOREIGN KEY(equipo_id) REFERENCES equipos(id))''')
+    
+    # Pre-carga
+    c.execute("SELECT count(*) FROM equipos")
+    if c.fetchone()[0] == 0:
+        # L6915DW
+        c.execute("INSERT INTO equipos (marca, modelo, costo_adq, residual, vida_util, mantenimiento) VALUES (?,?,?,?,?,?)", ("Brother", "MFC-L6915DW", 885.00, 50.00, 36, 20.00))
+        id_1 = c.lastrowid
+        c.execute("INSERT INTO consumibles (equipo_id, tipo, costo, rendimiento) VALUES (?,?,?,?)", (id_1, "Toner", 145.48, 25000))
+        c.execute("INSERT INTO consumibles (equipo_id, tipo, costo, rendimiento) VALUES (?,?,?,?)", (id_1, "Drum", 97.19, 75000))
+        c.execute("INSERT INTO consumibles (equipo_id, tipo, costo, rendimiento) VALUES (?,?,?,?)", (id_1, "Fuser", 185.00, 200000))
+        # L6900DW
+        c.execute("INSERT INTO equipos (marca, modelo, costo_adq, residual, vida_util, mantenimiento) VALUES (?,?,?,?,?,?)", ("Brother", "MFC-L6900DW", 856.00, 50.00, 36, 20.00))
+        id_2 = c.lastrowid
+        c.execute("INSERT INTO consumibles (equipo_id, tipo, costo, rendimiento) VALUES (?,?,?,?)", (id_2, "Toner", 112.50, 20000))
+        c.execute("INSERT INTO consumibles (equipo_id, tipo, costo, rendimiento) VALUES (?,?,?,?)", (id_2, "Drum", 86.89, 50000))
+        c.execute("INSERT INTO consumibles (equipo_id, tipo, costo, rendimiento) VALUES (?,?,?,?)", (id_2, "Fuser", 185.00, 200000))
+        # Color
+        c.execute("INSERT INTO equipos (marca, modelo, costo_adq, residual, vida_util, mantenimiento) VALUES (?,?,?,?,?,?)", ("Brother", "MFC-L9630CDN", 1275.00, 50.00, 36, 20.00))
+        id_3 = c.lastrowid
+        c.execute("INSERT INTO consumibles (equipo_id, tipo, costo, rendimiento) VALUES (?,?,?,?)", (id_3, "Toner CMYK", 492.00, 10000))
+        c.execute("INSERT INTO consumibles (equipo_id, tipo, costo, rendimiento) VALUES (?,?,?,?)", (id_3, "Drum", 178.64, 100000))
+        c.execute("INSERT INTO consumibles (equipo_id, tipo, costo, rendimiento) VALUES (?,?,?,?)", (id_3, "Fuser", 185.00, 200000))
+    conn.commit()
+    migrar(conn)
+
+
+def migrar(conn):
+    """Aplica las migraciones pendientes, cada una en su transacción junto con PRAGMA user_version.
+
+    sqlite3 no abre transacción antes de un CREATE o un ALTER, así que se abre
+    a mano con BEGIN IMMEDIATE: si otro proceso está migrando se espera a que
+    termine y user_version se vuelve a leer dentro de la transacción.
+    """
+    while True:
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            version = conn.execute("PRAGMA user_version").fetchone()[0]
+            if version >= len(MIGRACIONES): return conn.rollback()
+            for sql in MIGRACIONES[version]: conn.execute(sql)
+            conn.execute(f"PRAGMA user_version = {version + 1}")
+            conn.commit()
+        except BaseException:
+            conn.rollback()
+            raise
@@ -0,0 +1,170 @@
+"""Motor financiero vectorizado (NumPy) - MI PC S.A.
+
+Las tablas de amortización se calculan en forma cerrada, como columnas de
+arrays, en lugar de construirse mes a mes. Todas las funciones aceptan
+escalares o arrays de (monto, tasa, plazo, gracia) y devuelven matrices de
+forma (n_tablas, max_plazo), con ceros después del plazo de cada tabla.
+"""
+import numpy as np
+import pandas as pd
+
+COLUMNAS_TABLA = ["Mes", "Cuota Total", "Interés", "Capital", "Saldo"]
+
+
+# --- AMORTIZACIÓN EN LOTE ---
+def amortizacion_lote(montos, tasas_anuales, plazos, tipos="Francesa", gracias=0):
+    """Calcula n tablas (Francesa/Alemana, con gracia) de una sola vez.
+
+    Devuelve un dict con 'Mes' (1..max_plazo), las matrices 'Cuota Total',
+    'Interés', 'Capital' y 'Saldo' de forma (n, max_plazo) y los parámetros
+    de entrada ya expandidos ('Monto', 'Tasa', 'Plazo', 'Tipo', 'Gracia').
+    """
+    monto, tasa, plazo, tipo, gracia = np.broadcast_arrays(
+        np.atleast_1d(np.asarray(montos, dtype=float)),
+        np.atleast_1d(np.asarray(tasas_anuales, dtype=float)),
+        np.atleast_1d(np.asarray(plazos, dtype=np.int64)),
+        np.atleast_1d(np.asarray(tipos)),
+        np.atleast_1d(np.asarray(gracias, dtype=np.int64)),
+    )
+    n = monto.shape[0]
+    max_plazo = int(plazo.max()) if n else 0
+    mes = np.arange(1, max_plazo + 1)
+
+    r = (tasa / 100 / 12)[:, None]
+    p = monto[:, None]
+    g = gracia[:, None]
+    n_pago = (plazo - gracia)[:, None]
+    francesa = (tipo == "Francesa")[:, None]
+
+    # k = número de cuota con capital (1..n_pago); 0 durante la gracia
+    k = mes[None, :] - g
+    en_plazo = mes[None, :] <= plazo[:, None]
+    en_gracia = (k <= 0) & en_plazo
+    en_pago = (k > 0) & en_plazo
+    k_prev = np.maximum(k - 1, 0)
+
+    with np.errstate(divide="ignore", invalid="ignore", over="ignore"):
+        # Francesa: cuota constante y saldo cerrado B_{k-1} = P(1+r)^(k-1) - c((1+r)^(k-1)-1)/r
+        fac_n = (1 + r) ** n_pago
+        cuota_fr = np.where(r > 0, p * r * fac_n / (fac_n - 1), p / n_pago)
+        fac_k = (1 + r) ** k_prev
+        saldo_fr = np.where(r > 0, p * fac_k - cuota_fr * (fac_k - 1) / r, p - cuota_fr * k_prev)
+        # Alemana: amortización constante
+        amort_al = p / n_pago
+        saldo_al = p - amort_al * k_prev
+
+    cuota_fr = np.where(n_pago > 0, cuota_fr, 0.0)
+    amort_al = np.where(n_pago > 0, amort_al, 0.0)
+    saldo_ini = np.where(en_gracia, p, np.where(francesa, saldo_fr, saldo_al))
+    saldo_ini = np.maximum(saldo_ini, 0.0)
+
+    interes = saldo_ini * r
+    capital = np.where(francesa, cuota_fr - interes, amort_al)
+    capital = np.where(en_pago, capital, 0.0)
+    cuota = interes + capital
+    saldo = np.maximum(saldo_ini - capital, 0.0)
+
+    cero = ~en_plazo
+    return {
+        "Mes": mes,
+        "Cuota Total": np.where(cero, 0.0, cuota),
+        "Interés": np.where(cero, 0.0, interes),
+        "Capital": capital,
+        "Saldo": np.where(cero, 0.0, saldo),
+        "Monto": monto, "Tasa": tasa, "Plazo": plazo, "Tipo": tipo, "Gracia": gracia,
+    }
+
+
+def tabla_desde_lote(lote, i):
+    """Extrae la tabla i del lote como DataFrame (mismo formato que calcular_amortizacion)."""
+    m = int(lote["Plazo"][i])
+    return pd.DataFrame({
+        "Mes": lote["Mes"][:m],
+        "Cuota Total": lote["Cuota Total"][i, :m],
+        "Interés": lote["Interés"][i, :m],
+        "Capital": lote["Capital"][i, :m],
+        "Saldo": lote["Saldo"][i, :m],
+    }, columns=COLUMNAS_TABLA)
+
+
+def calcular_amortizacion(monto, tasa_anual, meses, tipo, gracia=0):
+    lote = amortizacion_lote(monto, tasa_anual, meses, tipo, gracia)
+    return tabla_desde_lote(lote, 0)
+
+
+def resumen_lote(montos, tasas_anuales, plazos, tipos="Francesa", gracias=0, etiquetas=None):
+    """Compara ofertas de financiamiento lado a lado (una fila por oferta)."""
+    lote = amortizacion_lote(montos, tasas_anuales, plazos, tipos, gracias)
+    cuotas = lote["Cuota Total"]
+    n = cuotas.shape[0]
+    return pd.DataFrame({
+        "Oferta": list(etiquetas) if etiquetas is not None else [f"Oferta {i + 1}" for i in range(n)],
+        "Tipo": lote["Tipo"], "Monto": lote["Monto"], "Tasa Anual (%)": lote["Tasa"],
+        "Plazo": lote["Plazo"], "Gracia": lote["Gracia"],
+        "Cuota Promedio": cuotas.sum(axis=1) / np.maximum(lote["Plazo"], 1),
+        "Cuota Máxima": cuotas.max(axis=1, initial=0.0),
+        "Interés Total": lote["Interés"].sum(axis=1),
+        "Total Pagado": cuotas.sum(axis=1),
+    })
+
+
+# --- FLUJOS EN LOTE (VPN, TIR, PAYBACK) ---
+def factores_descuento(meses, tasa_desc):
+    return (1 + tasa_desc) ** -np.arange(1, meses + 1, dtype=float)
+
+
+def vpn_lote(netos, tasa_desc):
+    """VPN de cada flujo (última dimensión = meses, el mes 1 se descuenta un período)."""
+    netos = np.asarray(netos, dtype=float)
+    return netos @ factores_descuento(netos.shape[-1], tasa_desc)
+
+
+def tir_lote(netos, r_min=-0.99, r_max=10.0, iteraciones=100, tol=1e-12):
+    """TIR mensual de cada flujo (Newton protegido por bisección, vectorizado).
+
+    NaN si el VPN no cambia de signo entre r_min y r_max.
+    """
+    netos = np.asarray(netos, dtype=float)
+    forma = netos.shape[:-1]
+    netos = netos.reshape(-1, netos.shape[-1])
+    t = np.arange(1, netos.shape[-1] + 1, dtype=float)
+
+    def vpn(flujos, r):
+        desc = (1 + r[:, None]) ** -t
+        return (flujos * desc).sum(axis=1), -(flujos * t * desc).sum(axis=1) / (1 + r)
+
+    res = np.full(netos.shape[0], np.nan)
+    with np.errstate(over="ignore", invalid="ignore", divide="ignore"):
+        lo = np.full(netos.shape[0], r_min); hi = np.full(netos.shape[0], r_max)
+        v_lo = vpn(netos, lo)[0]
+        act = np.flatnonzero(np.sign(v_lo) * np.sign(vpn(netos, hi)[0]) < 0)
+        lo, hi, v_lo = lo[act], hi[act], v_lo[act]
+        r = np.zeros(act.size)
+        # Sólo se itera sobre los flujos que aún no convergieron
+        for _ in range(iteraciones):
+            if not act.size: break
+            v, dv = vpn(netos[act], r)
+            mismo = np.sign(v) == np.sign(v_lo)
+            lo = np.where(mismo, r, lo); v_lo = np.where(mismo, v, v_lo)
+            hi = np.where(mismo, hi, r)
+            r_nuevo = r - v / dv
+            fuera = ~np.isfinite(r_nuevo) | (r_nuevo <= lo) | (r_nuevo >= hi)
+            r_nuevo = np.where(fuera, (lo + hi) / 2, r_nuevo)
+            listo = (np.abs(r_nuevo - r) <= tol * (1 + np.abs(r))) | (v == 0)
+            res[act[listo]] = r_nuevo[listo]
+            sigue = ~listo
+            act, r, lo, hi, v_lo = act[sigue], r_nuevo[sigue], lo[sigue], hi[sigue], v_lo[sigue]
+        res[act] = r
+    return res.reshape(forma)
+
+
+def payback_lote(netos, tasa_desc=None, saldo_inicial=0.0):
+    """Primer mes con saldo_inicial + acumulado >= 0 (descontado si se da tasa_desc); NaN si no se recupera."""
+    netos = np.asarray(netos, dtype=float)
+    if tasa_desc is not None: netos = netos * factores_descuento(netos.shape[-1], tasa_desc)
+    recuperado = np.asarray(saldo_inicial)[..., None] + np.cumsum(netos, axis=-1) >= 0
+    return np.where(recuperado.any(axis=-1), recuperado.argmax(axis=-1) + 1.0, np.nan)
+
+
+def tasa_anual(tasa_mensual):
+    return (1 + tasa_mensual) ** 12 - 1
@@ -0,0 +1,73 @@
+"""Gráficos Plotly de la app - MI PC S.A.
+
+Funciones puras (datos -> figura) para que la app las cachee por sus datos de
+entrada. Plotly se importa recién al armar el primer gráfico, así que una
+sesión que no abre ninguna pestaña con gráficos no paga esa importación.
+"""
+import numpy as np
+
+
+def amortizacion(tabla):
+    """Capital e interés de cada cuota."""
+    import plotly.express as px
+    return px.bar(tabla, x="Mes", y=["Capital", "Interés"])
+
+
+def distribucion_margen(margenes, bins=80):
+    """Histograma normalizado del margen simulado de cada plan (dict plan -> array)."""
+    import plotly.graph_objects as go
+    fig = go.Figure()
+    for plan, m in margenes.items():
+        frec, bordes = np.histogram(m, bins=bins)
+        fig.add_trace(go.Scatter(x=(bordes[:-1] + bordes[1:]) / 2, y=frec / m.size, name=plan, fill='tozeroy', mode='lines'))
+    fig.add_vline(x=0, line_color="red")
+    return fig.update_layout(title="Distribución del Margen por Plan", xaxis_title="Margen ($)", yaxis_title="Probabilidad")
+
+
+def flujo_mensual(df_f):
+    import plotly.express as px
+    return px.bar(df_f, x="Mes", y="Neto", title="Cash Flow Mensual", color="Neto", color_continuous_scale=["red", "green"])
+
+
+def flujo_acumulado(meses, acumulado, titulo=None):
+    import plotly.graph_objects as go
+    fig = go.Figure().add_trace(go.Scatter(x=meses, y=acumulado, fill='tozeroy')).add_hline(y=0, line_color="red")
+    return fig.update_layout(title=titulo) if titulo else fig
+
+
+def tornado(df_tornado, vpn_base):
+    """Δ VPN contra la base al llevar cada parámetro a su mínimo y a su máximo."""
+    import plotly.graph_objects as go
+    fig = go.Figure()
+    fig.add_trace(go.Bar(y=df_tornado['Parámetro'], x=df_tornado['Δ Mín'], orientation='h', name="Mínimo", marker_color="#ef4444"))
+    fig.add_trace(go.Bar(y=df_tornado['Parámetro'], x=df_tornado['Δ Máx'], orientation='h', name="Máximo", marker_color="#22c55e"))
+    return fig.update_layout(barmode='overlay', title=f"Tornado: Δ VPN vs Base (${vpn_base:,.0f})")
+
+
+def mapa_vpn(mapa, etiqueta_x, etiqueta_y):
+    """Mapa de calor de un corte de la grilla (filas: eje Y, columnas: eje X)."""
+    import plotly.express as px
+    return px.imshow(mapa, x=[f"{v:g}" for v in mapa.columns], y=[f"{v:g}" for v in mapa.index], aspect="auto",
+                     color_continuous_scale="RdYlGn", color_continuous_midpoint=0, title="VPN",
+                     labels={"x": etiqueta_x, "y": etiqueta_y, "color": "VPN"})
+
+
+def costo_reposicion(plan, agrupar):
+    """Costo de reposición por mes (por insumo si el plan está agrupado por insumo)."""
+    import plotly.express as px
+    por_insumo = "Insumo" in agrupar
+    return px.bar(plan.groupby(["Mes", "Insumo"] if por_insumo else ["Mes"], as_index=False)["Costo"].sum(),
+                  x="Mes", y="Costo", color="Insumo" if por_insumo else None, title="Costo de Reposición por Mes")
+
+
+def flujo_cartera(flujo, corte=None):
+    """Ingresos contra egresos (OPEX, cuotas e inversión propia) de la cartera por mes, con el neto y el saldo de deuda."""
+    import plotly.graph_objects as go
+    fig = go.Figure()
+    fig.add_trace(go.Bar(x=flujo['Mes'], y=flujo['Ingreso'], name="Ingreso", marker_color="#22c55e"))
+    for serie, color in (("OPEX", "#f97316"), ("Cuota", "#ef4444"), ("Inversión Propia", "#7f1d1d")):
+        fig.add_trace(go.Bar(x=flujo['Mes'], y=-flujo[serie], name=serie, marker_color=color))
+    fig.add_trace(go.Scatter(x=flujo['Mes'], y=flujo['Neto'], name="Neto", line_color="#1e3a8a"))
+    fig.add_trace(go.Scatter(x=flujo['Mes'], y=flujo['Saldo Deuda'], name="Saldo Deuda", line_dash="dot", line_color="#64748b"))
+    if corte is not None: fig.add_vline(x=corte, line_color="gray", line_dash="dash")
+    return fig.update_layout(barmode="relative", title="Flujo Mensual de la Cartera")
@@ -0,0 +1,321 @@
+"""Importación masiva de listas de precios de distribuidores - MI PC S.A.
+
+Lee el archivo (CSV o Excel) por bloques, mapea sus columnas a equipos y
+consumibles y hace upsert por (marca, modelo) y (equipo_id, tipo de insumo),
+un bloque por transacción. La memoria no crece con el tamaño del archivo: sólo
+se guarda el índice de claves del catálogo y hasta MAX_ERRORES errores (el
+resto puede escribirse a un CSV con `salida_errores`).
+
+Cada fila tiene marca y modelo. Si trae datos de equipo (costo, residual,
+mantenimiento, tipo) actualiza o crea el equipo. Si trae insumo actualiza o
+crea ese consumible del equipo, que puede venir en una fila anterior del
+mismo archivo.
+
+El separador decimal se decide una vez por archivo (o se indica con
+`decimal`): con él fijo, un número con el otro separador fuera de grupos de
+miles es un error de la fila, no un valor distinto. El rendimiento es un
+entero de páginas: '.' y ',' sólo pueden ser separadores de miles.
+
+    python importador.py lista_ingram.csv --map "Precio USD=costo_adq" --errores errores.csv
+"""
+import argparse
+import csv
+import sys
+import unicodedata
+
+import pandas as pd
+
+from catalogo import MESES_AMORTIZACION, invalidar_catalogo
+from db import RUTA_DB, con_reintentos, init_db
+
+BLOQUE = 5000
+MAX_ERRORES = 1000
+
+CAMPOS = {
+    "marca": ["marca", "brand", "fabricante"],
+    "modelo": ["modelo", "model", "equipo"],
+    "tipo": ["tipo", "tipo_equipo"],
+    "costo_adq": ["costo_adq", "costo", "precio", "precio_equipo", "price", "cost"],
+    "residual": ["residual", "valor_residual"],
+    "mantenimiento": ["mantenimiento", "manto", "manto_mensual"],
+    "vida_util": ["vida_util"],
+    "insumo": ["insumo", "consumible", "tipo_insumo"],
+    "costo_insumo": ["costo_insumo", "precio_insumo"],
+    "rendimiento": ["rendimiento", "rend", "yield"],
+}
+NUMERICOS = ["costo_adq", "residual", "mantenimiento", "vida_util", "costo_insumo", "rendimiento"]
+ENTEROS = ["rendimiento"]
+CAMPOS_EQUIPO = ["tipo", "costo_adq", "residual", "mantenimiento", "vida_util"]
+
+
+def _normalizar(texto):
+    texto = unicodedata.normalize("NFKD", str(texto)).encode("ascii", "ignore").decode()
+    return "_".join(texto.strip().lower().replace(".", " ").split())
+
+
+def _clave(*partes):
+    return tuple(str(p).strip().casefold() for p in partes)
+
+
+def detectar_mapeo(columnas, mapeo=None):
+    """Devuelve {columna del archivo: campo} usando los alias de CAMPOS y el mapeo explícito."""
+    alias = {a: campo for campo, nombres in CAMPOS.items() for a in nombres}
+    res = {}
+    for col in columnas:
+        campo = alias.get(_normalizar(col))
+        if campo and campo not in res.values(): res[col] = campo
+    for col, campo in (mapeo or {}).items():
+        if campo not in CAMPOS: raise ValueError(f"Campo desconocido: {campo}")
+        res = {c: f for c, f in res.items() if f != campo}
+        res[col] = campo
+    return res
+
+
+def leer_bloques(archivo, tam=BLOQUE, nombre=None):
+    """Itera DataFrames de hasta `tam` filas (todas las columnas como texto)."""
+    nombre = (nombre or getattr(archivo, 'name', None) or str(archivo)).lower()
+    if nombre.endswith((".xlsx", ".xlsm")):
+        try:
+            from openpyxl import load_workbook
+        except ImportError:
+            raise ImportError("Para importar Excel instala openpyxl (pip install openpyxl) o exporta la lista a CSV.")
+        filas = load_workbook(archivo, read_only=True, data_only=True).active.iter_rows(values_only=True)
+        cabecera = [str(c) if c is not None else f"col_{i}" for i, c in enumerate(next(filas, []))]
+        bloque = []
+        for fila in filas:
+            # Las celdas numéricas de Excel se escriben con '.' decimal y sin decimales si son enteras
+            bloque.append(["" if v is None else str(int(v)) if isinstance(v, float) and v.is_integer() else str(v) for v in fila])
+            if len(bloque) == tam:
+                yield pd.DataFrame(bloque, columns=cabecera); bloque = []
+        if bloque: yield pd.DataFrame(bloque, columns=cabecera)
+    else:
+        yield from pd.read_csv(archivo, chunksize=tam, dtype=str, keep_default_na=False, sep=None, engine="python")
+
+
+def detectar_decimal(textos):
+    """',' o '.' según los números (Series de texto), o None si ninguno lo deja claro.
+
+    Con los dos separadores el decimal es el último; con uno solo, es decimal
+    si lo siguen 1-2 o 4 o más dígitos, o si antes hay 0 o más de 3 dígitos, y
+    es de miles si se repite en grupos de 3. '25.000' o '1,500' solos no
+    deciden nada.
+    """
+    t = textos[textos != ""]
+    votos = set(t[t.str.contains(".", regex=False) & t.str.contains(",", regex=False)].str.extract(r"([.,])\d*$")[0].dropna())
+    for patron in (r"^-?\d+([.,])(?:\d{1,2}|\d{4,})$", r"^-?(?:\d{4,}|0)([.,])\d{3}$"):
+        votos |= set(t.str.extract(patron)[0].dropna())
+    if t.str.fullmatch(r"-?\d{1,3}(\.\d{3}){2,}").any(): votos.add(",")
+    if t.str.fullmatch(r"-?\d{1,3}(,\d{3}){2,}").any(): votos.add(".")
+    if len(votos) > 1: raise ValueError("La lista usa ',' y '.' como separador decimal: indica el separador decimal")
+    return votos.pop() if votos else None
+
+
+def _a_numero(texto, decimal):
+    """Convierte texto a número con `decimal` (',' o '.') como separador decimal y el otro sólo en grupos de miles.
+
+    Lo que no respeta ese formato queda NaN.
+    """
+    d, m = ("\\,", "\\.") if decimal == "," else ("\\.", ",")
+    valido = texto.str.fullmatch(rf"-?(\d{{1,3}}({m}\d{{3}})+|\d+)({d}\d+)?")
+    limpio = texto.str.replace("." if decimal == "," else ",", "", regex=False).str.replace(",", ".", regex=False)
+    return pd.to_numeric(limpio.where(valido), errors="coerce")
+
+
+def _a_entero(texto, decimal):
+    """Enteros con '.' o ',' como separadores de miles. Devuelve (números, máscara de los que tienen decimales)."""
+    miles = texto.str.fullmatch(r"-?\d{1,3}((\.\d{3})+|(,\d{3})+)")
+    num = pd.to_numeric(texto.where(miles, "").str.replace(r"[.,]", "", regex=True), errors="coerce")
+    num = num.fillna(_a_numero(texto, decimal))
+    no_entero = num.notna() & (num != num.round())
+    return num.where(~no_entero), no_entero
+
+
+def _preparar(df, mapeo, decimal):
+    """Renombra a los campos y convierte numéricos; devuelve (df, errores por fila).
+
+    Sin `decimal` (el archivo todavía no lo mostró) los números se leen con '.'
+    y los ambiguos como '1.500' quedan como error de la fila.
+    """
+    df = df[list(mapeo)].rename(columns=mapeo)
+    for campo in CAMPOS:
+        if campo not in df: df[campo] = ""
+    df = df.apply(lambda s: s.astype(str).str.strip())
+    errores = pd.Series("", index=df.index)
+    for campo in NUMERICOS:
+        texto = df[campo].str.replace(r"[$\s]", "", regex=True)
+        dudoso = pd.Series(False, index=texto.index)
+        if campo in ENTEROS:
+            num, no_entero = _a_entero(texto, decimal or ".")
+            errores[no_entero] += f"{campo} no entero; "
+        else:
+            num, no_entero = _a_numero(texto, decimal or "."), dudoso
+            if not decimal:
+                dudoso = texto.str.fullmatch(r"-?\d{1,3}[.,]\d{3}")
+                errores[dudoso] += f"{campo} ambiguo (indica el separador decimal); "
+                num = num.where(~dudoso)
+        malo = (texto != "") & num.isna() & ~no_entero & ~dudoso
+        errores[malo] += f"{campo} no numérico; "
+        negativo = num < 0
+        errores[negativo] += f"{campo} negativo; "
+        df[campo] = num
+    errores[(df['marca'] == "") | (df['modelo'] == "")] += "falta marca o modelo; "
+    con_equipo = (df['tipo'] != "") | df[["costo_adq", "residual", "mantenimiento", "vida_util"]].notna().any(axis=1)
+    con_insumo = df['insumo'] != ""
+    errores[~con_equipo & ~con_insumo] += "fila sin datos de equipo ni insumo; "
+    errores[con_insumo & ~(df['rendimiento'] > 0)] += "rendimiento inválido; "
+    errores[con_insumo & df['costo_insumo'].isna()] += "falta costo_insumo; "
+    df['con_equipo'] = con_equipo; df['con_insumo'] = con_insumo
+
+    # Claves normalizadas, tipo de equipo (B/N o Color) y None en lugar de NaN para SQLite
+    for campo in ("marca", "modelo", "insumo"):
+        df[f"k_{campo}"] = df[campo].str.casefold()
+    tipo = df['tipo'].str.casefold()
+    df['tipo'] = pd.Series(["Color" if "color" in t or t in ("cmyk", "c") else ("B/N" if t else None) for t in tipo],
+                           index=df.index, dtype=object)
+    for campo in NUMERICOS:
+        df[campo] = df[campo].astype(object).where(df[campo].notna(), None)
+    return df, errores.str.rstrip("; ")
+
+
+def _escribir_bloque(conn, df, errores, equipos, insumos, confirmar=True):
+    """Upsert de un bloque ya preparado en una transacción (confirmada si `confirmar`).
+
+    No toca `equipos` ni `insumos`: devuelve (equipos nuevos, insumos nuevos,
+    contadores, errores de fila) para sumarlos recién cuando el bloque quedó
+    escrito, así se puede reintentar entero si la base está bloqueada.
+    """
+    eq_nuevos, ins_nuevos, errores_bloque = {}, {}, []
+    cont = {"equipos_nuevos": 0, "equipos_actualizados": 0, "insumos_nuevos": 0, "insumos_actualizados": 0}
+    upd_eq, upd_ins, new_ins = [], [], {}
+    columnas = ["marca", "modelo", "k_marca", "k_modelo", "k_insumo", "insumo", "costo_insumo", "rendimiento",
+                "con_equipo", "con_insumo"] + CAMPOS_EQUIPO
+    try:
+        for fila, err, r in zip(df.index, errores.tolist(), zip(*(df[c].tolist() for c in columnas))):
+            marca, modelo, k_marca, k_modelo, k_insumo, insumo, costo_insumo, rend, con_equipo, con_insumo = r[:10]
+            if err:
+                errores_bloque.append((fila, marca, modelo, err)); continue
+            clave = (k_marca, k_modelo)
+            eq_id = eq_nuevos.get(clave) or equipos.get(clave)
+            if con_equipo:
+                tipo, costo_adq, residual, manto, vida = r[10:]
+                if eq_id is None:
+                    if costo_adq is None:
+                        errores_bloque.append((fila, marca, modelo, "equipo nuevo sin costo_adq")); continue
+                    eq_id = conn.execute(
+                        "INSERT INTO equipos (marca, modelo, tipo, costo_adq, residual, vida_util, mantenimiento) VALUES (?,?,?,?,?,?,?)",
+                        (marca, modelo, tipo, costo_adq, residual or 0.0, int(vida or MESES_AMORTIZACION), manto or 0.0)).lastrowid
+                    eq_nuevos[clave] = eq_id; cont["equipos_nuevos"] += 1
+                else:
+                    upd_eq.append(r[10:] + (eq_id,))
+            if con_insumo:
+                if eq_id is None:
+                    errores_bloque.append((fila, marca, modelo, "insumo de un equipo que no existe")); continue
+                k = (eq_id, k_insumo)
+                c_id = insumos.get(k)
+                if c_id is None: new_ins[k] = (eq_id, insumo, costo_insumo, int(rend))
+                else: upd_ins.append((costo_insumo, int(rend), c_id))
+
+        conn.executemany("UPDATE equipos SET tipo=COALESCE(?, tipo), costo_adq=COALESCE(?, costo_adq), residual=COALESCE(?, residual), "
+                         "mantenimiento=COALESCE(?, mantenimiento), vida_util=COALESCE(?, vida_util) WHERE id=?", upd_eq)
+        conn.executemany("UPDATE consumibles SET costo=?, rendimiento=? WHERE id=?", upd_ins)
+        # Los insumos nuevos se insertan juntos y luego se leen sus ids para los bloques siguientes
+        ultimo_id = conn.execute("SELECT COALESCE(MAX(id), 0) FROM consumibles").fetchone()[0]
+        conn.executemany("INSERT INTO consumibles (equipo_id, tipo, costo, rendimiento) VALUES (?,?,?,?)", list(new_ins.values()))
+        for c_id, eq_id, tipo in conn.execute("SELECT id, equipo_id, tipo FROM consumibles WHERE id > ?", (ultimo_id,)):
+            ins_nuevos[(eq_id,) + _clave(tipo)] = c_id
+        if confirmar: conn.commit()
+    except BaseException:
+        if confirmar: conn.rollback()
+        raise
+    cont["equipos_actualizados"] = len(upd_eq); cont["insumos_actualizados"] = len(upd_ins); cont["insumos_nuevos"] = len(new_ins)
+    return eq_nuevos, ins_nuevos, cont, errores_bloque
+
+
+def importar(conn, archivo, mapeo=None, tam=BLOQUE, simular=False, salida_errores=None, nombre=None, decimal=None):
+    """Importa la lista y devuelve un resumen con contadores y los primeros MAX_ERRORES errores.
+
+    Con simular=True se hace todo el trabajo pero al final se revierte.
+    `salida_errores` es un archivo de texto abierto donde se escriben todos los errores como CSV.
+    `decimal` fija el separador decimal de los números; sin él se detecta con
+    el primer bloque que lo muestre (detectar_decimal) y queda en res["decimal"].
+    Fuera de la simulación cada bloque se reintenta si la base está bloqueada.
+    """
+    res = {"filas": 0, "equipos_nuevos": 0, "equipos_actualizados": 0, "insumos_nuevos": 0,
+           "insumos_actualizados": 0, "errores": 0, "detalle_errores": [], "mapeo": None, "decimal": decimal}
+    # En simulación un reintento perdería los bloques anteriores de la misma transacción
+    escribir = _escribir_bloque if simular else con_reintentos(_escribir_bloque)
+    escritor = csv.writer(salida_errores) if salida_errores else None
+    if escritor: escritor.writerow(["fila", "marca", "modelo", "error"])
+
+    def error(fila, marca, modelo, msg):
+        res["errores"] += 1
+        if len(res["detalle_errores"]) < MAX_ERRORES:
+            res["detalle_errores"].append({"Fila": fila, "Marca": marca, "Modelo": modelo, "Error": msg})
+        if escritor: escritor.writerow([fila, marca, modelo, msg])
+
+    # Índices de claves existentes (una sola lectura); ante duplicados gana el id menor
+    equipos = {}
+    for eq_id, marca, modelo in conn.execute("SELECT id, marca, modelo FROM equipos ORDER BY id DESC"):
+        equipos[_clave(marca, modelo)] = eq_id
+    insumos = {}
+    for c_id, eq_id, tipo in conn.execute("SELECT id, equipo_id, tipo FROM consumibles ORDER BY id DESC"):
+        insumos[(eq_id,) + _clave(tipo)] = c_id
+
+    fila_archivo = 1  # la fila 1 es la cabecera
+    try:
+        for bloque in leer_bloques(archivo, tam, nombre):
+            if res["mapeo"] is None:
+                res["mapeo"] = detectar_mapeo(bloque.columns, mapeo)
+                faltan = {"marca", "modelo"} - set(res["mapeo"].values())
+                if faltan: raise ValueError(f"No se encontraron columnas para: {', '.join(sorted(faltan))}")
+            if res["decimal"] is None:
+                numericas = [c for c, f in res["mapeo"].items() if f in NUMERICOS and f not in ENTEROS]
+                textos = bloque[numericas].astype(str).apply(lambda s: s.str.replace(r"[$\s]", "", regex=True))
+                res["decimal"] = detectar_decimal(pd.Series(textos.to_numpy().ravel(), dtype=str))
+            df, errores = _preparar(bloque, res["mapeo"], res["decimal"])
+            df.index = range(fila_archivo + 1, fila_archivo + 1 + len(df))
+            errores.index = df.index
+            fila_archivo += len(df); res["filas"] += len(df)
+
+            nuevos_eq, nuevos_ins, cont, errores_bloque = escribir(conn, df, errores, equipos, insumos, not simular)
+            equipos.update(nuevos_eq); insumos.update(nuevos_ins)
+            for k, v in cont.items(): res[k] += v
+            for e in errores_bloque: error(*e)
+        # En simulación todo el archivo es una sola transacción que se revierte al final
+        if simular: conn.rollback()
+    except BaseException:
+        conn.rollback()
+        raise
+    finally:
+        invalidar_catalogo(conn)
+    return res
+
+
+def main(argv=None):
+    p = argparse.ArgumentParser(description="Importa una lista de precios (CSV/Excel) a equipos y consumibles.")
+    p.add_argument("archivo", help="lista de precios .csv o .xlsx")
+    p.add_argument("--db", default=RUTA_DB, help=f"base SQLite (default: {RUTA_DB})")
+    p.add_argument("--map", action="append", default=[], metavar="COLUMNA=CAMPO",
+                   help=f"mapeo explícito de una columna; campos: {', '.join(CAMPOS)}")
+    p.add_argument("--bloque", type=int, default=BLOQUE, help="filas por transacción")
+    p.add_argument("--errores", help="CSV donde escribir todas las filas con error")
+    p.add_argument("--simular", action="store_true", help="valida y cuenta sin guardar cambios")
+    p.add_argument("--decimal", choices=[",", "."], help="separador decimal de la lista (default: autodetectar)")
+    args = p.parse_args(argv)
+
+    mapeo = dict(m.split("=", 1) for m in args.map)
+    conn = init_db(args.db)
+    salida = open(args.errores, "w", newline="", encoding="utf-8") if args.errores else None
+    try:
+        res = importar(conn, args.archivo, mapeo, args.bloque, args.simular, salida, decimal=args.decimal)
+    finally:
+        if salida: salida.close()
+    print(f"Mapeo: {res['mapeo']} | decimal: {res['decimal'] or 'sin determinar'}", file=sys.stderr)
+    print(f"{res['filas']} filas | equipos: {res['equipos_nuevos']} nuevos, {res['equipos_actualizados']} actualizados | "
+          f"insumos: {res['insumos_nuevos']} nuevos, {res['insumos_actualizados']} actualizados | "
+          f"{res['errores']} errores{' (simulación, sin cambios)' if args.simular else ''}", file=sys.stderr)
+    return 1 if res["errores"] else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,88 @@
+"""Escrituras del inventario (equipos y consumibles) - MI PC S.A.
+
+Cada guardado compara lo editado contra lo leído, escribe sólo las filas que
+cambiaron con executemany dentro de una única transacción e invalida el
+catálogo de costos al terminar. Si la base sigue bloqueada por otra escritura,
+el guardado completo se reintenta (db.con_reintentos).
+"""
+import pandas as pd
+
+from catalogo import MESES_AMORTIZACION, invalidar_catalogo
+from db import con_reintentos
+
+COLS_EQUIPO = ["marca", "modelo", "costo_adq", "residual", "mantenimiento"]
+COLS_CONSUMIBLE = ["tipo", "costo", "rendimiento"]
+
+
+def _valor(v):
+    if v is None or (not isinstance(v, str) and pd.isna(v)): return None
+    return v.item() if hasattr(v, 'item') else v
+
+
+def _filas(df, cols):
+    return [tuple(_valor(v) for v in fila) for fila in df[cols].itertuples(index=False, name=None)]
+
+
+def _distintas(a, b):
+    """Máscara de filas con algún valor distinto (NaN == NaN)."""
+    a = a.reset_index(drop=True); b = b.reset_index(drop=True)
+    return ~((a == b) | (a.isna() & b.isna())).all(axis=1)
+
+
+@con_reintentos
+def crear_equipo(conn, marca, modelo, tipo, costo_adq, residual, mantenimiento, vida_util=MESES_AMORTIZACION):
+    with conn:
+        cur = conn.execute("INSERT INTO equipos (marca, modelo, tipo, costo_adq, residual, vida_util, mantenimiento) VALUES (?,?,?,?,?,?,?)",
+                           (marca, modelo, tipo, costo_adq, residual, vida_util, mantenimiento))
+    invalidar_catalogo(conn)
+    return cur.lastrowid
+
+
+@con_reintentos
+def guardar_equipos(conn, original, editado):
+    """Actualiza sólo los equipos con cambios. `original` y `editado` tienen la columna id. Devuelve cuántos."""
+    cambiados = editado[_distintas(original[["id"] + COLS_EQUIPO], editado[["id"] + COLS_EQUIPO]).to_numpy()]
+    if cambiados.empty: return 0
+    with conn:
+        conn.executemany(f"UPDATE equipos SET {', '.join(c + '=?' for c in COLS_EQUIPO)} WHERE id=?",
+                         _filas(cambiados, COLS_EQUIPO + ["id"]))
+    invalidar_catalogo(conn)
+    return len(cambiados)
+
+
+@con_reintentos
+def agregar_consumible(conn, equipo_id, tipo, costo, rendimiento):
+    with conn:
+        conn.execute("INSERT INTO consumibles (equipo_id, tipo, costo, rendimiento) VALUES (?,?,?,?)",
+                     (int(equipo_id), tipo, costo, rendimiento))
+    invalidar_catalogo(conn)
+
+
+@con_reintentos
+def guardar_consumibles(conn, equipo_id, original, editado):
+    """Sincroniza los consumibles de un equipo con lo editado (columnas id, tipo, costo, rendimiento).
+
+    Las filas nuevas no tienen id; las filas sin tipo se eliminan. Devuelve
+    (insertados, actualizados, eliminados).
+    """
+    equipo_id = int(equipo_id)
+    con_tipo = editado['tipo'].map(lambda t: isinstance(t, str) and t.strip() != "")
+    nuevos = editado[editado['id'].isna() & con_tipo]
+    existentes = editado[editado['id'].notna() & con_tipo]
+    existentes = existentes.assign(id=existentes['id'].astype(int))
+
+    ids_orig = set(original['id'].astype(int))
+    eliminados = ids_orig - set(existentes['id'])
+
+    previo = original.set_index(original['id'].astype(int)).loc[existentes['id'], COLS_CONSUMIBLE]
+    actualizados = existentes[_distintas(previo, existentes[COLS_CONSUMIBLE]).to_numpy()]
+
+    if nuevos.empty and actualizados.empty and not eliminados: return 0, 0, 0
+    with conn:
+        conn.executemany("DELETE FROM consumibles WHERE id=? AND equipo_id=?", [(i, equipo_id) for i in eliminados])
+        conn.executemany("UPDATE consumibles SET tipo=?, costo=?, rendimiento=? WHERE id=? AND equipo_id=?",
+                         [f + (equipo_id,) for f in _filas(actualizados, COLS_CONSUMIBLE + ["id"])])
+        conn.executemany("INSERT INTO consumibles (equipo_id, tipo, costo, rendimiento) VALUES (?,?,?,?)",
+                         [(equipo_id,) + f for f in _filas(nuevos, COLS_CONSUMIBLE)])
+    invalidar_catalogo(conn)
+    return len(nuevos), len(actualizados), len(eliminados)
@@ -0,0 +1,174 @@
+"""Motor de cotización headless (sin Streamlit) - MI PC S.A.
+
+Contiene toda la lógica de precios que usan las pestañas de la app: detalle
+de costos por equipo, líneas del proyecto, financiamiento, Oferta Comercial
+(Plan Variable, Híbrido y Tarifa Plana) y Proyección (flujo, VPN, TIR, payback).
+
+Las funciones por línea aceptan `cat` (catalogo.Catalogo): quien recorre
+muchas líneas lo pide una vez con obtener_catalogo y lo pasa, así cada línea
+es sólo una lectura de diccionarios. Sin `cat` lo piden ellas mismas.
+"""
+import numpy as np
+import pandas as pd
+
+from catalogo import MESES_AMORTIZACION, obtener_catalogo
+from finanzas import amortizacion_lote, payback_lote, tabla_desde_lote, tasa_anual, tir_lote, vpn_lote
+
+TASA_DESCUENTO = 0.10 / 12
+RECARGO_EXCEDENTE = 1.15
+COLS_TOTALES = ["Vol. Total", "Inversión", "OPEX Fijo", "OPEX Var"]
+
+
+# --- COSTOS POR EQUIPO ---
+def get_detalles_equipo(conn, equipo_id, volumen_unit, incluir_papel, costo_papel, cat=None):
+    return (cat or obtener_catalogo(conn)).detalles(equipo_id, volumen_unit, incluir_papel, costo_papel)
+
+
+def linea_proyecto(conn, sede, equipo_id, cantidad, vol_unit, incluir_papel, costo_papel, cat=None):
+    """Arma una línea del proyecto (mismas columnas que el Armador)."""
+    det = get_detalles_equipo(conn, equipo_id, vol_unit, incluir_papel, costo_papel, cat)
+    return {
+        "Sede": sede, "Modelo": det['modelo'], "Cantidad": cantidad, "Vol. Unit": vol_unit,
+        "Vol. Total": vol_unit*cantidad, "Inversión": det['costo_adq']*cantidad,
+        "OPEX Fijo": det['manto']*cantidad, "OPEX Var": det['opex_var']*cantidad, "Eq_ID": equipo_id,
+        "Costo HW Mes": (det['amort_mensual'] + det['manto']) * cantidad,
+        "Costo HW Unit": det['hw_cpp'], "Costo Toner Unit": det['cpp']
+    }
+
+
+def recalcular_linea(conn, linea, incluir_papel, costo_papel, cat=None):
+    """Recalcula en el lugar las columnas derivadas de una línea editada."""
+    det = get_detalles_equipo(conn, linea['Eq_ID'], linea['Vol. Unit'], incluir_papel, costo_papel, cat)
+    linea['Vol. Total'] = linea['Vol. Unit'] * linea['Cantidad']
+    linea['Inversión'] = det['costo_adq'] * linea['Cantidad']
+    linea['OPEX Fijo'] = det['manto'] * linea['Cantidad']
+    linea['OPEX Var'] = det['opex_var'] * linea['Cantidad']
+    linea['Costo HW Mes'] = (det['amort_mensual'] + det['manto']) * linea['Cantidad']
+    linea['Costo HW Unit'] = det['hw_cpp']
+    linea['Costo Toner Unit'] = det['cpp']
+    return linea
+
+
+def editar_linea(conn, proyecto, totales, i, cambios, incluir_papel, costo_papel, cat=None):
+    """Aplica `cambios` ({columna: valor}) a la línea i, recalcula sólo esa línea y
+    ajusta `totales` (ver totales_proyecto) por diferencia."""
+    cat = cat or obtener_catalogo(conn)
+    linea = proyecto[i]
+    for c in COLS_TOTALES: totales[c] -= linea[c]
+    linea.update(cambios)
+    if 'Eq_ID' in cambios: linea['Modelo'] = cat.equipos[int(linea['Eq_ID'])]['modelo']
+    recalcular_linea(conn, linea, incluir_papel, costo_papel, cat)
+    for c in COLS_TOTALES: totales[c] += linea[c]
+    return linea
+
+
+def totales_proyecto(proyecto):
+    return {c: sum(p[c] for p in proyecto) for c in COLS_TOTALES}
+
+
+def actualizar_costo_variable(conn, linea, incluir_papel, costo_papel, cat=None):
+    """Sólo el costo variable depende del papel; los fijos no cambian."""
+    det = get_detalles_equipo(conn, linea['Eq_ID'], linea['Vol. Unit'], incluir_papel, costo_papel, cat)
+    linea['Costo Toner Unit'] = det['cpp']
+    linea['OPEX Var'] = det['opex_var'] * linea['Cantidad']
+    return linea
+
+
+# --- FINANCIAMIENTO ---
+def financiar(monto_total, tipo_fin="Propios", tasa=0.0, plazo=36, gracia=0, tabla=True):
+    """Financiamiento del proyecto. 'Cuotas' guarda las cuotas mensuales; 'Tabla' (la
+    tabla de amortización completa) sólo se arma si tabla=True."""
+    if tipo_fin == "Propios":
+        return {"Tipo": tipo_fin, "Tabla": pd.DataFrame(), "Cuotas": [], "Inv": monto_total, "Int": 0, "Plazo": plazo}
+    lote = amortizacion_lote(monto_total, tasa, plazo, "Francesa", gracia)
+    return {"Tipo": tipo_fin, "Tabla": tabla_desde_lote(lote, 0) if tabla else None,
+            "Cuotas": lote["Cuota Total"][0].tolist(), "Inv": monto_total,
+            "Int": float(lote["Interés"][0].sum()), "Plazo": plazo}
+
+
+def costo_financiero_mensual(fin):
+    if fin['Tipo'] == "Propios": return fin['Inv'] / MESES_AMORTIZACION
+    return sum(fin['Cuotas']) / len(fin['Cuotas']) if fin['Cuotas'] else 0
+
+
+# --- OFERTA COMERCIAL ---
+def oferta_comercial(proyecto, fin, margen_meta, totales=None):
+    """Precios de los tres planes para el proyecto (lista de líneas). Si se pasan los
+    `totales` ya calculados (totales_proyecto) no se recorren las líneas."""
+    totales = totales or totales_proyecto(proyecto)
+    vol_total, opex_fijo, opex_var = totales['Vol. Total'], totales['OPEX Fijo'], totales['OPEX Var']
+    opex_total = opex_fijo + opex_var
+
+    costo_fin_mes = costo_financiero_mensual(fin)
+    costo_total_real = opex_total + costo_fin_mes
+    fact_meta = costo_total_real / (1 - margen_meta)
+
+    p_unico = fact_meta / vol_total if vol_total else 0
+    return {
+        "vol_total": vol_total, "opex_fijo": opex_fijo, "opex_var": opex_var, "opex_total": opex_total,
+        "costo_fin_mes": costo_fin_mes, "costo_total_real": costo_total_real, "fact_meta": fact_meta,
+        "p_unico": p_unico,
+        "renta": (opex_fijo + costo_fin_mes) / (1 - margen_meta),
+        "click": (opex_var / (1 - margen_meta)) / vol_total if vol_total else 0,
+        "excedente": p_unico * RECARGO_EXCEDENTE,
+    }
+
+
+# --- PROYECCIÓN ---
+def flujo_proyeccion(oferta, fin, meses=36, tasa_desc=TASA_DESCUENTO):
+    """Flujo mensual con Tarifa Plana como arrays.
+
+    Devuelve un dict con 'Neto' y 'Acumulado' (arrays de `meses`), 'VPN', 'TIR'
+    (anual, NaN si no aplica), 'Payback' y 'Payback Desc.' (mes o None).
+    """
+    cuotas = np.zeros(meses)
+    n = min(len(fin['Cuotas']), meses)
+    cuotas[:n] = fin['Cuotas'][:n]
+    netos = oferta['fact_meta'] - oferta['opex_total'] - cuotas
+    # Con fondos propios la inversión sale en el mes 1 y el acumulado además arranca en -inversión
+    saldo_ini = 0
+    if fin['Tipo'] == "Propios": netos[0] -= fin.get('Inv', 0); saldo_ini = -fin.get('Inv', 0)
+
+    payback = payback_lote(netos, saldo_inicial=saldo_ini)
+    payback_desc = payback_lote(netos, tasa_desc, saldo_ini)
+    return {
+        "Neto": netos, "Acumulado": saldo_ini + np.cumsum(netos), "VPN": float(vpn_lote(netos, tasa_desc)),
+        "TIR": float(tasa_anual(tir_lote(netos))),
+        "Payback": None if np.isnan(payback) else int(payback),
+        "Payback Desc.": None if np.isnan(payback_desc) else int(payback_desc),
+    }
+
+
+def proyeccion(oferta, fin, meses=36, tasa_desc=TASA_DESCUENTO):
+    """Igual que flujo_proyeccion, con el flujo como DataFrame (Mes, Neto, Acumulado). Devuelve (df, flujo)."""
+    flujo = flujo_proyeccion(oferta, fin, meses, tasa_desc)
+    df_f = pd.DataFrame({"Mes": np.arange(1, meses + 1), "Neto": flujo['Neto'], "Acumulado": flujo['Acumulado']})
+    return df_f, flujo
+
+
+# --- COTIZACIÓN COMPLETA ---
+def cotizar(conn, definicion):
+    """Cotiza un proyecto definido como dict (ver cotizar_lote.py) y devuelve un dict serializable."""
+    incluir_papel = definicion.get('incluir_papel', True)
+    costo_papel = definicion.get('costo_papel', 2.80) if incluir_papel else 0
+    margen_meta = definicion.get('margen_meta', 0.30)
+    cat = obtener_catalogo(conn)
+
+    proyecto = []
+    for l in definicion['lineas']:
+        equipo_id = l['equipo_id'] if 'equipo_id' in l else cat.ids_por_modelo[l['modelo']]
+        proyecto.append(linea_proyecto(conn, l.get('sede', ''), equipo_id, l.get('cantidad', 1), l['vol_unit'],
+                                       incluir_papel, costo_papel, cat))
+    if not proyecto: raise ValueError("El proyecto no tiene líneas")
+
+    f = definicion.get('financiamiento', {})
+    fin = financiar(sum(p['Inversión'] for p in proyecto), f.get('tipo', "Propios"),
+                    f.get('tasa', 0.0), f.get('plazo', 36), f.get('gracia', 0), tabla=False)
+    of = oferta_comercial(proyecto, fin, margen_meta)
+    flujo = flujo_proyeccion(of, fin, definicion.get('meses', 36))
+
+    res = {"id": definicion.get('id'), "lineas": len(proyecto), "inversion": fin['Inv'], "interes_total": fin['Int']}
+    res.update(of)
+    res.update({"vpn": flujo['VPN'], "tir": None if np.isnan(flujo['TIR']) else flujo['TIR'],
+                "payback": flujo['Payback'], "payback_desc": flujo['Payback Desc.']})
+    return {k: (float(v) if hasattr(v, 'dtype') else v) for k, v in res.items()}
@@ -0,0 +1,113 @@
+"""Optimizador de flota: el equipo más conveniente para cada sede - MI PC S.A.
+
+Con los mismos costos que get_detalles_equipo, cubrir una sede de volumen
+mensual V con un modelo cuesta
+
+    costo(V) = q · (amortización + mantenimiento) + V · costo por página,   q = max(mínimo, ⌈V / capacidad⌉)
+
+Las curvas de cada modelo (costo fijo por equipo, costo por página, capacidad
+y si es color) se precalculan una vez por versión del catálogo, y todas las
+sedes se evalúan contra todos los modelos con broadcasting, por bloques de
+sedes para acotar la memoria.
+"""
+import numpy as np
+import pandas as pd
+
+import motor
+from catalogo import HOJAS_POR_RESMA, obtener_catalogo
+
+CAPACIDAD_EQUIPO = 20000   # páginas/mes recomendadas por equipo cuando no se conoce la velocidad
+PAGINAS_MES_POR_PPM = 400  # si se conoce: capacidad = velocidad (ppm) · 400
+BLOQUE_SEDES = 256
+OBJETIVOS = {"costo": "Menor Costo", "margen": "Mayor Margen"}
+
+
+def curvas_costo(conn):
+    """Arrays por modelo: ids, modelos, fijo (amortización + mantenimiento), cpp (consumibles), capacidad y color.
+
+    Un equipo sin tipo se toma como color si tiene algún consumible CMYK/color.
+    """
+    cat = obtener_catalogo(conn)
+    curvas = cat.derivados.get("curvas_costo")
+    if curvas is None:
+        ids = list(cat.equipos)
+        eqs = [cat.equipos[i] for i in ids]
+        con_color = {i for (i,) in conn.execute(
+            "SELECT DISTINCT equipo_id FROM consumibles WHERE tipo LIKE '%CMYK%' OR tipo LIKE '%color%'")}
+        curvas = cat.derivados["curvas_costo"] = {
+            "ids": np.array(ids, dtype=np.int64),
+            "modelos": np.array([e['modelo'] for e in eqs], dtype=object),
+            "fijo": np.array([e['amort_mensual'] + e['manto'] for e in eqs], dtype=float),
+            "cpp": np.array([cat.cpp_consumibles.get(i, 0.0) for i in ids], dtype=float),
+            "capacidad": np.array([e['velocidad'] * PAGINAS_MES_POR_PPM if e['velocidad'] else CAPACIDAD_EQUIPO for e in eqs], dtype=float),
+            "color": np.array([e['tipo'] == "Color" if e['tipo'] else i in con_color for i, e in zip(ids, eqs)], dtype=bool),
+        }
+    return curvas
+
+
+def optimizar(conn, sedes, objetivo="costo", incluir_papel=True, costo_papel=2.80, precio_pagina=0.0, renta_equipo=0.0,
+              capacidad=None, color_para_bn=False):
+    """Elige modelo y cantidad para cada sede.
+
+    `sedes` es un DataFrame (o lista de dicts) con Sede, Volumen (páginas/mes),
+    Tipo ("B/N" o "Color") y opcionalmente Cantidad Mínima. Con objetivo="costo"
+    minimiza el costo mensual; con "margen" maximiza precio_pagina · V +
+    renta_equipo · q - costo. `capacidad` (páginas/mes por equipo) reemplaza la
+    de las curvas y color_para_bn permite equipos color en sedes B/N. Las sedes
+    sin ningún modelo posible quedan con Eq_ID vacío.
+    """
+    sedes = pd.DataFrame(sedes).reset_index(drop=True)
+    c = curvas_costo(conn)
+    if not c['ids'].size: raise ValueError("El catálogo no tiene equipos")
+    vol = sedes['Volumen'].to_numpy(dtype=float)
+    minimo = sedes['Cantidad Mínima'].fillna(1).to_numpy(dtype=float) if 'Cantidad Mínima' in sedes else np.ones(len(sedes))
+    req_color = (sedes['Tipo'] == "Color").to_numpy()
+    cap = np.full(c['ids'].size, float(capacidad)) if capacidad else c['capacidad']
+    cpp = c['cpp'] + (costo_papel / HOJAS_POR_RESMA if incluir_papel else 0)
+    valido = np.isfinite(c['fijo']) & np.isfinite(cpp) & (cap > 0)
+    renta = renta_equipo if objetivo == "margen" else 0.0
+
+    n, m = len(sedes), c['ids'].size
+    mejor = np.full(n, -1); segundo = np.full(n, -1)
+    cant = np.zeros(n); puntaje_1 = np.full(n, np.inf); puntaje_2 = np.full(n, np.inf)
+    filas = np.arange(n)
+    for a in range(0, n, BLOQUE_SEDES):
+        b = min(a + BLOQUE_SEDES, n); v = vol[a:b, None]
+        q = np.maximum(np.ceil(v / cap), minimo[a:b, None])
+        puntaje = q * (c['fijo'] - renta) + v * cpp
+        elegible = valido & np.where(req_color[a:b, None], c['color'], color_para_bn | ~c['color'])
+        puntaje[~elegible] = np.inf
+        orden = np.argpartition(puntaje, 1, axis=1)[:, :2] if m > 1 else np.zeros((b - a, 1), dtype=int)
+        p = puntaje[filas[:b - a, None], orden]
+        dos = np.argsort(p, axis=1)
+        orden, p = np.take_along_axis(orden, dos, 1), np.take_along_axis(p, dos, 1)
+        mejor[a:b] = orden[:, 0]; puntaje_1[a:b] = p[:, 0]; cant[a:b] = q[filas[:b - a], orden[:, 0]]
+        if m > 1: segundo[a:b] = orden[:, 1]; puntaje_2[a:b] = p[:, 1]
+
+    ok = np.isfinite(puntaje_1)
+    i = np.where(ok, mejor, 0)
+    costo_fijo = np.where(ok, cant * c['fijo'][i], np.nan)
+    costo_var = np.where(ok, vol * cpp[i], np.nan)
+    res = pd.DataFrame({
+        "Sede": sedes['Sede'], "Tipo": sedes['Tipo'], "Volumen": vol,
+        "Eq_ID": pd.Series(c['ids'][i], dtype="Int64").where(ok),
+        "Modelo": np.where(ok, c['modelos'][i], None),
+        "Cantidad": pd.Series(cant.astype(int), dtype="Int64").where(ok),
+        "Vol. Unit": np.where(ok, vol / np.maximum(cant, 1), np.nan),
+        "Costo Fijo": costo_fijo, "Costo Variable": costo_var, "Costo Mensual": costo_fijo + costo_var,
+    })
+    res["Costo por Página"] = res["Costo Mensual"] / res["Volumen"].where(res["Volumen"] > 0)
+    if objetivo == "margen":
+        res["Ingreso"] = precio_pagina * vol + renta_equipo * res["Cantidad"].astype(float)
+        res["Margen"] = res["Ingreso"] - res["Costo Mensual"]
+    alt = np.isfinite(puntaje_2)
+    res["2ª Opción"] = np.where(alt, c['modelos'][np.where(alt, segundo, 0)], None)
+    res["Δ 2ª Opción"] = np.subtract(puntaje_2, puntaje_1, out=np.full(n, np.nan), where=alt)
+    return res
+
+
+def a_proyecto(conn, resultado, incluir_papel, costo_papel):
+    """Líneas del Armador para las sedes resueltas."""
+    cat = obtener_catalogo(conn)
+    return [motor.linea_proyecto(conn, r['Sede'], int(r['Eq_ID']), int(r['Cantidad']), r['Vol. Unit'], incluir_papel, costo_papel, cat)
+            for r in resultado[resultado['Eq_ID'].notna()].to_dict('records')]
@@ -0,0 +1,325 @@
+"""Instrumentación opcional de cada ejecución de la app - MI PC S.A.
+
+Streamlit vuelve a ejecutar streamlit_app.py completo en cada interacción. Con
+el perfil activo (variable de entorno MIPC_PERFIL=1, o ?perfil=<clave> en la
+URL si el servidor define MIPC_PERFIL_CLAVE) cada ejecución registra por sección (conexión, sidebar y cada pestaña) el
+tiempo de pared, las consultas SQL hechas sobre las conexiones (cantidad,
+tiempo de ejecutar y leer filas, también por sentencia), los DataFrames
+construidos y la memoria asignada según tracemalloc. Sin perfil las secciones
+no miden nada y las conexiones son sqlite3.Connection comunes.
+
+tracemalloc y el conteo de DataFrames se encienden con la primera ejecución
+perfilada y se apagan cuando termina la última, así que el resto de las
+sesiones no pagan nada. La memoria que mide tracemalloc es la del proceso: si
+dos ejecuciones perfiladas se solapan, sus MB quedan vacíos (NaN).
+
+Si MIPC_PERFIL_TRAZAS tiene una ruta, cada ejecución se agrega ahí como una
+línea JSON; el archivo se resume con
+
+    python perfilador.py trazas.jsonl
+"""
+import argparse
+import hmac
+import json
+import os
+import sqlite3
+import sys
+import threading
+import time
+import tracemalloc
+from collections import deque
+from contextlib import contextmanager
+from datetime import datetime
+
+import pandas as pd
+from pandas.core.generic import NDFrame
+
+ACTIVO = os.environ.get("MIPC_PERFIL", "") not in ("", "0")
+CLAVE = os.environ.get("MIPC_PERFIL_CLAVE", "")  # habilita ?perfil=<clave>; sin clave la URL no enciende nada
+RUTA_TRAZAS = os.environ.get("MIPC_PERFIL_TRAZAS")
+LARGO_SQL = 200  # las sentencias se agrupan por su texto (sin espacios repetidos) hasta este largo
+FUERA = "(fuera de secciones)"
+MB = 2 ** 20
+
+RECIENTES = deque(maxlen=50)  # resumen de las últimas ejecuciones del proceso (también las interrumpidas)
+
+_local = threading.local()
+_lock_trazas = threading.Lock()
+_lock = threading.Lock()
+_en_curso = set()  # perfiles sin terminar de todos los hilos
+_init_ndframe = None
+
+
+class Perfil:
+    """Mediciones de una ejecución del script. Las secciones pueden anidarse; SQL y DataFrames se cuentan en la más interna."""
+
+    def __init__(self, etiqueta=""):
+        self.etiqueta = etiqueta
+        self.fecha = datetime.now().isoformat(sep=" ", timespec="seconds")
+        self.inicio = time.perf_counter()
+        self.segundos = None  # se fija al terminar
+        self.interrumpida = None
+        self.secciones = []
+        self.sentencias = {}  # (sección, sql) -> [ejecuciones, segundos, filas]
+        self.fuera = _contadores(FUERA, 0)
+        self.solapada = False  # otra ejecución perfilada corrió a la vez: la memoria no es sólo de ésta
+        self.hilo = threading.current_thread()
+        self._pila = []
+
+    def abrir(self, nombre):
+        mem, pico = tracemalloc.get_traced_memory()
+        if self._pila: self._pila[-1]['_pico'] = max(self._pila[-1]['_pico'], pico)
+        if not self.solapada: tracemalloc.reset_peak()
+        s = _contadores(nombre, len(self._pila))
+        s.update(_t=time.perf_counter(), _mem=mem, _pico=mem)
+        self.secciones.append(s); self._pila.append(s)
+        return s
+
+    def cerrar(self, s):
+        if s not in self._pila: return
+        mem, pico = tracemalloc.get_traced_memory()
+        pico = max(pico, s.pop('_pico'))
+        s["Segundos"] = time.perf_counter() - s.pop('_t')
+        base = s.pop('_mem')
+        s["MB Retenidos"], s["MB Pico"] = ((float('nan'),) * 2 if self.solapada else ((mem - base) / MB, (pico - base) / MB))
+        self._pila.remove(s)
+        if self._pila: self._pila[-1]['_pico'] = max(self._pila[-1]['_pico'], pico)
+
+    def registrar_sql(self, sql, segundos, filas=0, ejecuciones=0):
+        s = self._pila[-1] if self._pila else self.fuera
+        s["Consultas"] += ejecuciones; s["Seg. SQL"] += segundos; s["Filas"] += filas
+        clave = (s["Sección"], " ".join(sql.split())[:LARGO_SQL])
+        r = self.sentencias.get(clave)
+        if r is None: r = self.sentencias[clave] = [0, 0.0, 0]
+        r[0] += ejecuciones; r[1] += segundos; r[2] += filas
+
+    def tabla_secciones(self):
+        """Una fila por sección en orden de ejecución (las anidadas con ↳), más lo que quedó fuera de ellas."""
+        total = self.segundos if self.segundos is not None else time.perf_counter() - self.inicio
+        filas = [{k: v for k, v in s.items() if not k.startswith('_')} for s in self.secciones if s not in self._pila]
+        for f in filas: f["Sección"] = "↳ " * f.pop("Nivel") + f["Sección"]
+        fuera = dict(self.fuera); fuera.pop("Nivel")
+        fuera["Segundos"] = total - sum(s["Segundos"] for s in self.secciones if s["Nivel"] == 0 and s not in self._pila)
+        return pd.DataFrame(filas + [fuera])
+
+    def tabla_sql(self):
+        """Una fila por sentencia distinta y sección, de la más lenta a la más rápida."""
+        df = pd.DataFrame([{"Sección": sec, "SQL": sql, "Ejecuciones": n, "Segundos": seg, "Filas": filas}
+                           for (sec, sql), (n, seg, filas) in self.sentencias.items()],
+                          columns=["Sección", "SQL", "Ejecuciones", "Segundos", "Filas"])
+        return df.sort_values("Segundos", ascending=False, ignore_index=True)
+
+    def resumen(self):
+        secciones = self.secciones + [self.fuera]
+        return {"Fecha": self.fecha, "Etiqueta": self.etiqueta, "Segundos": self.segundos,
+                "Consultas": sum(s["Consultas"] for s in secciones), "Seg. SQL": sum(s["Seg. SQL"] for s in secciones),
+                "DataFrames": sum(s["DataFrames"] for s in secciones), "Interrumpida": self.interrumpida}
+
+    def a_dict(self):
+        """Traza completa serializable a JSON."""
+        return {**self.resumen(), "secciones": self.tabla_secciones().to_dict("records"),
+                "sql": self.tabla_sql().to_dict("records")}
+
+
+def _contadores(nombre, nivel):
+    return {"Sección": nombre, "Nivel": nivel, "Segundos": 0.0, "Consultas": 0, "Seg. SQL": 0.0, "Filas": 0,
+            "DataFrames": 0, "MB Retenidos": 0.0, "MB Pico": 0.0}
+
+
+# --- PERFIL DEL HILO ---
+def actual():
+    """Perfil de la ejecución en curso en este hilo (None si no hay)."""
+    return getattr(_local, "perfil", None)
+
+
+def habilitado(clave_url=None):
+    """Perfil para esta ejecución: siempre con MIPC_PERFIL, o si la clave de la URL coincide con MIPC_PERFIL_CLAVE."""
+    return ACTIVO or bool(CLAVE and clave_url and hmac.compare_digest(str(clave_url), CLAVE))
+
+
+def iniciar(activo=True, etiqueta=""):
+    """Abre el perfil de la ejecución que corre en este hilo y lo devuelve (None si `activo` es falso).
+
+    El primer perfil en curso enciende tracemalloc y el conteo de DataFrames;
+    terminar los apaga cuando no queda ninguno.
+    """
+    # Las que cortó un error fuera de las secciones no llegaron a terminar: su hilo ya no existe
+    for viejo in [q for q in list(_en_curso) if not q.hilo.is_alive() or q is actual()]: terminar(viejo, interrumpida="Abandonada")
+    _local.perfil = p = Perfil(etiqueta) if activo else None
+    if p is not None:
+        with _lock:
+            if not _en_curso:
+                if not tracemalloc.is_tracing(): tracemalloc.start()
+                _contar_dataframes(True)
+            elif tracemalloc.is_tracing():
+                p.solapada = True
+                for otro in _en_curso: otro.solapada = True
+            _en_curso.add(p)
+    return p
+
+
+def terminar(perfil=None, interrumpida=None, ruta=None):
+    """Cierra el perfil (y sus secciones abiertas), lo agrega a RECIENTES y a las trazas JSONL si hay ruta."""
+    p = perfil or actual()
+    if p is None or p.segundos is not None: return p
+    while p._pila: p.cerrar(p._pila[-1])
+    p.segundos = time.perf_counter() - p.inicio; p.interrumpida = interrumpida
+    with _lock:
+        _en_curso.discard(p)
+        if not _en_curso:
+            _contar_dataframes(False)
+            if tracemalloc.is_tracing(): tracemalloc.stop()
+    RECIENTES.append(p.resumen())
+    ruta = ruta or RUTA_TRAZAS
+    if ruta:
+        linea = json.dumps(p.a_dict(), ensure_ascii=False, default=str) + "\n"
+        with _lock_trazas, open(ruta, "a", encoding="utf-8") as f: f.write(linea)
+    return p
+
+
+@contextmanager
+def seccion(nombre):
+    """Mide el bloque en el perfil del hilo; no hace nada si no hay perfil.
+
+    Una excepción que sale de la sección (st.stop, st.rerun o un error) corta
+    el script, así que termina el perfil anotando su tipo.
+    """
+    p = actual()
+    if p is None or p.segundos is not None:
+        yield
+        return
+    s = p.abrir(nombre)
+    try:
+        yield
+    except BaseException as e:
+        p.cerrar(s); terminar(p, interrumpida=type(e).__name__)
+        raise
+    p.cerrar(s)
+
+
+def _contar_dataframes(activo):
+    """Cuenta cada DataFrame construido (también los que devuelven merge, groupby, etc.) en la sección en curso.
+
+    Con activo=False vuelve a dejar el NDFrame.__init__ original.
+    """
+    global _init_ndframe
+    if not activo:
+        if _init_ndframe is not None: NDFrame.__init__ = _init_ndframe; _init_ndframe = None
+        return
+    if _init_ndframe is not None: return
+    _init_ndframe = original = NDFrame.__init__
+
+    def __init__(self, *args, **kwargs):
+        p = getattr(_local, "perfil", None)
+        if p is not None and isinstance(self, pd.DataFrame): (p._pila[-1] if p._pila else p.fuera)["DataFrames"] += 1
+        original(self, *args, **kwargs)
+    NDFrame.__init__ = __init__
+
+
+# --- CONEXIÓN MEDIDA ---
+def _registrar(sql, t0, filas=0, ejecuciones=0):
+    p = getattr(_local, "perfil", None)
+    if p is not None: p.registrar_sql(sql, time.perf_counter() - t0, filas, ejecuciones)
+
+
+class CursorMedido(sqlite3.Cursor):
+    """Registra cada sentencia y el tiempo de leer sus filas en el perfil del hilo."""
+    _sql = ""
+
+    def execute(self, sql, parametros=()):
+        self._sql = sql; t0 = time.perf_counter()
+        try: return super().execute(sql, parametros)
+        finally: _registrar(sql, t0, ejecuciones=1)
+
+    def executemany(self, sql, filas):
+        self._sql = sql; t0 = time.perf_counter()
+        try: return super().executemany(sql, filas)
+        finally: _registrar(sql, t0, ejecuciones=1)
+
+    def fetchone(self):
+        t0 = time.perf_counter(); fila = super().fetchone()
+        _registrar(self._sql, t0, filas=fila is not None)
+        return fila
+
+    def fetchmany(self, size=None):
+        t0 = time.perf_counter(); filas = super().fetchmany(self.arraysize if size is None else size)
+        _registrar(self._sql, t0, filas=len(filas))
+        return filas
+
+    def fetchall(self):
+        t0 = time.perf_counter(); filas = super().fetchall()
+        _registrar(self._sql, t0, filas=len(filas))
+        return filas
+
+    def __next__(self):
+        t0 = time.perf_counter(); fila = super().__next__()
+        _registrar(self._sql, t0, filas=1)
+        return fila
+
+
+class ConexionMedida(sqlite3.Connection):
+    """sqlite3.Connection cuyos cursores (también los de execute y pd.read_sql) son CursorMedido.
+
+    Se usa como factory: sqlite3.connect(ruta, factory=ConexionMedida).
+    """
+
+    def cursor(self, factory=CursorMedido):
+        return super().cursor(factory)
+
+    def execute(self, sql, parametros=()):
+        return self.cursor().execute(sql, parametros)
+
+    def executemany(self, sql, filas):
+        return self.cursor().executemany(sql, filas)
+
+
+# --- TRAZAS ---
+def leer_trazas(ruta):
+    """(ejecuciones, secciones, sentencias) del archivo JSONL, una fila por ejecución y sección/sentencia."""
+    ejecuciones, secciones, sentencias = [], [], []
+    with open(ruta, encoding="utf-8") as f:
+        for n, linea in enumerate(f):
+            t = json.loads(linea)
+            ejecuciones.append({"Ejecución": n, **{k: v for k, v in t.items() if k not in ("secciones", "sql")}})
+            secciones += [{"Ejecución": n, **s} for s in t["secciones"]]
+            sentencias += [{"Ejecución": n, **s} for s in t["sql"]]
+    return pd.DataFrame(ejecuciones), pd.DataFrame(secciones), pd.DataFrame(sentencias)
+
+
+def resumir_trazas(ruta):
+    """Por sección: ejecuciones, mediana, p95 y máximo de segundos y consultas promedio; por sentencia: totales."""
+    ejecuciones, secciones, sentencias = leer_trazas(ruta)
+    if secciones.empty: return ejecuciones, secciones, sentencias
+    g = secciones.groupby("Sección", sort=False)
+    por_seccion = pd.DataFrame({
+        "Ejecuciones": g.size(), "Mediana s": g["Segundos"].median(), "P95 s": g["Segundos"].quantile(0.95),
+        "Máx s": g["Segundos"].max(), "Consultas Prom.": g["Consultas"].mean(), "DataFrames Prom.": g["DataFrames"].mean(),
+        "MB Pico Máx": g["MB Pico"].max(),
+    }).reset_index()
+    if not sentencias.empty:
+        sentencias = (sentencias.groupby(["Sección", "SQL"], as_index=False)[["Ejecuciones", "Segundos", "Filas"]].sum()
+                      .sort_values("Segundos", ascending=False, ignore_index=True))
+    return ejecuciones, por_seccion, sentencias
+
+
+def main(argv=None):
+    p = argparse.ArgumentParser(description="Resume un archivo de trazas JSONL de la app (MIPC_PERFIL_TRAZAS).")
+    p.add_argument("trazas", help="archivo .jsonl con una ejecución por línea")
+    p.add_argument("--top", type=int, default=15, help="sentencias SQL a mostrar (las de más tiempo total)")
+    args = p.parse_args(argv)
+
+    ejecuciones, por_seccion, sentencias = resumir_trazas(args.trazas)
+    if ejecuciones.empty:
+        print("El archivo no tiene trazas.", file=sys.stderr)
+        return 1
+    with pd.option_context("display.width", 200, "display.max_columns", 20, "display.max_colwidth", 90):
+        print(f"{len(ejecuciones)} ejecuciones | mediana {ejecuciones['Segundos'].median():.3f} s | "
+              f"p95 {ejecuciones['Segundos'].quantile(0.95):.3f} s | "
+              f"{ejecuciones['Interrumpida'].notna().sum()} interrumpidas (st.stop/st.rerun/error)\n")
+        print(por_seccion.to_string(index=False, float_format="{:.4f}".format), "\n")
+        if not sentencias.empty: print(sentencias.head(args.top).to_string(index=False, float_format="{:.4f}".format))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,96 @@
+"""Simulación Monte Carlo del riesgo de volumen por plan comercial - MI PC S.A.
+
+El volumen mensual de cada línea se simula lognormal alrededor de su
+'Vol. Total' (con media preservada), con estacionalidad y dos shocks:
+
+    V[p, t, i] = Vol_i * s_t * exp(σc·Z[p, t] - σc²/2) * exp(σs·Y[p, i] - σs²/2)
+
+Z es un shock común al cliente, distinto cada mes. Y es un shock propio de
+cada sede, que dura todo el plazo. Con volatilidad total σ y correlación ρ
+entre sedes: σc = σ·√ρ y σs = σ·√(1-ρ). Como los tres planes sólo dependen
+del volumen y del costo variable totales del mes, todo se reduce a matrices
+(n_sim, meses) y (n_sim, líneas) sin loops de Python.
+"""
+import numpy as np
+import pandas as pd
+
+PLANES = ["A. Plan Variable", "B. Plan Híbrido", "C. Tarifa Plana"]
+BLOQUE_LINEAS = 64
+MAX_CELDAS = 30_000_000  # n_sim x (2·meses + líneas) que se simulan en ~1 s en un núcleo
+
+
+def estacionalidad_senoidal(amplitud=0.0, mes_pico=3):
+    """12 factores mensuales (media 1) con máximo en mes_pico (1-12)."""
+    meses = np.arange(1, 13)
+    return 1 + amplitud * np.cos(2 * np.pi * (meses - mes_pico) / 12)
+
+
+def simular_volumenes(vol_lineas, var_lineas, meses, n_sim=100_000, volatilidad=0.25, correlacion=0.5,
+                      estacionalidad=None, mes_inicio=1, semilla=None):
+    """Devuelve (volumen, costo_variable) totales del contrato, ambos de forma (n_sim, meses)."""
+    rng = np.random.default_rng(semilla)
+    vol_lineas = np.asarray(vol_lineas, dtype=float)
+    var_lineas = np.asarray(var_lineas, dtype=float)
+    sc = volatilidad * np.sqrt(correlacion)
+    ss = volatilidad * np.sqrt(1 - correlacion)
+
+    est = np.ones(12) if estacionalidad is None else np.asarray(estacionalidad, dtype=float)
+    s = est[(np.arange(meses) + mes_inicio - 1) % 12]
+
+    # Shock por sede (persistente): se agrega en W (volumen) y K (costo variable),
+    # por bloques de líneas para acotar la memoria en contratos grandes
+    w = np.zeros(n_sim); k = np.zeros(n_sim)
+    for i in range(0, vol_lineas.size, BLOQUE_LINEAS):
+        f_sede = np.exp(ss * rng.standard_normal((n_sim, min(BLOQUE_LINEAS, vol_lineas.size - i)), dtype=np.float32) - ss ** 2 / 2)
+        w += f_sede @ vol_lineas[i:i + BLOQUE_LINEAS].astype(np.float32)
+        k += f_sede @ var_lineas[i:i + BLOQUE_LINEAS].astype(np.float32)
+
+    # Shock común mensual y estacionalidad
+    f_mes = np.exp(sc * rng.standard_normal((n_sim, meses)) - sc ** 2 / 2) * s
+    return f_mes * w[:, None], f_mes * k[:, None]
+
+
+def escenarios_maximos(n_lineas, meses):
+    """Escenarios que entran en MAX_CELDAS para el contrato (redondeado a miles, al menos 1.000)."""
+    return max(1000, MAX_CELDAS // max(2 * meses + n_lineas, 1) // 1000 * 1000)
+
+
+def _medidas(margen, nivel):
+    q = np.quantile(margen, [1 - nivel, 0.05, 0.5, 0.95])
+    cola = margen[margen <= q[0]]
+    return {
+        "Margen Esperado": margen.mean(), "Desv. Estándar": margen.std(),
+        "P5": q[1], "P50": q[2], "P95": q[3],
+        "VaR": -q[0], "CVaR": -cola.mean() if cola.size else -q[0],
+        "Prob. Pérdida": (margen < 0).mean(),
+    }
+
+
+def simular_planes(proyecto, oferta, meses, n_sim=100_000, volatilidad=0.25, correlacion=0.5,
+                   estacionalidad=None, mes_inicio=1, nivel=0.95, semilla=None):
+    """Distribución del margen acumulado en `meses` para los tres planes.
+
+    `proyecto` son las líneas del Armador y `oferta` el resultado de
+    motor.oferta_comercial. Devuelve (resumen DataFrame, {plan: márgenes (n_sim,)}).
+    VaR/CVaR se expresan como pérdida (positivo = se pierde dinero) al `nivel` dado.
+    """
+    vol_lineas = [p['Vol. Total'] for p in proyecto]
+    var_lineas = [p['OPEX Var'] for p in proyecto]
+    vol, costo_var = simular_volumenes(vol_lineas, var_lineas, meses, n_sim, volatilidad, correlacion,
+                                       estacionalidad, mes_inicio, semilla)
+    vol_t = vol.sum(axis=1)
+    costo = (oferta['opex_fijo'] + oferta['costo_fin_mes']) * meses + costo_var.sum(axis=1)
+    exceso = np.maximum(vol - oferta['vol_total'], 0).sum(axis=1)
+
+    ingresos = {
+        PLANES[0]: oferta['p_unico'] * vol_t,
+        PLANES[1]: oferta['renta'] * meses + oferta['click'] * vol_t,
+        PLANES[2]: oferta['fact_meta'] * meses + oferta['excedente'] * exceso,
+    }
+    margenes = {plan: ing - costo for plan, ing in ingresos.items()}
+    filas = []
+    for plan, m in margenes.items():
+        fila = {"Plan": plan, **_medidas(m, nivel)}
+        fila["Margen % Esperado"] = fila["Margen Esperado"] / ingresos[plan].mean() if ingresos[plan].mean() else 0
+        filas.append(fila)
+    return pd.DataFrame(filas), margenes
@@ -0,0 +1,135 @@
+"""Grilla de sensibilidad de la Proyección - MI PC S.A.
+
+Evalúa de una sola vez todas las combinaciones de margen_meta, tasa, plazo,
+multiplicador de volumen y costo de resma. Margen, tasa, plazo y papel
+re-cotizan el contrato igual que la app (cambian fact_meta). El volumen es el
+consumo real frente al cotizado: mueve el costo variable y, si se pasa del
+contratado, factura excedente. Con eso el neto mensual de cada escenario es
+
+    neto[t] = a - cuota[t] - inversión·[t=1, Propios]
+
+y toda la grilla se resuelve con broadcasting sobre (escenarios, meses).
+"""
+import numpy as np
+import pandas as pd
+
+from catalogo import HOJAS_POR_RESMA, MESES_AMORTIZACION, obtener_catalogo
+from finanzas import amortizacion_lote, payback_lote, tasa_anual, tir_lote, vpn_lote
+from motor import RECARGO_EXCEDENTE, TASA_DESCUENTO
+
+PARAMETROS = {
+    "margen_meta": "Margen Meta", "tasa": "Tasa Anual (%)", "plazo": "Plazo (Meses)",
+    "volumen": "Volumen (x)", "costo_papel": "Costo Resma ($)",
+}
+METRICAS = ["VPN", "TIR", "Payback", "Payback Desc."]
+BLOQUE_CELDAS = 1_000_000  # escenarios x meses de cada bloque de márgenes: acota la memoria de los netos
+
+
+def base_proyecto(conn, proyecto):
+    """Totales del proyecto que no dependen de los parámetros de la grilla."""
+    cat = obtener_catalogo(conn)
+    return {
+        "opex_fijo": sum(p['OPEX Fijo'] for p in proyecto),
+        "var_consumibles": sum(cat.cpp_consumibles.get(int(p['Eq_ID']), 0.0) * p['Vol. Total'] for p in proyecto),
+        "vol_total": sum(p['Vol. Total'] for p in proyecto),
+        "inversion": sum(p['Inversión'] for p in proyecto),
+    }
+
+
+def evaluar_grilla(base, tipo_fin, gracia, margen_meta, tasa, plazo, volumen, costo_papel,
+                   meses=36, tasa_desc=TASA_DESCUENTO, con_tir=True):
+    """Evalúa el producto cartesiano de los 5 ejes (cada uno escalar o array).
+
+    Devuelve un dict con los ejes y las métricas 'VPN', 'TIR' (anual), 'Payback'
+    y 'Payback Desc.' como arrays de forma (margen, tasa, plazo, volumen, papel).
+    Los netos (escenarios x meses) se arman por bloques de márgenes de a lo
+    sumo BLOQUE_CELDAS, así la memoria no crece con el tamaño de la grilla.
+    """
+    ejes = {k: np.atleast_1d(np.asarray(v, dtype=float)) for k, v in zip(
+        PARAMETROS, (margen_meta, tasa, plazo, volumen, costo_papel))}
+    v = ejes['volumen'][None, None, None, :, None]
+    pp = (ejes['costo_papel'] / HOJAS_POR_RESMA)[None, None, None, None, :]
+    inv = base['inversion']
+
+    # Financiamiento: una tabla por cada (tasa, plazo)
+    nt, np_ = ejes['tasa'].size, ejes['plazo'].size
+    propios = tipo_fin == "Propios"
+    if propios:
+        cuotas = np.zeros((nt, np_, meses))
+        costo_fin_mes = np.full((nt, np_), inv / MESES_AMORTIZACION)
+    else:
+        lote = amortizacion_lote(inv, np.repeat(ejes['tasa'], np_), np.tile(ejes['plazo'].astype(int), nt),
+                                 "Francesa", gracia)
+        c = lote["Cuota Total"]
+        costo_fin_mes = (c.sum(axis=1) / np.maximum(lote["Plazo"], 1)).reshape(nt, np_)
+        cuotas = np.zeros((nt * np_, meses))
+        n = min(meses, c.shape[1]); cuotas[:, :n] = c[:, :n]
+        cuotas = cuotas.reshape(nt, np_, meses)
+    cfm = costo_fin_mes[None, :, :, None, None]
+
+    var_cotizado = base['var_consumibles'] + pp * base['vol_total']
+    saldo_ini = -inv if propios else 0.0
+
+    forma = tuple(e.size for e in ejes.values())
+    res = {k: np.empty(forma) for k in METRICAS}
+    paso = max(1, BLOQUE_CELDAS // (int(np.prod(forma[1:])) * meses))
+    for i in range(0, forma[0], paso):
+        m = ejes['margen_meta'][i:i + paso, None, None, None, None]
+        fact_meta = (base['opex_fijo'] + var_cotizado + cfm) / (1 - m)
+        ingreso = fact_meta * (1 + RECARGO_EXCEDENTE * np.maximum(v - 1, 0))
+        a = ingreso - base['opex_fijo'] - v * var_cotizado
+
+        netos = a[..., None] - cuotas[None, :, :, None, None, :]
+        if propios: netos[..., 0] -= inv
+
+        res["VPN"][i:i + paso] = vpn_lote(netos, tasa_desc)
+        res["TIR"][i:i + paso] = tasa_anual(tir_lote(netos)) if con_tir else np.nan
+        res["Payback"][i:i + paso] = payback_lote(netos, saldo_inicial=saldo_ini)
+        res["Payback Desc."][i:i + paso] = payback_lote(netos, tasa_desc, saldo_ini)
+    return {"ejes": ejes, **res}
+
+
+def _indice_base(eje, valor):
+    return int(np.abs(eje - valor).argmin())
+
+
+def ejes_con_base(ejes, valores_base):
+    """Agrega el valor base a cada eje (ordenado, sin duplicados)."""
+    return {k: np.unique(np.append(np.asarray(ejes[k], dtype=float), valores_base[k])) for k in PARAMETROS}
+
+
+def tornado(grilla, valores_base, metrica="VPN"):
+    """Impacto de llevar cada parámetro a su mínimo/máximo de la grilla con el resto en la base."""
+    ejes = grilla['ejes']
+    idx_base = tuple(_indice_base(ejes[k], valores_base[k]) for k in PARAMETROS)
+    base = grilla[metrica][idx_base]
+    filas = []
+    for d, k in enumerate(PARAMETROS):
+        if ejes[k].size < 2: continue
+        lo = list(idx_base); lo[d] = 0
+        hi = list(idx_base); hi[d] = ejes[k].size - 1
+        v_lo, v_hi = grilla[metrica][tuple(lo)], grilla[metrica][tuple(hi)]
+        filas.append({"Parámetro": PARAMETROS[k], "Mín": ejes[k][0], "Máx": ejes[k][-1],
+                      "Δ Mín": v_lo - base, "Δ Máx": v_hi - base, "Rango": abs(v_hi - v_lo)})
+    return pd.DataFrame(filas).sort_values("Rango") if filas else pd.DataFrame(), base
+
+
+def corte(grilla, valores_base, eje_x, eje_y, metrica="VPN"):
+    """Matriz (eje_y x eje_x) de la métrica con los demás parámetros en la base."""
+    ejes = grilla['ejes']
+    idx = [_indice_base(ejes[k], valores_base[k]) for k in PARAMETROS]
+    nombres = list(PARAMETROS)
+    dx, dy = nombres.index(eje_x), nombres.index(eje_y)
+    idx[dx] = slice(None); idx[dy] = slice(None)
+    z = grilla[metrica][tuple(idx)]
+    if dx < dy: z = z.T
+    return pd.DataFrame(z, index=ejes[eje_y], columns=ejes[eje_x])
+
+
+def a_dataframe(grilla):
+    """Grilla completa en formato largo (una fila por escenario)."""
+    mallas = np.meshgrid(*grilla['ejes'].values(), indexing="ij")
+    df = pd.DataFrame({PARAMETROS[k]: g.ravel() for k, g in zip(PARAMETROS, mallas)})
+    for metrica in METRICAS:
+        df[metrica] = grilla[metrica].ravel()
+    return df
@@ -0,0 +1,78 @@
+"""Planificación de stock de consumibles - MI PC S.A.
+
+Cruza las líneas (del proyecto actual o de todos los contratos vigentes) con
+sus consumibles en un solo merge y calcula el consumo mensual como columnas:
+unidades = Vol. Total / rendimiento. A partir de ahí todo son agregaciones
+por equipo, insumo, sede y mes. Los insumos se identifican por
+equipo + tipo, porque el "Toner" de un modelo no sirve para otro.
+
+Los contratos son las cotizaciones guardadas y firmadas (cotizaciones.py): se consideran
+vigentes desde su fecha y durante sus `meses` de proyección (cotizaciones.filtro_vigentes,
+el mismo criterio que la cartera).
+"""
+import numpy as np
+import pandas as pd
+
+from cotizaciones import filtro_cliente, filtro_vigentes
+
+CLAVE = ["Equipo", "Insumo", "Sede"]
+COLUMNAS = ["Contrato", "Cliente", "Sede", "Equipo", "Insumo", "Consumo Mes", "Costo Mes"]
+
+
+def consumos_proyecto(conn, proyecto):
+    """Consumo mensual por línea x consumible de las líneas del Armador."""
+    lineas = pd.DataFrame([{"Contrato": 0, "Cliente": "Proyecto actual", "Sede": l['Sede'], "Equipo": l['Modelo'],
+                            "equipo_id": int(l['Eq_ID']), "Vol. Total": l['Vol. Total']} for l in proyecto])
+    return _consumos(conn, lineas)
+
+
+def consumos_contratos(conn, fecha=None, cliente=None):
+    """Consumo mensual por línea x consumible de todos los contratos (cotizaciones firmadas) vigentes a `fecha` (hoy por defecto)."""
+    where, params = filtro_vigentes(fecha)
+    if cliente: cond, p = filtro_cliente(cliente, "q.cliente"); where += " AND " + cond; params += p
+    sql = ("SELECT q.id AS Contrato, q.cliente AS Cliente, l.sede AS Sede, l.modelo AS Equipo, l.equipo_id, "
+           "l.vol_total AS \"Vol. Total\" FROM cotizaciones q JOIN cotizacion_lineas l ON l.cotizacion_id = q.id "
+           f"WHERE {where}")
+    return _consumos(conn, pd.read_sql(sql, conn, params=params))
+
+
+def _consumos(conn, lineas):
+    """Cruza las líneas con todos sus consumibles (una consulta + un merge) y calcula el consumo mensual."""
+    if lineas.empty: return pd.DataFrame(columns=COLUMNAS)
+    ids = lineas['equipo_id'].unique().tolist()
+    cons = pd.read_sql(f"SELECT equipo_id, tipo AS Insumo, costo, rendimiento FROM consumibles "
+                       f"WHERE rendimiento > 0 AND equipo_id IN ({','.join('?' * len(ids))}) ORDER BY id", conn, params=ids)
+    df = lineas.merge(cons, on="equipo_id")
+    df["Consumo Mes"] = (df["Vol. Total"] / df["rendimiento"]).astype(float)
+    df["Costo Mes"] = df["Consumo Mes"] * df["costo"].astype(float)
+    return df[COLUMNAS]
+
+
+def plan_mensual(consumos, horizonte=6, por=CLAVE):
+    """Unidades a reponer en cada mes del horizonte, agrupadas por `por` (formato largo).
+
+    Las unidades son enteras y se reparten según el consumo acumulado, así que
+    su suma es exactamente la necesidad del horizonte.
+    """
+    g = consumos.groupby(list(por))[["Consumo Mes", "Costo Mes"]].sum()
+    acumulado = np.ceil(g["Consumo Mes"].to_numpy()[:, None] * np.arange(1, horizonte + 1) - 1e-9)
+    unidades = np.diff(acumulado, axis=1, prepend=0)
+    costo_unit = (g["Costo Mes"] / g["Consumo Mes"]).fillna(0).to_numpy()[:, None]
+    meses = pd.RangeIndex(1, horizonte + 1, name="Mes")
+    return pd.DataFrame({
+        "Unidades": pd.DataFrame(unidades, index=g.index, columns=meses).stack(),
+        "Costo": pd.DataFrame(unidades * costo_unit, index=g.index, columns=meses).stack(),
+    }).reset_index()
+
+
+def puntos_pedido(consumos, horizonte=6, lead_time=1, seguridad=0.5, por=CLAVE):
+    """Stock de seguridad, punto de pedido y necesidad del horizonte por `por`.
+
+    `lead_time` y `seguridad` se expresan en meses de consumo.
+    """
+    g = consumos.groupby(list(por))[["Consumo Mes", "Costo Mes"]].sum()
+    g["Stock Seguridad"] = np.ceil(g["Consumo Mes"] * seguridad - 1e-9)
+    g["Punto de Pedido"] = np.ceil(g["Consumo Mes"] * (lead_time + seguridad) - 1e-9)
+    g["Necesidad Horizonte"] = np.ceil(g["Consumo Mes"] * horizonte - 1e-9)
+    g["Costo Horizonte"] = g["Necesidad Horizonte"] * (g["Costo Mes"] / g["Consumo Mes"]).fillna(0)
+    return g.reset_index()
@@ -1,13 +1,30 @@
+import sqlite3
+from datetime import date
+
 import streamlit as st
 import pandas as pd
 import numpy as np
-import sqlite3
-import plotly.express as px
-import plotly.graph_objects as go
+import cartera
+from catalogo import obtener_catalogo
+from finanzas import resumen_lote
+import cotizaciones
+import graficos
+import importador
+import inventario
+from db import conectar, instantanea
+import motor
+import optimizador
+import perfilador
+import riesgo
+import sensibilidad
+import stock
 
 # --- CONFIGURACIÓN ---
 st.set_page_config(page_title="MPS Quote Engine - MI PC S.A.", page_icon="💻", layout="wide")
 
+# --- PERFIL (opcional: MIPC_PERFIL=1, o ?perfil=<clave> con MIPC_PERFIL_CLAVE, ver perfilador.py) ---
+perfil = perfilador.iniciar(perfilador.habilitado(st.query_params.get("perfil")))
+
 # --- HEADER CON LOGO ---
 col_logo, col_titulo = st.columns([1, 5])
 with col_logo:
@@ -39,96 +56,81 @@ st.markdown("""
 """, unsafe_allow_html=True)
 
 # --- BACKEND ---
-def init_db():
-    conn = sqlite3.connect('mipc_mps_v9_1.db')
-    c = conn.cursor()
-    c.execute('''CREATE TABLE IF NOT EXISTS equipos
-                 (id INTEGER PRIMARY KEY, marca TEXT, modelo TEXT, tipo TEXT, 
-                  velocidad INTEGER, costo_adq REAL, residual REAL, vida_util INTEGER, mantenimiento REAL)''')
-    c.execute('''CREATE TABLE IF NOT EXISTS consumibles
-                 (id INTEGER PRIMARY KEY, equipo_id INTEGER, tipo TEXT, costo REAL, rendimiento INTEGER,
-                  FOREIGN KEY(equipo_id) REFERENCES equipos(id))''')
-    
-    # Pre-carga
-    c.execute("SELECT count(*) FROM equipos")
-    if c.fetchone()[0] == 0:
-        # L6915DW
-        c.execute("INSERT INTO equipos (marca, modelo, costo_adq, residual, vida_util, mantenimiento) VALUES (?,?,?,?,?,?)", ("Brother", "MFC-L6915DW", 885.00, 50.00, 36, 20.00))
-        id_1 = c.lastrowid
-        c.execute("INSERT INTO consumibles (equipo_id, tipo, costo, rendimiento) VALUES (?,?,?,?)", (id_1, "Toner", 145.48, 25000))
-        c.execute("INSERT INTO consumibles (equipo_id, tipo, costo, rendimiento) VALUES (?,?,?,?)", (id_1, "Drum", 97.19, 75000))
-        c.execute("INSERT INTO consumibles (equipo_id, tipo, costo, rendimiento) VALUES (?,?,?,?)", (id_1, "Fuser", 185.00, 200000))
-        # L6900DW
-        c.execute("INSERT INTO equipos (marca, modelo, costo_adq, residual, vida_util, mantenimiento) VALUES (?,?,?,?,?,?)", ("Brother", "MFC-L6900DW", 856.00, 50.00, 36, 20.00))
-        id_2 = c.lastrowid
-        c.execute("INSERT INTO consumibles (equipo_id, tipo, costo, rendimiento) VALUES (?,?,?,?)", (id_2, "Toner", 112.50, 20000))
-        c.execute("INSERT INTO consumibles (equipo_id, tipo, costo, rendimiento) VALUES (?,?,?,?)", (id_2, "Drum", 86.89, 50000))
-        c.execute("INSERT INTO consumibles (equipo_id, tipo, costo, rendimiento) VALUES (?,?,?,?)", (id_2, "Fuser", 185.00, 200000))
-        # Color
-        c.execute("INSERT INTO equipos (marca, modelo, costo_adq, residual, vida_util, mantenimiento) VALUES (?,?,?,?,?,?)", ("Brother", "MFC-L9630CDN", 1275.00, 50.00, 36, 20.00))
-        id_3 = c.lastrowid
-        c.execute("INSERT INTO consumibles (equipo_id, tipo, costo, rendimiento) VALUES (?,?,?,?)", (id_3, "Toner CMYK", 492.00, 10000))
-        c.execute("INSERT INTO consumibles (equipo_id, tipo, costo, rendimiento) VALUES (?,?,?,?)", (id_3, "Drum", 178.64, 100000))
-        c.execute("INSERT INTO consumibles (equipo_id, tipo, costo, rendimiento) VALUES (?,?,?,?)", (id_3, "Fuser", 185.00, 200000))
-    conn.commit()
-    return conn
-
-conn = init_db()
+# Una conexión de escritura y una de sólo lectura por sesión: cada ejecución corre en un hilo nuevo,
+# pero las de una misma sesión nunca a la vez
+with perfilador.seccion("Conexión"):
+    fabrica = perfilador.ConexionMedida if perfil else sqlite3.Connection
+    conn = conectar(factory=fabrica, sesion=st.session_state)
+    lectura = conectar(solo_lectura=True, factory=fabrica, sesion=st.session_state)
+    # Catálogo vigente, una consulta por ejecución: las funciones por línea de motor lo reciben
+    cat = obtener_catalogo(conn)
 
 # --- FUNCIONES ---
-def calcular_amortizacion(monto, tasa_anual, meses, tipo, gracia=0):
-    tabla = []
-    saldo = monto
-    tasa_mensual = (tasa_anual / 100) / 12
-    plazo_pago = meses - gracia
-    
-    cuota_francesa = 0
-    if tipo == "Francesa" and tasa_mensual > 0 and plazo_pago > 0:
-        cuota_francesa = saldo * (tasa_mensual * (1 + tasa_mensual)**plazo_pago) / ((1 + tasa_mensual)**plazo_pago - 1)
-    elif tipo == "Francesa" and tasa_mensual == 0 and plazo_pago > 0:
-        cuota_francesa = saldo / plazo_pago
-    
-    amort_alemana = saldo / plazo_pago if plazo_pago > 0 else 0
+def get_detalles_equipo(equipo_id, volumen_unit, incluir_papel, costo_papel):
+    return motor.get_detalles_equipo(conn, equipo_id, volumen_unit, incluir_papel, costo_papel, cat)
 
-    for m in range(1, meses + 1):
-        interes = saldo * tasa_mensual
-        if m <= gracia:
-            pago_capital = 0; cuota = interes; saldo_final = saldo
-        else:
-            if tipo == "Francesa": cuota = cuota_francesa; pago_capital = cuota - interes
-            else: pago_capital = amort_alemana; cuota = pago_capital + interes
-            saldo_final = saldo - pago_capital
-            if saldo_final < 0: saldo_final = 0
-        tabla.append({"Mes": m, "Cuota Total": cuota, "Interés": interes, "Capital": pago_capital, "Saldo": saldo_final})
-        saldo = saldo_final
-    return pd.DataFrame(tabla)
+def en_vista(tab):
+    """Falso sólo si se calcula únicamente la pestaña activa y ésta no lo es."""
+    return tab.open is not False
 
-def get_detalles_equipo(equipo_id, volumen_unit, incluir_papel, costo_papel):
-    df_cons = pd.read_sql_query(f"SELECT * FROM consumibles WHERE equipo_id = {equipo_id}", conn)
-    cpp_cons = 0
-    for _, row in df_cons.iterrows():
-        if row['rendimiento'] > 0: cpp_cons += row['costo'] / row['rendimiento']
-    
-    cpp_papel = costo_papel / 500 if incluir_papel else 0
-    cpp_total = cpp_cons + cpp_papel
-    
-    eq = pd.read_sql_query(f"SELECT * FROM equipos WHERE id = {equipo_id}", conn).iloc[0]
-    
-    amort_mensual = eq['costo_adq'] / 36
-    costo_hw_pag = amort_mensual / volumen_unit if volumen_unit > 0 else 0
-    
-    return {
-        "modelo": eq['modelo'], "costo_adq": eq['costo_adq'], "manto": eq['mantenimiento'],
-        "cpp": cpp_total, "opex_var": cpp_total * volumen_unit,
-        "amort_mensual": amort_mensual, "hw_cpp": costo_hw_pag
-    }
+# Resultados caros cacheados por sus parámetros (gráficos, tablas de amortización, simulaciones y grillas)
+financiar = st.cache_data(motor.financiar, max_entries=64, show_spinner=False)
+
+@st.cache_data(max_entries=64, show_spinner=False)
+def figura(nombre, *args):
+    """Gráfico `nombre` de graficos.py."""
+    return getattr(graficos, nombre)(*args)
+
+@st.cache_data(max_entries=8, show_spinner="Simulando...")
+def simular_riesgo(proyecto, oferta, plazo, n_sim, volat, correl, amplitud):
+    resumen_riesgo, margenes = riesgo.simular_planes(proyecto, oferta, plazo, n_sim, volat, correl,
+                                                     riesgo.estacionalidad_senoidal(amplitud), semilla=42)
+    return resumen_riesgo, graficos.distribucion_margen(margenes)
+
+@st.cache_data(max_entries=8, show_spinner="Calculando grilla...")
+def grilla_sensibilidad(_conn, version_catalogo, proyecto, tipo_fin, gracia, ejes, meses):
+    return sensibilidad.evaluar_grilla(sensibilidad.base_proyecto(_conn, proyecto), tipo_fin, gracia, *ejes.values(), meses=meses)
+
+def cargar_proyecto(lineas):
+    """Reemplaza el proyecto completo (nuevo o abierto del historial)."""
+    st.session_state['proyecto'] = lineas
+    st.session_state['financiamiento'] = {}
+    st.session_state['totales'] = motor.totales_proyecto(lineas)
+    st.session_state['papel_proyecto'] = None  # fuerza recalcular el costo variable con el papel actual
+    st.session_state['version_proyecto'] = st.session_state.get('version_proyecto', 0) + 1  # editor nuevo
+
+# Columnas editables del Armador y su tipo (el editor devuelve los números como float)
+TIPOS_EDITABLES = {"Sede": str, "Cantidad": int, "Vol. Unit": int}
+
+def aplicar_ediciones(key, incluir_papel, costo_papel):
+    """Callback del editor del Armador: recalcula sólo las celdas que cambiaron.
+
+    Corre antes de la nueva ejecución, en su hilo: pide la conexión de la
+    sesión en vez de usar la `conn` global de la ejecución anterior.
+    """
+    conn = conectar(sesion=st.session_state); proyecto = st.session_state['proyecto']
+    cat = obtener_catalogo(conn)
+    for i, cambios in st.session_state[key]["edited_rows"].items():
+        linea = proyecto[int(i)]
+        cambios = {c: TIPOS_EDITABLES[c](v) for c, v in cambios.items() if c in TIPOS_EDITABLES and v is not None}
+        cambios = {c: v for c, v in cambios.items() if v != linea[c]}
+        if cambios: motor.editar_linea(conn, proyecto, st.session_state['totales'], int(i), cambios, incluir_papel, costo_papel, cat)
+
+def aplicar_cartera(key):
+    """Callback del editor de la Cartera: rehace sólo los contratos que cambiaron."""
+    c = st.session_state['cartera']
+    for i, cambios in st.session_state[key]["edited_rows"].items():
+        fila = c.contratos.iloc[int(i)]
+        cambios = {k: v for k, v in cambios.items() if v is not None and v != fila[k]}
+        if cambios: c.actualizar(int(fila['Contrato']), **cambios)
 
 # --- SESSION ---
 if 'proyecto' not in st.session_state: st.session_state['proyecto'] = []
 if 'financiamiento' not in st.session_state: st.session_state['financiamiento'] = {}
+if 'totales' not in st.session_state: st.session_state['totales'] = motor.totales_proyecto(st.session_state['proyecto'])
 
 # --- SIDEBAR ---
-with st.sidebar:
+with st.sidebar, perfilador.seccion("Sidebar"):
     st.header("Configuración")
     margen_meta = st.slider("Margen Meta (%)", 10, 60, 30) / 100
     st.divider()
@@ -137,27 +139,30 @@ with st.sidebar:
     costo_papel = st.number_input("Costo Resma ($)", value=2.80) if incluir_papel else 0
     
     # --- AUTO RECALCULO (LA SOLUCIÓN DEL BUG) ---
-    # Si hay items en el proyecto, los actualizamos al instante con la configuración actual
-    if len(st.session_state['proyecto']) > 0:
+    # Si cambió el papel o los precios del catálogo, actualizamos al instante todos los items con la configuración actual
+    clave_papel = (incluir_papel, costo_papel, cat.version)
+    if st.session_state.get('papel_proyecto') != clave_papel:
         for item in st.session_state['proyecto']:
             # Volvemos a calcular el costo unitario con el estado actual del papel
-            det_actualizado = get_detalles_equipo(item['Eq_ID'], item['Vol. Unit'], incluir_papel, costo_papel)
-            # Actualizamos los valores dependientes
-            item['Costo Toner Unit'] = det_actualizado['cpp']
-            item['OPEX Var'] = det_actualizado['opex_var'] * item['Cantidad']
-            # (El resto de fijos no cambia con el papel, pero el variable sí)
+            # (el resto de fijos no cambia con el papel, pero el variable sí)
+            motor.actualizar_costo_variable(conn, item, incluir_papel, costo_papel, cat)
+        st.session_state['totales'] = motor.totales_proyecto(st.session_state['proyecto'])
+        st.session_state['papel_proyecto'] = clave_papel
+
+    # Con el modo perezoso cambiar de pestaña vuelve a ejecutar el script y sólo la activa calcula y dibuja resultados
+    solo_activa = st.toggle("⚡ Calcular sólo la pestaña activa", value=True, key="solo_activa")
 
     st.divider()
     if st.button("🗑️ Nuevo Proyecto", type="primary"):
-        st.session_state['proyecto'] = []
-        st.session_state['financiamiento'] = {}
+        cargar_proyecto([])
         st.rerun()
 
 # --- TABS ---
-tabs = st.tabs(["🛠️ 1. Inventario", "🏗️ 2. Armador", "💰 3. Financiamiento", "📊 4. Oferta Comercial", "📈 5. Proyección", "📦 6. Stock", "🧮 7. Calculadora"])
+tabs = st.tabs(["🛠️ 1. Inventario", "🏗️ 2. Armador", "💰 3. Financiamiento", "📊 4. Oferta Comercial", "📈 5. Proyección", "📦 6. Stock", "🧮 7. Calculadora", "🗂️ 8. Historial", "💼 9. Cartera"],
+               key="pestana", on_change="rerun" if solo_activa else "ignore")
 
 # ================= TAB 1: INVENTARIO =================
-with tabs[0]:
+with tabs[0], perfilador.seccion("Inventario"):
     st.subheader("Gestión Maestra de Inventario")
     
     with st.expander("➕ CREAR NUEVO MODELO", expanded=False):
@@ -172,104 +177,134 @@ with tabs[0]:
             new_manto = c6.number_input("Manto Mensual ($)", 0.0)
             if st.form_submit_button("Guardar"):
                 if new_modelo:
-                    conn.execute("INSERT INTO equipos (marca, modelo, tipo, costo_adq, residual, vida_util, mantenimiento) VALUES (?,?,?,?,?,?,?)",
-                                 (new_marca, new_modelo, new_tipo, new_costo, new_resid, 36, new_manto))
-                    conn.commit(); st.success(f"{new_modelo} agregado."); st.rerun()
+                    inventario.crear_equipo(conn, new_marca, new_modelo, new_tipo, new_costo, new_resid, new_manto)
+                    st.success(f"{new_modelo} agregado."); st.rerun()
 
-    st.divider()
-    st.markdown("##### 📝 Editar Equipos Existentes")
-    equipos_df = pd.read_sql("SELECT id, marca, modelo, costo_adq, residual, mantenimiento FROM equipos", conn)
-    edited_equipos = st.data_editor(equipos_df, column_config={"id": st.column_config.NumberColumn("ID", disabled=True)}, use_container_width=True, hide_index=True, key="editor_equipos")
+    with st.expander("📥 IMPORTAR LISTA DE PRECIOS (CSV / Excel)", expanded=False):
+        st.caption("Columnas: marca, modelo y opcionalmente tipo, precio/costo, residual, mantenimiento, insumo, costo insumo, rendimiento. Se actualiza por marca+modelo y por equipo+insumo.")
+        archivo = st.file_uploader("Lista del mayorista", type=["csv", "xlsx"])
+        ci1, ci2 = st.columns(2)
+        imp_decimal = ci1.selectbox("Separador decimal", ["Auto", ",", "."])
+        imp_simular = ci2.checkbox("Simular (no guarda cambios)")
+        if archivo is not None and st.button("📥 Importar"):
+            with st.spinner("Importando..."):
+                try:
+                    res = importador.importar(conn, archivo, simular=imp_simular, nombre=archivo.name,
+                                              decimal=None if imp_decimal == "Auto" else imp_decimal)
+                except (ValueError, ImportError) as e:
+                    st.error(str(e)); res = None
+            if res:
+                st.success(f"{'Simulación: ' if imp_simular else ''}{res['filas']} filas | Equipos: {res['equipos_nuevos']} nuevos, {res['equipos_actualizados']} actualizados | Insumos: {res['insumos_nuevos']} nuevos, {res['insumos_actualizados']} actualizados")
+                if res['errores']:
+                    st.warning(f"{res['errores']} filas con errores")
+                    st.dataframe(pd.DataFrame(res['detalle_errores']), use_container_width=True, hide_index=True)
 
-    if st.button("💾 Actualizar Equipos"):
-        for index, row in edited_equipos.iterrows():
-            conn.execute("UPDATE equipos SET marca=?, modelo=?, costo_adq=?, residual=?, mantenimiento=? WHERE id=?", 
-                         (row['marca'], row['modelo'], row['costo_adq'], row['residual'], row['mantenimiento'], row['id']))
-        conn.commit(); st.success("Cambios guardados."); st.rerun()
+    if en_vista(tabs[0]):
+        st.divider()
+        st.markdown("##### 📝 Editar Equipos Existentes")
+        equipos_df = pd.read_sql("SELECT id, marca, modelo, costo_adq, residual, mantenimiento FROM equipos", conn)
+        edited_equipos = st.data_editor(equipos_df, column_config={"id": st.column_config.NumberColumn("ID", disabled=True)}, use_container_width=True, hide_index=True, key="editor_equipos")
 
-    st.divider()
-    st.markdown("##### 🧪 Consumibles")
-    eq_list = pd.read_sql("SELECT id, modelo FROM equipos", conn)
-    if not eq_list.empty:
-        eq_sel = st.selectbox("Equipo:", eq_list['id'].tolist(), format_func=lambda x: eq_list[eq_list['id']==x]['modelo'].values[0])
-        with st.form("add_cons_fast"):
-            cc1, cc2, cc3, cc4 = st.columns([2,1,1,1])
-            t_tipo = cc1.text_input("Tipo")
-            t_costo = cc2.number_input("Costo", 0.0)
-            t_rend = cc3.number_input("Rend.", 1000)
-            if cc4.form_submit_button("➕"):
-                conn.execute("INSERT INTO consumibles (equipo_id, tipo, costo, rendimiento) VALUES (?,?,?,?)", (eq_sel, t_tipo, t_costo, t_rend))
-                conn.commit(); st.rerun()
+        if st.button("💾 Actualizar Equipos"):
+            n_cambios = inventario.guardar_equipos(conn, equipos_df, edited_equipos)
+            st.success(f"Cambios guardados ({n_cambios} equipos)."); st.rerun()
+
+        st.divider()
+        st.markdown("##### 🧪 Consumibles")
+        eq_list = pd.read_sql("SELECT id, modelo FROM equipos", conn)
+        if not eq_list.empty:
+            eq_sel = st.selectbox("Equipo:", eq_list['id'].tolist(), format_func=dict(zip(eq_list['id'], eq_list['modelo'])).get)
+            with st.form("add_cons_fast"):
+                cc1, cc2, cc3, cc4 = st.columns([2,1,1,1])
+                t_tipo = cc1.text_input("Tipo")
+                t_costo = cc2.number_input("Costo", 0.0)
+                t_rend = cc3.number_input("Rend.", 1000)
+                if cc4.form_submit_button("➕"):
+                    inventario.agregar_consumible(conn, eq_sel, t_tipo, t_costo, t_rend); st.rerun()
         
-        cons_df = pd.read_sql(f"SELECT tipo, costo, rendimiento FROM consumibles WHERE equipo_id={eq_sel}", conn)
-        edited_cons = st.data_editor(cons_df, num_rows="dynamic", use_container_width=True, key="editor_cons")
-        if st.button("💾 Guardar Consumibles"):
-            conn.execute(f"DELETE FROM consumibles WHERE equipo_id={eq_sel}")
-            for i, r in edited_cons.iterrows():
-                if r['tipo']: conn.execute("INSERT INTO consumibles (equipo_id, tipo, costo, rendimiento) VALUES (?,?,?,?)", (eq_sel, r['tipo'], r['costo'], r['rendimiento']))
-            conn.commit(); st.success("Actualizado."); st.rerun()
+            cons_df = pd.read_sql("SELECT id, tipo, costo, rendimiento FROM consumibles WHERE equipo_id=?", conn, params=(int(eq_sel),))
+            edited_cons = st.data_editor(cons_df, column_config={"id": None}, num_rows="dynamic", use_container_width=True, hide_index=True, key="editor_cons")
+            if st.button("💾 Guardar Consumibles"):
+                n_ins, n_upd, n_del = inventario.guardar_consumibles(conn, eq_sel, cons_df, edited_cons)
+                st.success(f"Actualizado ({n_ins} nuevos, {n_upd} modificados, {n_del} eliminados)."); st.rerun()
 
 # ================= TAB 2: ARMADOR =================
-with tabs[1]:
+with tabs[1], perfilador.seccion("Armador"):
     st.subheader("Configuración del Contrato")
-    eqs = pd.read_sql("SELECT * FROM equipos", conn)
-    if not eqs.empty:
+    modelos_cat = {i: e['modelo'] for i, e in cat.equipos.items()}
+    if modelos_cat:
         with st.expander("➕ Agregar Línea", expanded=True):
             c1, c2, c3, c4, c5 = st.columns([2, 2, 1, 1, 1])
             with c1: sede = st.text_input("Sede / Dpto")
-            with c2: id_eq = st.selectbox("Modelo", eqs['id'].tolist(), format_func=lambda x: eqs[eqs['id']==x]['modelo'].values[0])
+            with c2: id_eq = st.selectbox("Modelo", list(modelos_cat), format_func=modelos_cat.get)
             with c3: cant = st.number_input("Cant.", 1, 100, 1)
             with c4: vol = st.number_input("Vol. Unit.", 100, 200000, 3000)
             with c5: 
                 st.write(""); st.write("") 
                 if st.button("Agregar"):
-                    det = get_detalles_equipo(id_eq, vol, incluir_papel, costo_papel)
-                    st.session_state['proyecto'].append({
-                        "Sede": sede, "Modelo": det['modelo'], "Cantidad": cant, "Vol. Unit": vol,
-                        "Vol. Total": vol*cant, "Inversión": det['costo_adq']*cant,
-                        "OPEX Fijo": det['manto']*cant, "OPEX Var": det['opex_var']*cant, "Eq_ID": id_eq,
-                        "Costo HW Mes": (det['amort_mensual'] + det['manto']) * cant, 
-                        "Costo HW Unit": det['hw_cpp'], "Costo Toner Unit": det['cpp']
-                    })
-                    st.rerun()
-
-        if len(st.session_state['proyecto']) > 0:
+                    linea = motor.linea_proyecto(conn, sede, id_eq, cant, vol, incluir_papel, costo_papel, cat)
+                    st.session_state['proyecto'].append(linea)
+                    for c in motor.COLS_TOTALES: st.session_state['totales'][c] += linea[c]
+
+        with st.expander("🧠 Optimizar Flota por Sede", expanded=False):
+            st.caption("Elige el modelo y la cantidad de menor costo (amortización + mantenimiento + costo por página) para cada sede.")
+            if 'sedes_opt' not in st.session_state:
+                st.session_state['sedes_opt'] = pd.DataFrame({"Sede": ["Matriz"], "Volumen": [10000], "Tipo": ["B/N"], "Cantidad Mínima": [1]})
+            sedes_opt = st.data_editor(st.session_state['sedes_opt'], num_rows="dynamic", use_container_width=True, hide_index=True, key="editor_sedes_opt",
+                                       column_config={"Tipo": st.column_config.SelectboxColumn("Tipo", options=["B/N", "Color"], required=True),
+                                                      "Volumen": st.column_config.NumberColumn("Volumen (Págs/Mes)", min_value=0),
+                                                      "Cantidad Mínima": st.column_config.NumberColumn("Cant. Mínima", min_value=1)})
+            o1, o2, o3, o4 = st.columns(4)
+            objetivo = o1.radio("Objetivo", list(optimizador.OBJETIVOS), format_func=optimizador.OBJETIVOS.get)
+            capacidad = o2.number_input("Capacidad por Equipo (Págs/Mes)", 1000, 200000, optimizador.CAPACIDAD_EQUIPO, 1000)
+            precio_pag = o3.number_input("Precio por Página ($)", 0.0, 1.0, 0.05, 0.005, format="%.4f", disabled=objetivo != "margen")
+            renta_eq = o4.number_input("Renta por Equipo ($)", 0.0, 1000.0, 0.0, disabled=objetivo != "margen")
+            color_bn = st.checkbox("Permitir equipos color en sedes B/N")
+            if st.button("🧠 Optimizar"):
+                sedes_validas = sedes_opt.dropna(subset=["Sede", "Volumen", "Tipo"])
+                st.session_state['optimizacion'] = optimizador.optimizar(conn, sedes_validas, objetivo, incluir_papel, costo_papel,
+                                                                         precio_pag, renta_eq, capacidad, color_bn)
+            opt = st.session_state.get('optimizacion')
+            if opt is not None and en_vista(tabs[1]):
+                st.dataframe(opt.style.format({"Volumen": "{:,.0f}", "Vol. Unit": "{:,.0f}", "Costo Fijo": "${:,.2f}", "Costo Variable": "${:,.2f}",
+                                               "Costo Mensual": "${:,.2f}", "Costo por Página": "${:.4f}", "Ingreso": "${:,.2f}",
+                                               "Margen": "${:,.2f}", "Δ 2ª Opción": "${:,.2f}"}, na_rep="-"),
+                             use_container_width=True, hide_index=True)
+                sin_modelo = opt['Eq_ID'].isna().sum()
+                st.markdown(f"**Costo Mensual Total:** ${opt['Costo Mensual'].sum():,.2f}" + (f" | :red[{sin_modelo} sedes sin modelo posible]" if sin_modelo else ""))
+                if st.button("➕ Agregar al Proyecto"):
+                    for linea in optimizador.a_proyecto(conn, opt, incluir_papel, costo_papel):
+                        st.session_state['proyecto'].append(linea)
+                        for c in motor.COLS_TOTALES: st.session_state['totales'][c] += linea[c]
+                    st.session_state['optimizacion'] = None
+
+        if len(st.session_state['proyecto']) > 0 and en_vista(tabs[1]):
             st.divider()
             df_proy = pd.DataFrame(st.session_state['proyecto'])
             
-            edited_proy = st.data_editor(df_proy, column_config={
-                    "Cantidad": st.column_config.NumberColumn("Cant.", min_value=1),
-                    "Vol. Unit": st.column_config.NumberColumn("Vol. Unit", min_value=1),
+            # Las ediciones se aplican en el callback (sólo las filas tocadas), antes de esta corrida
+            key_editor = f"editor_proy_{st.session_state.get('version_proyecto', 0)}"
+            st.data_editor(df_proy, key=key_editor, on_change=aplicar_ediciones, args=(key_editor, incluir_papel, costo_papel), column_config={
+                    "Cantidad": st.column_config.NumberColumn("Cant.", min_value=1, step=1),
+                    "Vol. Unit": st.column_config.NumberColumn("Vol. Unit", min_value=1, step=1),
                     "Modelo": st.column_config.TextColumn("Modelo", disabled=True),
                     "Vol. Total": st.column_config.NumberColumn("Vol. Total", disabled=True),
                     "Inversión": st.column_config.NumberColumn("Inversión", disabled=True),
+                    "OPEX Fijo": st.column_config.NumberColumn("OPEX Fijo", disabled=True),
+                    "OPEX Var": st.column_config.NumberColumn("OPEX Var", disabled=True),
+                    "Eq_ID": st.column_config.NumberColumn("Eq_ID", disabled=True),
                     "Costo HW Mes": None, "Costo HW Unit": None, "Costo Toner Unit": None
                 }, use_container_width=True, hide_index=True)
-            
-            if not df_proy.equals(edited_proy):
-                new_list = []
-                for idx, row in edited_proy.iterrows():
-                    det = get_detalles_equipo(row['Eq_ID'], row['Vol. Unit'], incluir_papel, costo_papel)
-                    row['Vol. Total'] = row['Vol. Unit'] * row['Cantidad']
-                    row['Inversión'] = det['costo_adq'] * row['Cantidad']
-                    row['OPEX Fijo'] = det['manto'] * row['Cantidad']
-                    row['OPEX Var'] = det['opex_var'] * row['Cantidad']
-                    row['Costo HW Mes'] = (det['amort_mensual'] + det['manto']) * row['Cantidad']
-                    row['Costo HW Unit'] = det['hw_cpp']
-                    row['Costo Toner Unit'] = det['cpp']
-                    new_list.append(row)
-                st.session_state['proyecto'] = new_list
-                st.rerun()
-            tot_inv = sum(p['Inversión'] for p in st.session_state['proyecto'])
+            tot_inv = st.session_state['totales']['Inversión']
             st.markdown(f"#### Inversión Total: :blue[${tot_inv:,.2f}]")
     else: st.warning("Carga inventario en Tab 1.")
 
 # ================= TAB 3: FINANCIAMIENTO =================
-with tabs[2]:
+with tabs[2], perfilador.seccion("Financiamiento"):
     st.subheader("Financiamiento")
     if len(st.session_state['proyecto']) == 0: st.info("Arma el proyecto.")
     else:
-        monto_total = sum(p['Inversión'] for p in st.session_state['proyecto'])
+        monto_total = st.session_state['totales']['Inversión']
         c1, c2 = st.columns([1, 2])
         with c1:
             st.metric("A Financiar", f"${monto_total:,.2f}")
@@ -280,47 +315,53 @@ with tabs[2]:
                 plazo = st.number_input("Plazo (Meses)", 1, 60, 36)
                 if tipo_fin == "Mayorista": gracia = st.number_input("Gracia", 0, 12, 0)
             
-            if tipo_fin == "Propios": df_amort = pd.DataFrame(); interes_total = 0
-            else:
-                df_amort = calcular_amortizacion(monto_total, tasa, plazo, "Francesa", gracia)
-                interes_total = df_amort['Interés'].sum()
-            st.session_state['financiamiento'] = {"Tipo": tipo_fin, "Tabla": df_amort, "Inv": monto_total, "Int": interes_total, "Plazo": plazo}
+            fin = financiar(monto_total, tipo_fin, tasa, plazo, gracia)
+            st.session_state['financiamiento'] = fin
+            df_amort, interes_total = fin['Tabla'], fin['Int']
         with c2:
-            if not df_amort.empty:
+            if not df_amort.empty and en_vista(tabs[2]):
                 st.metric("Intereses Totales", f"${interes_total:,.2f}")
-                st.plotly_chart(px.bar(df_amort, x="Mes", y=["Capital", "Interés"]), use_container_width=True)
+                st.plotly_chart(figura("amortizacion", df_amort), use_container_width=True)
+
+        with st.expander("⚖️ Comparar Bancario vs Mayorista", expanded=False):
+            k1, k2 = st.columns(2)
+            tasa_b = k1.number_input("Tasa Bancaria (%)", 0.0, 100.0, 12.0, key="cmp_tasa_b")
+            plazo_b = k1.number_input("Plazo Bancario", 1, 60, 36, key="cmp_plazo_b")
+            tasa_m = k2.number_input("Tasa Mayorista (%)", 0.0, 100.0, 15.0, key="cmp_tasa_m")
+            plazo_m = k2.number_input("Plazo Mayorista", 1, 60, 36, key="cmp_plazo_m")
+            gracia_m = k2.number_input("Gracia Mayorista", 0, 12, 3, key="cmp_gracia_m")
+            if en_vista(tabs[2]):
+                comp = resumen_lote(monto_total, [tasa_b, tasa_b, tasa_m, tasa_m], [plazo_b, plazo_b, plazo_m, plazo_m],
+                                    ["Francesa", "Alemana", "Francesa", "Alemana"], [0, 0, gracia_m, gracia_m],
+                                    ["Bancario Francesa", "Bancario Alemana", "Mayorista Francesa", "Mayorista Alemana"])
+                st.dataframe(comp.style.format({"Monto": "${:,.2f}", "Cuota Promedio": "${:,.2f}", "Cuota Máxima": "${:,.2f}",
+                                                "Interés Total": "${:,.2f}", "Total Pagado": "${:,.2f}"}), use_container_width=True, hide_index=True)
 
 # ================= TAB 4: OFERTA COMERCIAL =================
-with tabs[3]:
+with tabs[3], perfilador.seccion("Oferta Comercial"):
     st.subheader("Oferta Comercial y Desglose")
     if len(st.session_state['proyecto']) > 0:
-        df = pd.DataFrame(st.session_state['proyecto'])
+        if en_vista(tabs[3]):
+            df = pd.DataFrame(st.session_state['proyecto'])
         
-        # 1. TABLA DETALLADA
-        st.markdown("### 🔬 Desglose Unitario Real")
-        cols_mostrar = df[["Sede", "Modelo", "Vol. Unit", "Costo HW Mes", "Costo HW Unit", "Costo Toner Unit"]].copy()
-        cols_mostrar["Costo HW Mes (Por Máquina)"] = cols_mostrar["Costo HW Mes"] / df["Cantidad"]
+            # 1. TABLA DETALLADA
+            st.markdown("### 🔬 Desglose Unitario Real")
+            cols_mostrar = df[["Sede", "Modelo", "Vol. Unit", "Costo HW Mes", "Costo HW Unit", "Costo Toner Unit"]].copy()
+            cols_mostrar["Costo HW Mes (Por Máquina)"] = cols_mostrar["Costo HW Mes"] / df["Cantidad"]
         
-        st.dataframe(cols_mostrar[["Sede", "Modelo", "Vol. Unit", "Costo HW Mes (Por Máquina)", "Costo HW Unit", "Costo Toner Unit"]].style.format({
-            "Vol. Unit": "{:,.0f}", "Costo HW Mes (Por Máquina)": "${:,.2f}", "Costo HW Unit": "${:.5f}", "Costo Toner Unit": "${:.5f}"
-        }), use_container_width=True)
+            st.dataframe(cols_mostrar[["Sede", "Modelo", "Vol. Unit", "Costo HW Mes (Por Máquina)", "Costo HW Unit", "Costo Toner Unit"]].style.format({
+                "Vol. Unit": "{:,.0f}", "Costo HW Mes (Por Máquina)": "${:,.2f}", "Costo HW Unit": "${:.5f}", "Costo Toner Unit": "${:.5f}"
+            }), use_container_width=True)
         
-        st.divider()
+            st.divider()
 
         # 2. TOTALES Y PRECIOS
-        vol_total = df['Vol. Total'].sum()
-        opex_total = df['OPEX Fijo'].sum() + df['OPEX Var'].sum()
         fin = st.session_state.get('financiamiento', {})
         if not fin: st.error("Falta Financiamiento."); st.stop()
         
-        costo_fin_mes = fin['Inv']/36 if fin['Tipo']=="Propios" else (fin['Tabla']['Cuota Total'].mean() if not fin['Tabla'].empty else 0)
-        costo_total_real = opex_total + costo_fin_mes
-        fact_meta = costo_total_real / (1 - margen_meta)
-        
-        p_unico = fact_meta / vol_total if vol_total else 0
-        renta = (df['OPEX Fijo'].sum() + costo_fin_mes) / (1 - margen_meta)
-        click = (df['OPEX Var'].sum() / (1 - margen_meta)) / vol_total if vol_total else 0
-        excedente = p_unico * 1.15
+        oferta = motor.oferta_comercial(st.session_state['proyecto'], fin, margen_meta, st.session_state['totales'])
+        p_unico, renta, click = oferta['p_unico'], oferta['renta'], oferta['click']
+        fact_meta, excedente = oferta['fact_meta'], oferta['excedente']
         
         c1, c2, c3 = st.columns(3)
         with c1: 
@@ -343,68 +384,153 @@ with tabs[3]:
             <b>Riesgo:</b> Si imprimen hasta el límite, tu margen es el 30%. Si imprimen menos, tu margen SUBE (porque gastas menos tóner).<br>
             <i>Si se pasan, cobras excedente con penalidad.</i></div>""", unsafe_allow_html=True)
 
+        # 3. RIESGO DE VOLUMEN (MONTE CARLO)
+        st.divider()
+        with st.expander("🎲 Riesgo de Volumen (Monte Carlo)", expanded=False):
+            r1, r2, r3, r4 = st.columns(4)
+            volat = r1.slider("Volatilidad Volumen (%)", 5, 80, 25) / 100
+            correl = r2.slider("Correlación entre Sedes (%)", 0, 100, 50) / 100
+            amplitud = r3.slider("Estacionalidad (±%)", 0, 40, 0) / 100
+            n_sim = r4.selectbox("Escenarios", [10_000, 50_000, 100_000], index=2)
+            if st.toggle("Simular", key="simular_riesgo") and en_vista(tabs[3]):
+                # El costo crece con las líneas: se recortan los escenarios para responder en ~1 s
+                tope = riesgo.escenarios_maximos(len(st.session_state['proyecto']), fin['Plazo'])
+                if n_sim > tope: st.caption(f"Con {len(st.session_state['proyecto'])} líneas se simulan {tope:,} escenarios."); n_sim = tope
+                resumen_riesgo, fig_riesgo = simular_riesgo(st.session_state['proyecto'], oferta, fin['Plazo'], n_sim, volat, correl, amplitud)
+                st.dataframe(resumen_riesgo.style.format({
+                    "Margen Esperado": "${:,.2f}", "Desv. Estándar": "${:,.2f}", "P5": "${:,.2f}", "P50": "${:,.2f}",
+                    "P95": "${:,.2f}", "VaR": "${:,.2f}", "CVaR": "${:,.2f}", "Prob. Pérdida": "{:.2%}", "Margen % Esperado": "{:.1%}"
+                }), use_container_width=True, hide_index=True)
+                st.caption(f"Margen acumulado en {fin['Plazo']} meses. VaR/CVaR al 95% como pérdida: un valor negativo significa que aún el peor 5% de los escenarios deja ganancia.")
+                st.plotly_chart(fig_riesgo, use_container_width=True)
+
 # ================= TAB 5: PROYECCIÓN =================
-with tabs[4]:
+with tabs[4], perfilador.seccion("Proyección"):
     st.subheader("Proyección Financiera")
     if len(st.session_state['proyecto']) > 0:
         meses = st.slider("Meses", 12, 60, 36)
-        inv_inicial = fin.get('Inv', 0)
-        flujo = []; saldo = -inv_inicial if fin['Tipo']=="Propios" else 0
-        for m in range(1, meses + 1):
-            ingreso = fact_meta
-            egreso_op = opex_total
-            egreso_fin = fin['Tabla'].loc[fin['Tabla']['Mes']==m, 'Cuota Total'].values[0] if (not fin['Tabla'].empty and m <= len(fin['Tabla'])) else 0
-            neto = ingreso - egreso_op - egreso_fin
-            if m==1 and fin['Tipo']=="Propios": neto -= inv_inicial
-            saldo += neto
-            flujo.append({"Mes": m, "Neto": neto, "Acumulado": saldo})
-        
-        df_f = pd.DataFrame(flujo)
+        df_f, flujo = motor.proyeccion(oferta, fin, meses)
         
-        # 1. Gráficos
-        st.plotly_chart(px.bar(df_f, x="Mes", y="Neto", title="Cash Flow Mensual", color="Neto", color_continuous_scale=["red", "green"]), use_container_width=True)
-        st.plotly_chart(go.Figure().add_trace(go.Scatter(x=df_f['Mes'], y=df_f['Acumulado'], fill='tozeroy')).add_hline(y=0, line_color="red"), use_container_width=True)
-        
-        # 2. Métricas y Descarga
-        st.divider()
-        k1, k2, k3 = st.columns(3)
+        if en_vista(tabs[4]):
+            # 1. Gráficos
+            st.plotly_chart(figura("flujo_mensual", df_f), use_container_width=True)
+            st.plotly_chart(figura("flujo_acumulado", df_f['Mes'], df_f['Acumulado']), use_container_width=True)
         
-        tasa_desc = 0.10 / 12
-        vpn = sum(x['Neto'] / ((1 + tasa_desc) ** i) for i, x in enumerate(flujo, 1))
-        k1.metric("VPN (Valor Presente Neto 10%)", f"${vpn:,.2f}")
+            # 2. Métricas y Descarga
+            st.divider()
+            k1, k2, k3, k4, k5 = st.columns(5)
         
-        recup = df_f[df_f['Acumulado'] >= 0]
-        payback = recup.iloc[0]['Mes'] if not recup.empty else "N/A"
-        k2.metric("Mes de Recuperación", payback)
+            k1.metric("VPN (Valor Presente Neto 10%)", f"${flujo['VPN']:,.2f}")
+            k2.metric("TIR Anual", f"{flujo['TIR']:.1%}" if not np.isnan(flujo['TIR']) else "N/A")
+            k3.metric("Mes de Recuperación", flujo['Payback'] if flujo['Payback'] is not None else "N/A")
+            k4.metric("Recuperación Descontada", flujo['Payback Desc.'] if flujo['Payback Desc.'] is not None else "N/A")
         
-        csv = df_f.to_csv(index=False).encode('utf-8')
-        k3.download_button("📥 Descargar Proyección (Excel)", data=csv, file_name="proyeccion_mipc.csv", mime="text/csv", type="primary")
+            csv = df_f.to_csv(index=False).encode('utf-8')
+            k5.download_button("📥 Descargar Proyección (Excel)", data=csv, file_name="proyeccion_mipc.csv", mime="text/csv", type="primary")
+
+        with st.expander("💾 Guardar Cotización", expanded=False):
+            with st.form("guardar_cotizacion"):
+                g1, g2 = st.columns([1, 2])
+                cliente_cot = g1.text_input("Cliente")
+                notas_cot = g2.text_input("Notas")
+                if st.form_submit_button("💾 Guardar"):
+                    try:
+                        cot_id = cotizaciones.guardar_cotizacion(conn, cliente_cot, st.session_state['proyecto'], {
+                            "margen_meta": margen_meta, "incluir_papel": incluir_papel, "costo_papel": costo_papel,
+                            "tipo_fin": tipo_fin, "tasa": tasa, "plazo": plazo, "gracia": gracia, "meses": meses,
+                        }, fin, oferta, flujo, notas_cot)
+                        st.success(f"Cotización #{cot_id} guardada para {cliente_cot.strip()}.")
+                    except ValueError as e: st.error(str(e))
+
+        # 3. Sensibilidad
+        st.divider()
+        with st.expander("🎛️ Análisis de Sensibilidad", expanded=False):
+            s1, s2, s3 = st.columns(3)
+            puntos = s1.slider("Puntos por Eje", 3, 15, 11)
+            r_margen = s1.slider("Margen Meta (%)", 5, 80, (10, 60), key="sens_margen")
+            r_vol = s2.slider("Volumen Real (% del cotizado)", 10, 300, (50, 150), key="sens_vol")
+            r_papel = s2.slider("Costo Resma ($)", 0.0, 10.0, (0.0, 6.0), key="sens_papel")
+            if tipo_fin != "Propios":
+                r_tasa = s3.slider("Tasa Anual (%)", 0.0, 60.0, (0.0, 30.0), key="sens_tasa")
+                plazos_sens = s3.multiselect("Plazos", [12, 24, 36, 48, 60], [12, 24, 36, 48, 60], key="sens_plazos")
+                ejes_tasa, ejes_plazo = np.linspace(*r_tasa, puntos), plazos_sens
+            else:
+                s3.caption("Fondos propios: tasa y plazo no aplican.")
+                ejes_tasa, ejes_plazo = [tasa], [plazo]
+
+            valores_base = {"margen_meta": margen_meta, "tasa": tasa, "plazo": plazo, "volumen": 1.0, "costo_papel": costo_papel}
+            ejes_sens = sensibilidad.ejes_con_base({
+                "margen_meta": np.linspace(r_margen[0] / 100, r_margen[1] / 100, puntos), "tasa": ejes_tasa, "plazo": ejes_plazo,
+                "volumen": np.linspace(r_vol[0] / 100, r_vol[1] / 100, puntos), "costo_papel": np.linspace(*r_papel, puntos),
+            }, valores_base)
+            if st.toggle("Calcular Grilla", key="calcular_grilla") and en_vista(tabs[4]):
+                grilla = grilla_sensibilidad(conn, cat.version, st.session_state['proyecto'], tipo_fin, gracia, ejes_sens, meses)
+
+                g1, g2, g3 = st.columns(3)
+                g1.metric("Escenarios", f"{grilla['VPN'].size:,}")
+                g2.metric("Escenarios con VPN < 0", f"{(grilla['VPN'] < 0).mean():.1%}")
+                g3.metric("VPN Peor / Mejor", f"${grilla['VPN'].min():,.0f} / ${grilla['VPN'].max():,.0f}")
+
+                df_tornado, vpn_base = sensibilidad.tornado(grilla, valores_base)
+                if not df_tornado.empty: st.plotly_chart(figura("tornado", df_tornado, vpn_base), use_container_width=True)
+
+                nombres = list(sensibilidad.PARAMETROS)
+                h1, h2 = st.columns(2)
+                eje_x = h1.selectbox("Eje X", nombres, index=3, format_func=sensibilidad.PARAMETROS.get)
+                eje_y = h2.selectbox("Eje Y", [n for n in nombres if n != eje_x], index=0, format_func=sensibilidad.PARAMETROS.get)
+                mapa = sensibilidad.corte(grilla, valores_base, eje_x, eje_y)
+                st.plotly_chart(figura("mapa_vpn", mapa, sensibilidad.PARAMETROS[eje_x], sensibilidad.PARAMETROS[eje_y]), use_container_width=True)
+                # El CSV de toda la grilla se arma recién al hacer clic
+                st.download_button("📥 Descargar Grilla (CSV)", data=lambda: sensibilidad.a_dataframe(grilla).to_csv(index=False).encode('utf-8'),
+                                   file_name="sensibilidad_mipc.csv", mime="text/csv")
 
 # ================= TAB 6: STOCK =================
-with tabs[5]:
-    st.subheader("Stock (6 Meses)")
-    if len(st.session_state['proyecto']) > 0:
-        df_p = pd.DataFrame(st.session_state['proyecto'])
-        stock_list = []
-        for idx, row in df_p.iterrows():
-            cons = pd.read_sql(f"SELECT tipo, rendimiento FROM consumibles WHERE equipo_id={row['Eq_ID']}", conn)
-            for _, r in cons.iterrows():
-                if r['rendimiento'] > 0:
-                    cons_mes = row['Vol. Total'] / r['rendimiento']
-                    stock_list.append({"Sede": row['Sede'], "Equipo": row['Modelo'], "Insumo": r['tipo'], "Consumo Mes": f"{cons_mes:.2f}", "Stock (6m)": f"{np.ceil(cons_mes*6):.0f}"})
-        st.dataframe(pd.DataFrame(stock_list), use_container_width=True)
+with tabs[5], perfilador.seccion("Stock"):
+    st.subheader("Planificación de Stock")
+    s1, s2, s3, s4 = st.columns(4)
+    origen_stock = s1.radio("Origen", ["Proyecto actual", "Contratos vigentes"], horizontal=True)
+    horizonte = s2.slider("Horizonte (Meses)", 1, 24, 6)
+    lead_time = s3.number_input("Lead Time (Meses)", 0.0, 6.0, 1.0, 0.5)
+    seguridad = s4.number_input("Stock de Seguridad (Meses)", 0.0, 6.0, 0.5, 0.5)
+
+    cliente_stock = st.text_input("Cliente (empieza con)", key="stock_cliente") if origen_stock == "Contratos vigentes" else None
+    agrupar = st.multiselect("Agrupar por", stock.CLAVE, stock.CLAVE, key="stock_agrupar") or ["Equipo", "Insumo"]
+
+    if en_vista(tabs[5]):
+        if origen_stock == "Proyecto actual":
+            consumos = stock.consumos_proyecto(conn, st.session_state['proyecto'])
+        else:
+            consumos = stock.consumos_contratos(lectura, cliente=cliente_stock)
+
+        if consumos.empty: st.info("Arma el proyecto." if origen_stock == "Proyecto actual" else "No hay contratos vigentes (cotizaciones firmadas dentro de su plazo).")
+        else:
+            reposicion = stock.puntos_pedido(consumos, horizonte, lead_time, seguridad, agrupar)
+            k1, k2, k3 = st.columns(3)
+            k1.metric("Contratos", consumos['Contrato'].nunique())
+            k2.metric("Unidades en el Horizonte", f"{reposicion['Necesidad Horizonte'].sum():,.0f}")
+            k3.metric("Costo en el Horizonte", f"${reposicion['Costo Horizonte'].sum():,.2f}")
+            st.dataframe(reposicion.style.format({"Consumo Mes": "{:,.2f}", "Costo Mes": "${:,.2f}", "Stock Seguridad": "{:,.0f}",
+                                                  "Punto de Pedido": "{:,.0f}", "Necesidad Horizonte": "{:,.0f}", "Costo Horizonte": "${:,.2f}"}),
+                         use_container_width=True, hide_index=True)
+
+            st.markdown("##### 📅 Reposición Mensual (Unidades)")
+            plan = stock.plan_mensual(consumos, horizonte, agrupar)
+            st.dataframe(plan.pivot_table(index=agrupar, columns="Mes", values="Unidades", aggfunc="sum").style.format("{:,.0f}"),
+                         use_container_width=True)
+            st.plotly_chart(figura("costo_reposicion", plan, agrupar), use_container_width=True)
+            st.download_button("📥 Descargar Plan (CSV)", data=plan.to_csv(index=False).encode('utf-8'), file_name="stock_mipc.csv", mime="text/csv")
 
 # ================= TAB 7: CALCULADORA RÁPIDA =================
-with tabs[6]:
+with tabs[6], perfilador.seccion("Calculadora"):
     st.subheader("🧮 Calculadora de Matriz de Precios")
-    eq_list = pd.read_sql("SELECT id, modelo FROM equipos", conn)
-    if not eq_list.empty:
+    modelos_cat = {i: e['modelo'] for i, e in cat.equipos.items()}
+    if modelos_cat:
         c1, c2, c3 = st.columns(3)
-        sel_eq_rapido = c1.selectbox("Seleccionar Impresora", eq_list['id'].tolist(), format_func=lambda x: eq_list[eq_list['id']==x]['modelo'].values[0])
+        sel_eq_rapido = c1.selectbox("Seleccionar Impresora", list(modelos_cat), format_func=modelos_cat.get)
         margen_rapido = c2.slider("Margen Deseado (%)", 10, 80, 30) / 100
         papel_rapido = c3.checkbox("Incluir Papel", value=True)
         
-        if sel_eq_rapido:
+        if sel_eq_rapido and en_vista(tabs[6]):
             detalles_base = get_detalles_equipo(sel_eq_rapido, 1, papel_rapido, costo_papel)
             costo_fijo_mensual = detalles_base['costo_adq'] / 36 + detalles_base['manto']
             costo_var_unit = detalles_base['cpp']
@@ -417,3 +543,145 @@ with tabs[6]:
                 matriz.append({"Volumen Mensual": f"{vol:,.0f}", "Costo Fijo/Pág": f"${cf_pag:.4f}", "Costo Var/Pág": f"${costo_var_unit:.4f}", "Costo Total": f"${costo_total_unit:.4f}", "PRECIO VENTA": f"${precio_venta:.4f}"})
             st.write(f"**Análisis para: {detalles_base['modelo']}** (Con margen del {margen_rapido*100:.0f}%)")
             st.dataframe(pd.DataFrame(matriz), use_container_width=True)
+
+# ================= TAB 8: HISTORIAL =================
+# El catálogo se carga antes de la instantánea: dentro de ella no queda guardado (ver obtener_catalogo)
+if en_vista(tabs[7]) and st.session_state.get("hist_comparar"): obtener_catalogo(lectura)
+with tabs[7], perfilador.seccion("Historial"), instantanea(lectura):
+    st.subheader("🗂️ Historial de Cotizaciones")
+    f1, f2, f3, f4 = st.columns(4)
+    h_cliente = f1.text_input("Cliente (empieza con)", key="hist_cliente")
+    modelos_cot = [m for (m,) in lectura.execute("SELECT DISTINCT modelo FROM cotizacion_modelos")]
+    h_modelo = f2.selectbox("Modelo", ["Todos"] + modelos_cot, key="hist_modelo")
+    h_desde = f3.date_input("Desde", value=None, key="hist_desde")
+    h_hasta = f4.date_input("Hasta", value=None, key="hist_hasta")
+
+    # Paginación por cursor: se guarda el cursor de inicio de cada página visitada
+    filtros = (h_cliente, h_modelo, h_desde, h_hasta)
+    if st.session_state.get('hist_filtros') != filtros:
+        st.session_state['hist_filtros'] = filtros; st.session_state['hist_cursores'] = [None]
+    cursores = st.session_state['hist_cursores']
+    if en_vista(tabs[7]):
+        pagina, siguiente = cotizaciones.listar_cotizaciones(lectura, h_cliente, None if h_modelo == "Todos" else h_modelo,
+                                                             h_desde, h_hasta, cursores[-1])
+        if pagina.empty: st.info("No hay cotizaciones guardadas con esos filtros.")
+        else:
+            st.dataframe(pagina.astype({"firmada": bool}).style.format({"vol_total": "{:,.0f}", "inversion": "${:,.2f}", "fact_meta": "${:,.2f}",
+                                              "vpn": "${:,.2f}", "tir": "{:.1%}"}, na_rep="N/A"),
+                         use_container_width=True, hide_index=True)
+            n1, n2, n3 = st.columns([1, 1, 4])
+            if n1.button("⬅️ Anterior", disabled=len(cursores) == 1): cursores.pop(); st.rerun()
+            if n2.button("Siguiente ➡️", disabled=siguiente is None): cursores.append(siguiente); st.rerun()
+            n3.caption(f"Página {len(cursores)}")
+
+            st.divider()
+            etiquetas_cot = dict(zip(pagina['id'], pagina['cliente'] + " (" + pagina['fecha'] + ")"))
+            cot_sel = st.selectbox("Cotización", pagina['id'].tolist(), format_func=lambda i: f"#{i} - {etiquetas_cot[i]}")
+            cot = cotizaciones.cargar_cotizacion(lectura, cot_sel)
+            par = cot['parametros']
+            st.caption((f"✅ Firmada ({cot['plan']}) | " if cot['firmada'] else "") + f"Margen {par['margen_meta']:.0%} | Papel: {'$' + format(par['costo_papel'], '.2f') if par['incluir_papel'] else 'No'} | "
+                       f"Financiamiento: {par['tipo_fin']}" + (f" {par['tasa']}% a {par['plazo']} meses, gracia {par['gracia']}" if par['tipo_fin'] != "Propios" else "")
+                       + (f" | {cot['notas']}" if cot['notas'] else ""))
+            of_cot, fl_cot = cot['oferta'], cot['flujo']
+            m1, m2, m3, m4, m5 = st.columns(5)
+            m1.metric("Tarifa Plana", f"${of_cot['fact_meta']:,.2f}")
+            m2.metric("Híbrido (Renta + Click)", f"${of_cot['renta']:,.2f} + ${of_cot['click']:.4f}")
+            m3.metric("Plan Variable", f"${of_cot['p_unico']:.4f}")
+            m4.metric("VPN", f"${fl_cot['VPN']:,.2f}")
+            m5.metric("TIR Anual", f"{fl_cot['TIR']:.1%}" if not np.isnan(fl_cot['TIR']) else "N/A")
+            st.dataframe(pd.DataFrame(cot['proyecto'])[["Sede", "Modelo", "Cantidad", "Vol. Unit", "Vol. Total", "Inversión", "OPEX Fijo", "OPEX Var"]],
+                         use_container_width=True, hide_index=True)
+            st.plotly_chart(figura("flujo_acumulado", np.arange(1, len(fl_cot['Acumulado']) + 1), fl_cot['Acumulado'], "Flujo Acumulado (Guardado)"),
+                            use_container_width=True)
+            if not cot['fin']['Tabla'].empty:
+                with st.expander("Tabla de Amortización"):
+                    st.dataframe(cot['fin']['Tabla'], use_container_width=True, hide_index=True)
+
+            if st.toggle("Comparar con precios actuales", key="hist_comparar"):
+                lineas_cmp, resumen_cmp = cotizaciones.comparar_con_catalogo(lectura, cot)
+                st.dataframe(lineas_cmp, use_container_width=True, hide_index=True)
+                if resumen_cmp.empty: st.warning("Algún equipo ya no está en el catálogo: no se puede re-cotizar la oferta.")
+                else: st.dataframe(resumen_cmp.style.format({"Guardado": "{:,.4f}", "Actual": "{:,.4f}", "Δ": "{:+,.4f}", "Δ %": "{:+.2%}"}, na_rep="-"),
+                                   use_container_width=True, hide_index=True)
+
+            b1, b2, b3 = st.columns(3)
+            if b1.button("📂 Abrir en Armador"):
+                cargar_proyecto(cot['proyecto'])
+                st.rerun()
+            # Sólo las firmadas son contratos (Stock y Cartera), con el plan que eligió el cliente
+            plan_firma = b2.selectbox("Plan del Contrato", cotizaciones.PLANES, cotizaciones.PLANES.index(cot['plan']),
+                                      key=f"plan_firma_{cot['id']}", disabled=cot['firmada'], label_visibility="collapsed")
+            if b3.button("✖️ Anular Firma" if cot['firmada'] else "✍️ Marcar como Firmada"):
+                cotizaciones.firmar_cotizacion(conn, cot['id'], not cot['firmada'], plan_firma)
+                st.rerun()
+
+# ================= TAB 9: CARTERA =================
+with tabs[8], perfilador.seccion("Cartera"):
+    st.subheader("💼 Cartera de Contratos")
+    f1, f2, f3, f4 = st.columns(4)
+    c_cliente = f1.text_input("Cliente (empieza con)", key="cartera_cliente")
+    c_vigentes = f2.toggle("Sólo vigentes al corte", value=True, key="cartera_vigentes")
+    c_uso = f3.slider("Volumen Real (% del cotizado)", 10, 300, 100, 5, key="cartera_uso") / 100
+    c_corte = f4.date_input("Corte", key="cartera_corte")
+
+    if en_vista(tabs[8]):
+        # Se vuelve a armar sólo si cambian los filtros, el día o los contratos firmados y sus planes; las ediciones
+        # viven en la sesión
+        with instantanea(lectura):
+            clave = (c_cliente, c_vigentes, c_uso, c_corte, date.today(),
+                     hash(tuple(lectura.execute("SELECT id, plan FROM cotizaciones WHERE firmada = 1 ORDER BY id"))))
+            if st.session_state.get('cartera_clave') != clave:
+                st.session_state['cartera'] = cartera.cargar(lectura, c_corte, cliente=c_cliente, vigentes=c_vigentes, uso=c_uso)
+                st.session_state['cartera_clave'] = clave
+                st.session_state['version_cartera'] = st.session_state.get('version_cartera', 0) + 1
+        cart = st.session_state['cartera']
+
+        if cart.contratos.empty: st.info("No hay contratos con esos filtros (cotizaciones firmadas).")
+        else:
+            flujo_cart = cart.flujo()
+            por = st.radio("Concentración por", cartera.POR, horizontal=True, key="cartera_por")
+            conc = cart.concentracion(por, c_corte)
+            m1, m2, m3, m4, m5 = st.columns(5)
+            m1.metric("Contratos", f"{len(cart.contratos):,}")
+            m2.metric("Ingreso del Mes", f"${conc['Ingreso Mes'].sum():,.2f}")
+            m3.metric("Saldo de Deuda", f"${conc['Saldo Deuda'].sum():,.2f}")
+            m4.metric("VPN Remanente", f"${cart.vpn(c_corte):,.2f}")
+            m5.metric("Índice Herfindahl", f"{(conc['Participación'] ** 2).sum():.3f}",
+                      help="Suma de las participaciones al cuadrado en el ingreso pendiente (1 = todo en uno solo)")
+            st.plotly_chart(figura("flujo_cartera", flujo_cart, str(pd.Period(c_corte, "M"))), use_container_width=True)
+            st.dataframe(conc.style.format({"Ingreso Mes": "${:,.2f}", "Ingreso Pendiente": "${:,.2f}", "Saldo Deuda": "${:,.2f}",
+                                            "VPN Remanente": "${:,.2f}", "Participación": "{:.1%}"}),
+                         use_container_width=True, hide_index=True)
+
+            with st.expander("📝 Contratos (¿qué pasa si...?)"):
+                st.caption("Los cambios sólo afectan a esta vista: se recalcula únicamente el contrato editado.")
+                key_cart = f"editor_cartera_{st.session_state['version_cartera']}"
+                st.data_editor(cart.contratos[["Contrato", "Cliente", "Fecha", "Meses", "Plan", "Tipo Fin", "Tasa", "Plazo", "Gracia", "Inversión", "VPN"]],
+                               key=key_cart, on_change=aplicar_cartera, args=(key_cart,), column_config={
+                                   "Meses": st.column_config.NumberColumn("Meses", min_value=1, max_value=120),
+                                   "Plan": st.column_config.SelectboxColumn("Plan", options=cartera.PLANES, required=True),
+                                   "Tasa": st.column_config.NumberColumn("Tasa (%)", min_value=0.0),
+                                   "Plazo": st.column_config.NumberColumn("Plazo", min_value=1, max_value=120),
+                                   "Gracia": st.column_config.NumberColumn("Gracia", min_value=0),
+                               }, disabled=["Contrato", "Cliente", "Fecha", "Tipo Fin", "Inversión", "VPN"],
+                               use_container_width=True, hide_index=True)
+                if st.button("↩️ Descartar Cambios"): st.session_state.pop('cartera_clave', None); st.rerun()
+            st.download_button("📥 Descargar Flujo de la Cartera (CSV)", data=lambda: flujo_cart.to_csv(index=False).encode('utf-8'),
+                               file_name="cartera_mipc.csv", mime="text/csv")
+
+# --- PERFIL DE LA EJECUCIÓN ---
+if perfil:
+    perfilador.terminar(perfil)
+    with st.sidebar.expander("⏱️ Perfil de la Ejecución", expanded=True):
+        res_perfil = perfil.resumen()
+        p1, p2 = st.columns(2)
+        p1.metric("Total", f"{res_perfil['Segundos']:.3f} s"); p2.metric("DataFrames", f"{res_perfil['DataFrames']:,}")
+        p1.metric("Consultas SQL", f"{res_perfil['Consultas']:,}"); p2.metric("Tiempo SQL", f"{res_perfil['Seg. SQL']:.3f} s")
+        st.dataframe(perfil.tabla_secciones().style.format({"Segundos": "{:.4f}", "Seg. SQL": "{:.4f}", "MB Retenidos": "{:+.2f}", "MB Pico": "{:.2f}"}),
+                     use_container_width=True, hide_index=True)
+        st.markdown("###### SQL más lento")
+        st.dataframe(perfil.tabla_sql().head(20).style.format({"Segundos": "{:.4f}"}), use_container_width=True, hide_index=True)
+        st.markdown("###### Ejecuciones recientes")
+        st.dataframe(pd.DataFrame(list(perfilador.RECIENTES)[::-1]).style.format({"Segundos": "{:.3f}", "Seg. SQL": "{:.3f}"}, na_rep="-"),
+                     use_container_width=True, hide_index=True)
+        st.caption(f"Trazas JSONL: {perfilador.RUTA_TRAZAS}" if perfilador.RUTA_TRAZAS else "Para guardar trazas JSONL: MIPC_PERFIL_TRAZAS=ruta.jsonl")